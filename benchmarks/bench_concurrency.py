@@ -0,0 +1,147 @@
+"""
+書き込み中の読み込みスループットのベンチマーク
+ストレージプロファイル（config.STORAGE_PROFILES）ごとに同じ一時DBを用意し、
+レビュー投稿を続ける書き込みプロセスと、メニュー一覧を読み続ける読み込みプロセスを同時に動かす
+gunicornのワーカーと同じく、各プロセスが自分の create_app() を持つ
+
+使い方:
+    python benchmarks/bench_concurrency.py
+    python benchmarks/bench_concurrency.py --profiles simple,concurrent --readers 4 --writers 4 --seconds 10
+"""
+import argparse
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import STORAGE_PROFILES  # noqa: E402
+
+
+def make_app(db_path, profile, tmp):
+    from main import create_app
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'STORAGE_PROFILE': profile,
+        'RATING_MODEL_PATH': os.path.join(tmp, 'rating_model.joblib'),
+        'RECOMMENDER_PATH': os.path.join(tmp, 'recommendations.joblib'),
+        'CHART_POOL_SIZE': 0,
+    })
+    # ロック待ちで失敗したリクエストのトレースバックは件数だけ数える
+    app.logger.setLevel(logging.CRITICAL)
+    return app
+
+
+def worker(role, index, db_path, profile, tmp, num_menus, ready, go, seconds, results):
+    """1プロセス分の読み込み/書き込みを続け、件数とレイテンシを返す"""
+    app = make_app(db_path, profile, tmp)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        # 書き込みプロセスごとに別のユーザーでレビューを更新し続ける
+        session['user_id'] = index + 1
+
+    latencies = []
+    errors = 0
+    i = 0
+    ready.put(index)
+    go.wait()
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        start = time.perf_counter()
+        if role == 'reader':
+            response = client.get('/')
+        else:
+            menu_id = (index * 7 + i) % num_menus + 1
+            response = client.post(f'/menus/{menu_id}/review', data={'rating': str(i % 5 + 1)})
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 500:
+            errors += 1
+        else:
+            latencies.append(elapsed * 1000)
+        i += 1
+    results.put((role, latencies, errors))
+
+
+def prepare_database(path, profile, tmp, args):
+    from insert_dummy_data import generate_data
+    from models import db
+    app = make_app(path, profile, tmp)
+    with app.app_context():
+        db.create_all()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_data(max(1000, args.writers), args.menus, args.reviews, seed=args.seed)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def run_profile(profile, args, tmp):
+    """1つのプロファイルで読み書きを同時に動かす"""
+    db_path = os.path.join(tmp, f'{profile}.db')
+    prepare_database(db_path, profile, tmp, args)
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    ready = ctx.Queue()
+    go = ctx.Event()
+    processes = [
+        ctx.Process(target=worker, args=(role, i, db_path, profile, tmp, args.menus, ready, go, args.seconds, results))
+        for role, count in (('reader', args.readers), ('writer', args.writers))
+        for i in range(count)
+    ]
+    for process in processes:
+        process.start()
+    # 全プロセスの起動（アプリの読み込み）を待ってから一斉に始める
+    for _ in processes:
+        ready.get()
+    go.set()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    summary = {}
+    for role in ('reader', 'writer'):
+        latencies = sorted(ms for r, values, _ in collected if r == role for ms in values)
+        errors = sum(e for r, _, e in collected if r == role)
+        summary[role] = {
+            'ops_per_sec': len(latencies) / args.seconds,
+            'p50_ms': statistics.median(latencies) if latencies else float('nan'),
+            'p95_ms': latencies[int(len(latencies) * 0.95)] if latencies else float('nan'),
+            'errors': errors,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default=','.join(STORAGE_PROFILES), help='比較するプロファイル（カンマ区切り）')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--menus', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        report = {profile: run_profile(profile, args, tmp) for profile in args.profiles.split(',')}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f'読み込み {args.readers}プロセス / 書き込み {args.writers}プロセス / {args.seconds:g}秒')
+    print(f"{'profile':<12} {'role':<7} {'ops/s':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'errors':>7}")
+    for profile, summary in report.items():
+        for role, result in summary.items():
+            print(f"{profile:<12} {role:<7} {result['ops_per_sec']:>9.1f} {result['p50_ms']:>9.2f} "
+                  f"{result['p95_ms']:>9.2f} {result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
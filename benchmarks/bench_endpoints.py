@@ -0,0 +1,197 @@
+"""
+主要エンドポイントのベンチマーク
+データ量を変えた一時DBに対して既定の設定の create_app() をテストクライアントで呼び出し、
+エンドポイントごとのレイテンシ(p50/p95)・発行SQL数・ピークメモリを計測する
+計測はデプロイ直後（おすすめ・回帰モデルが未作成）と、CLI（cron）で作成した後の2つの状態で行う
+予算（BUDGETS）を超えたエンドポイントがあれば終了コード1で失敗する
+
+使い方:
+    python benchmarks/bench_endpoints.py
+    python benchmarks/bench_endpoints.py --sizes 1000,100000 --iterations 50 --json bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import create_app  # noqa: E402
+from models import db, MenuStat  # noqa: E402
+from insert_dummy_data import generate_data  # noqa: E402
+
+# 計測する状態: (名前, 計測前に実行するCLIコマンド)  cronと同じコマンドでおすすめ・回帰モデルを作る
+PHASES = (
+    ('fresh', []),
+    ('built', [['build-recommendations'], ['train-rating-model']]),
+)
+
+# エンドポイントごとの予算（どちらの状態でも守ること）: SQL数はデータ量に関係なく一定であること
+BUDGETS = {
+    'index': {'max_queries': 4, 'p95_ms': 150, 'peak_kib': 4096},
+    'menu_detail': {'max_queries': 7, 'p95_ms': 150, 'peak_kib': 2048},
+    'review_form': {'max_queries': 4, 'p95_ms': 100, 'peak_kib': 1024},
+    # グラフはブラウザで描き、予測はCLIで学習したモデルで行うため、リクエスト内で描画・学習しない
+    'analysis': {'max_queries': 5, 'p95_ms': 50, 'peak_kib': 1024},
+    # 集計はバージョンごとに1回（ウォームアップ時）だけで、以降はバージョンの確認だけ
+    'dashboard': {'max_queries': 2, 'p95_ms': 50, 'peak_kib': 1024},
+    'post_review': {'max_queries': 12, 'p95_ms': 200, 'peak_kib': 1024},
+}
+
+
+class QueryCounter:
+    """エンジンに発行されたSQLの数を数える"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def endpoint_requests(menu_id):
+    """計測するエンドポイント: 名前 → リクエストを送る関数（i回目）"""
+    return {
+        'index': lambda client, i: client.get('/'),
+        'menu_detail': lambda client, i: client.get(f'/menus/{menu_id}'),
+        'review_form': lambda client, i: client.get(f'/menus/{menu_id}/review'),
+        'analysis': lambda client, i: client.get('/analysis'),
+        'dashboard': lambda client, i: client.get('/api/v1/dashboard'),
+        # 投稿はデータを変えるため最後に計測する（同じユーザーのレビューを更新し続ける）
+        'post_review': lambda client, i: client.post(
+            f'/menus/{menu_id}/review', data={'rating': str(i % 5 + 1), 'taste_rating': '3'}
+        ),
+    }
+
+
+def measure_endpoint(client, counter, request, warmup, iterations, memory_iterations):
+    """1エンドポイントのレイテンシ・SQL数・ピークメモリを計測"""
+    for i in range(warmup):
+        request(client, i)
+
+    latencies = []
+    queries = []
+    for i in range(iterations):
+        counter.count = 0
+        start = time.perf_counter()
+        response = request(client, i)
+        latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.count)
+        if response.status_code >= 400:
+            raise RuntimeError(f'status {response.status_code}')
+
+    # tracemallocは処理を遅くするので、メモリは別に数回だけ計測する
+    tracemalloc.start()
+    for i in range(memory_iterations):
+        request(client, i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        'queries': max(queries),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_size(num_reviews, args, tmp):
+    """1つのデータ量で、状態ごとに全エンドポイントを計測"""
+    num_users = max(100, num_reviews // 20)
+    num_menus = args.menus
+    # パス以外は既定の設定（グラフの描画プールなども本番と同じ）
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, f"bench_{num_reviews}.db")}',
+        'RATING_MODEL_PATH': os.path.join(tmp, f'rating_model_{num_reviews}.joblib'),
+        'RECOMMENDER_PATH': os.path.join(tmp, f'recommendations_{num_reviews}.joblib'),
+    })
+    with app.app_context():
+        db.create_all()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_data(num_users, num_menus, num_reviews, seed=args.seed)
+        # レビュー数の一番多いメニューを対象にする
+        menu_id = MenuStat.query.order_by(MenuStat.review_count.desc()).first().menu_id
+        counter = QueryCounter(db.engine)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    runner = app.test_cli_runner()
+
+    results = {}
+    for phase, commands in PHASES:
+        for command in commands:
+            result = runner.invoke(args=command)
+            if result.exit_code != 0:
+                raise RuntimeError(f'{" ".join(command)}: {result.output}')
+        results[phase] = {
+            name: measure_endpoint(client, counter, request, args.warmup, args.iterations, args.memory_iterations)
+            for name, request in endpoint_requests(menu_id).items()
+        }
+    return results
+
+
+def check_budgets(report):
+    """予算を超えた項目の一覧を返す"""
+    violations = []
+    for size, phases in report.items():
+        for phase, results in phases.items():
+            for name, result in results.items():
+                for key, limit in BUDGETS[name].items():
+                    value = result['queries'] if key == 'max_queries' else result[key]
+                    if value > limit:
+                        violations.append(f'{size} reviews / {phase} / {name}: {key} {value} > {limit}')
+    return violations
+
+
+def print_table(report):
+    print(f"{'reviews':>10}  {'phase':<6} {'endpoint':<12} {'p50(ms)':>9} {'p95(ms)':>9} {'SQL':>5} {'peak(KiB)':>10}")
+    for size, phases in report.items():
+        for phase, results in phases.items():
+            for name, result in results.items():
+                print(f"{size:>10,}  {phase:<6} {name:<12} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                      f"{result['queries']:>5} {result['peak_kib']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='レビュー数（カンマ区切り）')
+    parser.add_argument('--menus', type=int, default=200, help='メニュー数')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--memory-iterations', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='結果をJSONで保存するパス')
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(',')):
+            report[size] = run_size(size, args, tmp)
+
+    print_table(report)
+    violations = check_budgets(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'budgets': BUDGETS, 'results': report, 'violations': violations}, f, indent=2)
+
+    if violations:
+        print('\n予算超過:')
+        for violation in violations:
+            print(f'  {violation}')
+        sys.exit(1)
+    print('\nすべてのエンドポイントが予算内です')
+
+
+if __name__ == '__main__':
+    main()
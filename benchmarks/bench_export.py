@@ -0,0 +1,75 @@
+"""
+レビューの書き出し（services/review_export.py）のベンチマーク
+件数ごとに一時DBを作り、CSV / Parquet の書き出しの件数/秒を計測する
+--memory を付けるとPythonのピークメモリ（tracemalloc）とpyarrowのメモリプールの最大値も計測し、
+件数に関係なくほぼ一定であることを確認する（tracemallocの分だけ書き出しは遅くなる）
+（SQLiteのページキャッシュ・mmapはストレージプロファイルの cache_size・mmap_size で上限が決まるため含めない）
+
+使い方:
+    python benchmarks/bench_export.py
+    python benchmarks/bench_export.py --sizes 1000,100000,1000000 --formats csv,parquet --memory
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import create_app  # noqa: E402
+from models import db  # noqa: E402
+from insert_dummy_data import generate_data  # noqa: E402
+from services.review_export import ReviewExport, parquet_available  # noqa: E402
+
+
+def arrow_peak_mb():
+    if not parquet_available():
+        return 0.0
+    import pyarrow as pa
+    return pa.default_memory_pool().max_memory() / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,100000,1000000', help='レビュー数（カンマ区切り）')
+    parser.add_argument('--formats', default='csv,parquet')
+    parser.add_argument('--memory', action='store_true', help='ピークメモリを計測する')
+    args = parser.parse_args()
+
+    formats = [format for format in args.formats.split(',') if format != 'parquet' or parquet_available()]
+
+    print(f"{'reviews':>9} {'format':>8} {'rows/s':>10} {'seconds':>8} {'py MB':>7} {'arrow MB':>9} {'file MB':>8}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+                'RATING_MODEL_PATH': os.path.join(tmp, 'rating_model.joblib'),
+                'RECOMMENDER_PATH': os.path.join(tmp, 'recommendations.joblib'),
+                'CHART_POOL_SIZE': 0,
+            })
+            with app.app_context():
+                db.create_all()
+                num_users = max(100, size // 50)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_data(num_users, min(300, max(50, size // num_users * 2)), size)
+
+                for format in formats:
+                    output = os.path.join(tmp, f'reviews.{format}')
+                    export = ReviewExport()
+                    if args.memory:
+                        tracemalloc.start()
+                    with open(output, 'wb') as f:
+                        for chunk in export.chunks(format):
+                            f.write(chunk)
+                    python_mb = f'{tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f}' if args.memory else '-'
+                    tracemalloc.stop()
+                    arrow_mb = f'{arrow_peak_mb():.1f}' if args.memory and format == 'parquet' else '-'
+                    print(f'{export.rows:>9} {format:>8} {export.rows_per_second:>10,.0f} {export.seconds:>8.2f} '
+                          f'{python_mb:>7} {arrow_mb:>9} {os.path.getsize(output) / 1024 / 1024:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+レビューの一括取り込み（services/review_import.py）のベンチマーク
+行数ごとにCSVを作って取り込み、行/秒を計測する（半分は既存レビューの上書き、1%は不正な行）
+--memory を付けるとPythonのピークメモリ（tracemalloc）も計測し、ファイルの行数に関係なくほぼ一定であることを確認する
+（tracemallocの分だけ取り込みは遅くなる）
+
+使い方:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --rows 10000,100000,1000000 --chunk-size 1000 --memory
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import create_app  # noqa: E402
+from models import db  # noqa: E402
+from insert_dummy_data import generate_data  # noqa: E402
+from services.review_import import import_reviews  # noqa: E402
+
+NUM_MENUS = 100
+
+
+def write_csv(path, rows, num_users, seed=0):
+    """取り込み用のCSVを1行ずつ書き出す"""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['user_id', 'menu_id', 'rating', 'comment', 'taste_rating', 'volume_rating', 'price_rating'])
+        for i in range(rows):
+            rating = rng.randint(1, 5) if rng.random() > 0.01 else 9
+            writer.writerow([
+                i // NUM_MENUS % num_users + 1, i % NUM_MENUS + 1, rating, 'アンケート用紙より' if i % 3 == 0 else '',
+                rng.randint(1, 5), rng.randint(1, 5), '',
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000,100000', help='取り込む行数（カンマ区切り）')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--memory', action='store_true', help='ピークメモリを計測する')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'seconds':>8} {'rows/s':>9} {'inserted':>9} {'updated':>8} {'rejected':>9} {'peak MB':>8}")
+    for rows in (int(value) for value in args.rows.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+                'RATING_MODEL_PATH': os.path.join(tmp, 'rating_model.joblib'),
+                'RECOMMENDER_PATH': os.path.join(tmp, 'recommendations.joblib'),
+                'CHART_POOL_SIZE': 0,
+            })
+            # 取り込む組み合わせの半分にあたるレビューを先に入れておく
+            num_users = max(1, rows // NUM_MENUS)
+            with app.app_context():
+                db.create_all()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_data(num_users, NUM_MENUS, num_users * NUM_MENUS // 2)
+            path = os.path.join(tmp, 'reviews.csv')
+            write_csv(path, rows, num_users)
+
+            with app.app_context(), open(path, encoding='utf-8', newline='') as stream:
+                if args.memory:
+                    tracemalloc.start()
+                report = import_reviews(stream, 'csv', args.chunk_size)
+                peak = f'{tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f}' if args.memory else '-'
+                tracemalloc.stop()
+            print(f'{rows:>9} {report.seconds:>8.1f} {report.rows_per_second:>9,.0f} {report.inserted:>9} '
+                  f'{report.updated:>8} {report.rejected:>9} {peak:>8}')
+
+
+if __name__ == '__main__':
+    main()
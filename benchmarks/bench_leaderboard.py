@@ -0,0 +1,85 @@
+"""
+評価ランキング（services/leaderboard.py）のベンチマーク
+メニュー数ごとに、DBからの読み込み（ワーカー起動時）・上位N件の取得・1件のレビュー反映の時間を、
+同じベイズ平均の順位を毎回SQLで求める場合と比べる
+
+使い方:
+    python benchmarks/bench_leaderboard.py
+    python benchmarks/bench_leaderboard.py --menus 100,1000,10000 --top 10 --repeat 1000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import text  # noqa: E402
+from main import create_app  # noqa: E402
+from models import db, Menu  # noqa: E402
+from insert_dummy_data import generate_data  # noqa: E402
+from services.leaderboard import Leaderboard  # noqa: E402
+
+# 毎回SQLでベイズ平均を求めて並べる場合（比較用）
+SQL_TOP = text("""
+    SELECT menus.id, menus.name,
+           (:prior * :mean + menu_stats.rating_sum) * 1.0 / (:prior + menu_stats.review_count) AS score
+    FROM menus JOIN menu_stats ON menu_stats.menu_id = menus.id
+    WHERE menus.is_available = 1 AND menu_stats.review_count > 0
+    ORDER BY score DESC, menu_stats.review_count DESC, menus.id
+    LIMIT :limit
+""")
+
+
+def timed(func, repeat):
+    """1回あたりの平均時間（ミリ秒）"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--menus', default='100,1000,10000', help='メニュー数（カンマ区切り）')
+    parser.add_argument('--reviews-per-menu', type=int, default=20)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'menus':>7} {'load ms':>8} {'top ms':>8} {'sql top ms':>11} {'apply ms':>9}")
+    for num_menus in (int(value) for value in args.menus.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+                'RATING_MODEL_PATH': os.path.join(tmp, 'rating_model.joblib'),
+                'RECOMMENDER_PATH': os.path.join(tmp, 'recommendations.joblib'),
+                'CHART_POOL_SIZE': 0,
+            })
+            with app.app_context():
+                db.create_all()
+                num_users = max(100, args.reviews_per_menu * 2)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_data(num_users, num_menus, num_menus * args.reviews_per_menu)
+
+                leaderboard = Leaderboard()
+                load_ms = timed(leaderboard.load, 5)
+                top_ms = timed(lambda: leaderboard.top(args.top), args.repeat)
+                params = {'prior': leaderboard.prior_reviews, 'mean': leaderboard.prior_mean, 'limit': args.top}
+                sql_ms = timed(lambda: db.session.execute(SQL_TOP, params).all(), max(1, args.repeat // 10))
+
+                # 1件のレビュー投稿に相当する差分を、ランダムなメニューに反映する
+                menu_ids = [menu_id for (menu_id,) in db.session.query(Menu.id)]
+                rng = random.Random(0)
+                apply_ms = timed(lambda: leaderboard.apply(
+                    {rng.choice(menu_ids): {'review_count': 1, 'rating_sum': rng.randint(1, 5)}}
+                ), args.repeat)
+            print(f'{num_menus:>7} {load_ms:>8.2f} {top_ms:>8.3f} {sql_ms:>11.2f} {apply_ms:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+ログインの集中とメニュー閲覧の混在負荷のベンチマーク
+ログインを繰り返すスレッドとメニュー一覧を読み続けるスレッドを同時に動かし、
+パスワードハッシュ用プールの設定（PASSWORD_HASH_WORKERS / PASSWORD_HASH_QUEUE_LIMIT）ごとに
+ログイン数/秒・混雑で断った数（503）・一覧画面のレイテンシを比べる
+（gunicornのgthreadワーカー1つ分に相当する、1プロセス内のスレッドで計測する）
+
+使い方:
+    python benchmarks/bench_login.py
+    python benchmarks/bench_login.py --pools 0:0,1:2,2:8 --login-threads 8 --page-threads 2 --seconds 10
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import create_app  # noqa: E402
+from models import db, User  # noqa: E402
+from insert_dummy_data import generate_data  # noqa: E402
+
+# generate_data() で作られるユーザーのパスワード
+PASSWORD = 'password123'
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))] if values else float('nan')
+
+
+def run_mixed(app, usernames, args):
+    """ログインと一覧表示を同時に動かし、スレッドごとの結果をまとめる"""
+    results = {'login': [], 'busy': 0, 'failed': 0, 'page': []}
+    lock = threading.Lock()
+    start = threading.Event()
+    deadline = [0.0]
+
+    def login_worker(index):
+        client = app.test_client()
+        latencies, busy, failed = [], 0, 0
+        i = index
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            began = time.perf_counter()
+            response = client.post('/login', data={'username': usernames[i % len(usernames)], 'password': PASSWORD})
+            if response.status_code == 503:
+                busy += 1
+            elif response.status_code == 302:
+                latencies.append((time.perf_counter() - began) * 1000)
+            else:
+                failed += 1
+            i += args.login_threads
+        with lock:
+            results['login'] += latencies
+            results['busy'] += busy
+            results['failed'] += failed
+
+    def page_worker(index):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = index + 1
+        latencies = []
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            began = time.perf_counter()
+            client.get('/')
+            latencies.append((time.perf_counter() - began) * 1000)
+        with lock:
+            results['page'] += latencies
+
+    threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(args.login_threads)]
+    threads += [threading.Thread(target=page_worker, args=(i,)) for i in range(args.page_threads)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + args.seconds
+    start.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pools', default='0:0,1:2,2:8',
+                        help='比較するプール設定 ワーカー数:待ちの上限（カンマ区切り。0:0はリクエスト内で計算）')
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--page-threads', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--method', default='scrypt:32768:8:1', help='パスワードハッシュの方式')
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_uri = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        for pool in args.pools.split(','):
+            workers, queue_limit = (int(value) for value in pool.split(':'))
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': db_uri,
+                'RATING_MODEL_PATH': os.path.join(tmp, 'rating_model.joblib'),
+                'RECOMMENDER_PATH': os.path.join(tmp, 'recommendations.joblib'),
+                'CHART_POOL_SIZE': 0,
+                'PASSWORD_HASH_METHOD': args.method,
+                'PASSWORD_HASH_WORKERS': workers,
+                'PASSWORD_HASH_QUEUE_LIMIT': queue_limit,
+            })
+            app.logger.setLevel(logging.CRITICAL)
+            with app.app_context():
+                if not report:
+                    db.create_all()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        generate_data(args.users, 50, args.users * 10)
+                    # ログインのたびに作り直さないよう、全ユーザーを計測する方式のハッシュにそろえる
+                    password_hash = app.extensions['password_hasher'].hash(PASSWORD)
+                    User.query.update({User.password_hash: password_hash})
+                    db.session.commit()
+                usernames = [name for (name,) in db.session.query(User.username)]
+
+            results = run_mixed(app, usernames, args)
+            report.append((pool, results))
+
+    print(f'ログイン {args.login_threads}スレッド / 一覧表示 {args.page_threads}スレッド / {args.seconds:g}秒 / {args.method}')
+    print(f"{'pool':<8} {'logins/s':>9} {'login p95':>10} {'busy':>6} {'failed':>7} {'pages/s':>8} {'page p50':>9} {'page p95':>9}")
+    for pool, results in report:
+        print(f"{pool:<8} {len(results['login']) / args.seconds:>9.1f} {percentile(results['login'], 0.95):>10.1f} "
+              f"{results['busy']:>6} {results['failed']:>7} {len(results['page']) / args.seconds:>8.1f} "
+              f"{statistics.median(results['page']) if results['page'] else float('nan'):>9.1f} "
+              f"{percentile(results['page'], 0.95):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+おすすめ（services/recommender.py）のベンチマーク
+潜在因子モデルで作った合成の評価（メニューの人気はZipf分布）から、
+作成の時間とメモリのピーク・保存ファイルの大きさと読み込み時間・1回の表示で引く時間を計測する
+（DBからの読み込みは含まない。全レビューの読み込みは bench_review_loader.py を参照）
+
+精度の目安として、一部のユーザーの高評価（4以上）を1件ずつ隠して作り直し、
+ユーザーごとのおすすめ上位 results 件に隠したメニューが入る割合（hit rate）を、
+レビューの多い順に勧める場合と比べる
+
+使い方:
+    python benchmarks/bench_recommender.py
+    python benchmarks/bench_recommender.py --users 100000 --menus 1000 --reviews-per-user 20 --holdout 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np  # noqa: E402
+from services.recommender import Recommender, build_recommendations  # noqa: E402
+
+# 合成データの潜在因子の数
+FACTORS = 8
+
+
+def synthetic_ratings(num_users, num_menus, reviews_per_user, seed):
+    """(ユーザーIDの配列, メニューIDの配列, 評価の配列)。ユーザーごとに重複しないメニューを選ぶ"""
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(size=(num_users, FACTORS)).astype(np.float32)
+    menu_factors = rng.normal(size=(num_menus, FACTORS)).astype(np.float32)
+    # よく食べられるメニューほど選ばれやすい（Zipf分布）
+    popularity = 1.0 / np.arange(1, num_menus + 1)
+    popularity /= popularity.sum()
+
+    per_user = min(reviews_per_user, num_menus)
+    # ユーザーごとに、人気と好み（潜在因子の内積）で重み付けした重複なしの抽出（Gumbel-top-k）を
+    # ブロックごとに行う（好きそうなメニューほど注文される）
+    menu_index = np.empty((num_users, per_user), dtype=np.int64)
+    block = max(1, 5_000_000 // num_menus)
+    for start in range(0, num_users, block):
+        stop = min(start + block, num_users)
+        taste = user_factors[start:stop] @ menu_factors.T / np.sqrt(FACTORS)
+        keys = np.log(popularity)[None, :] + taste - np.log(-np.log(rng.random((stop - start, num_menus))))
+        menu_index[start:stop] = np.argpartition(-keys, per_user - 1, axis=1)[:, :per_user]
+    user_index = np.repeat(np.arange(num_users), per_user)
+    menu_index = menu_index.ravel()
+
+    # 好み＋ユーザーごとの甘さ・辛さ＋ノイズを1〜5に丸める
+    affinity = np.einsum('ij,ij->i', user_factors[user_index], menu_factors[menu_index]) / np.sqrt(FACTORS)
+    bias = rng.normal(0, 0.5, size=num_users)[user_index]
+    noise = rng.normal(0, 0.5, size=len(user_index))
+    ratings = np.clip(np.rint(3 + affinity + bias + noise), 1, 5).astype(np.int8)
+    return user_index + 1, menu_index + 1, ratings
+
+
+def timed_lookups(func, keys, repeat):
+    """1回あたりの平均時間（マイクロ秒）"""
+    started = time.perf_counter()
+    for i in range(repeat):
+        func(keys[i % len(keys)])
+    return (time.perf_counter() - started) * 1_000_000 / repeat
+
+
+def hit_rate(user_ids, menu_ids, ratings, menus, args):
+    """(協調フィルタリングのhit rate, 人気順のhit rate)"""
+    rng = np.random.default_rng(args.seed + 1)
+    liked = np.nonzero(ratings >= 4)[0]
+    # 1人1件まで、高評価のレビューを隠す
+    hidden = rng.permutation(liked)
+    hidden = hidden[np.unique(user_ids[hidden], return_index=True)[1]]
+    hidden = rng.choice(hidden, size=min(args.holdout, len(hidden)), replace=False)
+    keep = np.ones(len(user_ids), dtype=bool)
+    keep[hidden] = False
+
+    state = build_recommendations(user_ids[keep], menu_ids[keep], ratings[keep], menus,
+                                  args.neighbors, args.results)
+    user_rows = np.searchsorted(state['user_ids'], user_ids[hidden])
+    top = state['for_user'][user_rows]
+    recommended = np.where(top >= 0, state['menu_ids'][top], -1)
+    cf_hits = (recommended == menu_ids[hidden][:, None]).any(axis=1).mean()
+
+    # 比較: 高評価の多い順に、まだレビューしていないメニューを勧める
+    counts = np.bincount(menu_ids[keep][ratings[keep] >= 4], minlength=len(menus[0]) + 1)
+    order = np.argsort(-counts, kind='stable')
+    seen = {}
+    for user_id, menu_id in zip(user_ids[keep].tolist(), menu_ids[keep].tolist()):
+        seen.setdefault(user_id, set()).add(menu_id)
+    popular_hits = 0
+    for user_id, menu_id in zip(user_ids[hidden].tolist(), menu_ids[hidden].tolist()):
+        candidates = [m for m in order[:args.results + len(seen.get(user_id, ()))].tolist()
+                      if m > 0 and m not in seen.get(user_id, ())][:args.results]
+        popular_hits += menu_id in candidates
+    return cf_hits, popular_hits / len(hidden)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--menus', type=int, default=1000)
+    parser.add_argument('--reviews-per-user', type=int, default=20)
+    parser.add_argument('--neighbors', type=int, default=20)
+    parser.add_argument('--results', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=100000, help='表示1回分の引く処理の回数')
+    parser.add_argument('--holdout', type=int, default=2000, help='hit rate で隠すレビュー数（0で省略）')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    user_ids, menu_ids, ratings = synthetic_ratings(args.users, args.menus, args.reviews_per_user, args.seed)
+    menus = (
+        np.arange(1, args.menus + 1, dtype=np.int64),
+        [f'メニュー{i}' for i in range(1, args.menus + 1)],
+        np.ones(args.menus, dtype=bool),
+    )
+    print(f'{args.users:,} users x {args.menus:,} menus, {len(ratings):,} reviews')
+
+    tracemalloc.start()
+    state = build_recommendations(user_ids, menu_ids, ratings, menus, args.neighbors, args.results)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"build:          {state['build_seconds']:.2f} s (peak {peak / 1024 / 1024:.0f} MiB)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recommender = Recommender(os.path.join(tmp, 'recommendations.joblib'), args.neighbors, args.results)
+        started = time.perf_counter()
+        recommender._save(state)
+        save_seconds = time.perf_counter() - started
+        size = os.path.getsize(recommender.path)
+
+        # 別のワーカーが保存済みのファイルを読み込む場合
+        loader = Recommender(recommender.path, args.neighbors, args.results)
+        started = time.perf_counter()
+        loader._reload_if_changed()
+        load_seconds = time.perf_counter() - started
+    print(f'save:           {save_seconds:.2f} s ({size / 1024 / 1024:.1f} MiB)')
+    print(f'load:           {load_seconds:.2f} s')
+
+    menu_keys = menus[0].tolist()
+    user_keys = np.random.default_rng(args.seed).permutation(state['user_ids']).tolist()
+    print(f'similar_menus:  {timed_lookups(loader.similar_menus, menu_keys, args.repeat):.2f} us')
+    print(f'for_user:       {timed_lookups(loader.for_user, user_keys, args.repeat):.2f} us')
+
+    if args.holdout:
+        cf, popular = hit_rate(user_ids, menu_ids, ratings, menus, args)
+        print(f'hit@{args.results}:         {cf:.3f} (item-item) / {popular:.3f} (popular)')
+
+
+if __name__ == '__main__':
+    main()
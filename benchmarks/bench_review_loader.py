@@ -0,0 +1,84 @@
+"""
+分析用DataFrame読み込みのベンチマーク
+一時DBに大量のレビューを作り、load_review_frame() の処理時間とメモリ使用量を計測する
+
+使い方:
+    python benchmarks/bench_review_loader.py --reviews 1000000
+    python benchmarks/bench_review_loader.py --reviews 100000 --orm  # 従来のORM方式と比較
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import create_app  # noqa: E402
+from models import db, Review  # noqa: E402
+from services.analysis_data import load_review_frame  # noqa: E402
+from insert_dummy_data import generate_data  # noqa: E402
+
+
+def load_with_orm():
+    """従来方式: ORMオブジェクトを組み立ててからDataFrameにする"""
+    import pandas as pd
+    review_data = []
+    for r in Review.query.all():
+        review_data.append({
+            'menu_id': r.menu_id,
+            'menu_name': r.menu.name,
+            'category': r.menu.category.name,
+            'price': r.menu.price,
+            'rating': r.rating,
+            'taste_rating': r.taste_rating or 0,
+            'volume_rating': r.volume_rating or 0,
+            'price_rating': r.price_rating or 0,
+            'user_id': r.user_id
+        })
+    return pd.DataFrame(review_data)
+
+
+def measure(label, loader):
+    """処理時間・ピークメモリ・DataFrameのサイズを表示"""
+    # tracemallocは処理を遅くするので、時間とメモリは別々に計測する
+    db.session.expunge_all()
+    start = time.perf_counter()
+    df = loader()
+    elapsed = time.perf_counter() - start
+    frame_bytes = df.memory_usage(deep=True).sum()
+    rows = len(df)
+    del df
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    loader()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<12} rows={rows:>9,}  time={elapsed:7.2f}s  '
+          f'peak={peak / 2**20:8.1f}MiB  frame={frame_bytes / 2**20:7.1f}MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reviews', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--menus', type=int, default=200)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--orm', action='store_true', help='従来のORM方式も計測する')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}'})
+        with app.app_context():
+            db.create_all()
+            generate_data(args.users, args.menus, args.reviews, seed=0)
+
+            measure('columnar', lambda: load_review_frame(chunk_size=args.chunk_size))
+            if args.orm:
+                measure('orm', load_with_orm)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+レビューの全文検索（services/search.py）のベンチマーク
+よくある語（多くのレビューに一致する語）で、1ページ目と深いページの表示にかかる時間を、
+一致した全件を関連度順に並べる場合（RANKED_CANDIDATES を無制限にした場合）と比べる
+
+使い方:
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --reviews 200000,1000000 --terms ちょうど,美味しい --repeat 20
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import text  # noqa: E402
+from main import create_app, init_database  # noqa: E402
+from models import db  # noqa: E402
+from insert_dummy_data import generate_data  # noqa: E402
+from services import search  # noqa: E402
+
+
+def latencies(func, repeat):
+    """(p50, p95) ミリ秒"""
+    values = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        values.append((time.perf_counter() - started) * 1000)
+    values.sort()
+    return statistics.median(values), values[min(len(values) - 1, int(len(values) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reviews', default='200000,1000000', help='レビュー数（カンマ区切り）')
+    parser.add_argument('--menus', type=int, default=500)
+    parser.add_argument('--terms', default='ちょうど,美味しい,リピート', help='検索する語（カンマ区切り）')
+    parser.add_argument('--deep-page', type=int, default=100, help='深いページとして計測するページ番号')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    capped = search.RANKED_CANDIDATES
+    print(f"{'reviews':>10} {'term':<8} {'matches':>9} {'mode':<8} "
+          f"{'p1 p50':>8} {'p1 p95':>8} {'deep p50':>9} {'deep p95':>9}")
+    for num_reviews in (int(value) for value in args.reviews.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+                'RATING_MODEL_PATH': os.path.join(tmp, 'rating_model.joblib'),
+                'RECOMMENDER_PATH': os.path.join(tmp, 'recommendations.joblib'),
+            })
+            # 全文検索の索引はマイグレーションで作る
+            init_database(app)
+            with app.app_context():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_data(max(100, num_reviews // 20), args.menus, num_reviews)
+
+                for term in args.terms.split(','):
+                    matches = db.session.execute(
+                        text('SELECT count(*) FROM reviews_fts WHERE reviews_fts MATCH :term'), {'term': f'"{term}"'}
+                    ).scalar()
+                    # 一致した全件を採点する場合（比較用）と、新しい一致だけを採点する場合
+                    for mode, candidates in (('all', num_reviews + 1), ('capped', capped)):
+                        search.RANKED_CANDIDATES = candidates
+                        first = latencies(lambda: search.search_reviews(term, 1), args.repeat)
+                        deep = latencies(lambda: search.search_reviews(term, args.deep_page), args.repeat)
+                        print(f'{num_reviews:>10,} {term:<8} {matches:>9,} {mode:<8} '
+                              f'{first[0]:>8.1f} {first[1]:>8.1f} {deep[0]:>9.1f} {deep[1]:>9.1f}')
+                    search.RANKED_CANDIDATES = capped
+
+
+if __name__ == '__main__':
+    main()
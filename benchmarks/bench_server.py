@@ -0,0 +1,257 @@
+"""
+gunicornのワーカーの種類（SERVER_PROFILE）ごとの混在負荷のベンチマーク
+同じDBに対して gunicorn を起動し、クライアントのスレッドから一覧・詳細・API・レビュー投稿・分析・ログインを
+決まった割合で送り続け、リクエスト数/秒とレイテンシ（全体・種類ごと）・エラー数を比べる
+（sync と threaded はワーカー数が同じで、threaded は1ワーカーあたり SERVER_THREADS 本のスレッドで処理する）
+
+プロファイル名に :N を付けると PROFILE_SAMPLE_EVERY=N（N回に1回のリクエストのスタックを採取）で起動し、
+プロファイラの負荷も比べられる（例: threaded:10）
+
+使い方:
+    python benchmarks/bench_server.py
+    python benchmarks/bench_server.py --profiles sync,threaded,threaded:10 --workers 2 --clients 16 --seconds 20
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from main import create_app  # noqa: E402
+from models import db, Menu, User  # noqa: E402
+from insert_dummy_data import generate_data  # noqa: E402
+
+# generate_data() で作られるユーザーのパスワード
+PASSWORD = 'password123'
+
+# リクエストの種類 → 割合（%）
+MIX = {
+    'index': 40,
+    'menu_detail': 25,
+    'api_menus': 10,
+    'post_review': 10,
+    'login': 10,
+    'analysis': 5,
+}
+
+
+def free_port():
+    with contextlib.closing(socket.socket()) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))] if values else float('nan')
+
+
+def prepare_database(tmp, args):
+    """ベンチマーク用のDBを作り、(ユーザー名のリスト, メニューIDのリスト) を返す"""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+        'RATING_MODEL_PATH': os.path.join(tmp, 'rating_model.joblib'),
+        'RECOMMENDER_PATH': os.path.join(tmp, 'recommendations.joblib'),
+        'PASSWORD_HASH_METHOD': args.method,
+    })
+    with app.app_context():
+        db.create_all()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_data(args.users, args.menus, args.reviews, seed=args.seed)
+        # ログインのたびに作り直さないよう、全ユーザーを計測する方式のハッシュにそろえる
+        password_hash = app.extensions['password_hasher'].hash(PASSWORD)
+        User.query.update({User.password_hash: password_hash})
+        db.session.commit()
+        # おすすめは事前に作っておく（計測中にバックグラウンドで作り直さない）
+        app.extensions['recommender'].refresh()
+        usernames = [name for (name,) in db.session.query(User.username).order_by(User.id)]
+        menu_ids = [menu_id for (menu_id,) in db.session.query(Menu.id)]
+    return usernames, menu_ids
+
+
+def start_server(tmp, name, args):
+    """gunicornを起動し、応答するまで待つ（(プロセス, ポート) を返す）"""
+    profile, _, sample_every = name.partition(':')
+    port = free_port()
+    overrides = {
+        'RATING_MODEL_PATH': os.path.join(tmp, 'rating_model.joblib'),
+        'RECOMMENDER_PATH': os.path.join(tmp, 'recommendations.joblib'),
+        'PROFILE_DIR': os.path.join(tmp, 'profiles'),
+    }
+    env = dict(
+        os.environ,
+        DATABASE_URL=f'sqlite:///{os.path.join(tmp, "bench.db")}',
+        SERVER_PROFILE=profile,
+        PASSWORD_HASH_METHOD=args.method,
+        PROFILE_SAMPLE_EVERY=sample_every or '0',
+    )
+    if args.threads:
+        env['SERVER_THREADS'] = str(args.threads)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', f'main:create_app({overrides!r})',
+         '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers), '--log-level', 'warning'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            status, _, _ = send(port, 'GET', '/login')
+            if status == 200:
+                return process, port
+        except OSError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicornが起動できませんでした（{name}）')
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f'gunicornが応答しません（{name}）')
+
+
+def send(port, method, path, cookie=None, form=None):
+    """1リクエストを送る（ワーカーの種類に関係なく、毎回新しい接続を使う）→ (ステータス, Set-Cookie, 本文の長さ)"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        headers = {'Connection': 'close'}
+        body = None
+        if cookie:
+            headers['Cookie'] = cookie
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        length = len(response.read())
+        return response.status, response.getheader('Set-Cookie'), length
+    finally:
+        connection.close()
+
+
+def login(port, username):
+    status, set_cookie, _ = send(port, 'POST', '/login', form={'username': username, 'password': PASSWORD})
+    if status != 302 or not set_cookie:
+        raise RuntimeError(f'ログインできませんでした（{status}）')
+    return set_cookie.split(';', 1)[0]
+
+
+def run_clients(port, usernames, menu_ids, args):
+    """クライアントのスレッドで混在負荷をかけ、種類ごとのレイテンシ（ミリ秒）とエラー数を返す"""
+    latencies = {kind: [] for kind in MIX}
+    errors = {kind: 0 for kind in MIX}
+    lock = threading.Lock()
+    start = threading.Event()
+    measure_from = [0.0]
+    deadline = [0.0]
+
+    def client(index):
+        rng = random.Random(args.seed + index)
+        username = usernames[index % len(usernames)]
+        cookie = login(port, username)
+        kinds = rng.choices(list(MIX), weights=list(MIX.values()), k=100000)
+        local = {kind: [] for kind in MIX}
+        local_errors = {kind: 0 for kind in MIX}
+        start.wait()
+        i = 0
+        while time.perf_counter() < deadline[0]:
+            kind = kinds[i % len(kinds)]
+            i += 1
+            menu_id = rng.choice(menu_ids)
+            began = time.perf_counter()
+            try:
+                if kind == 'index':
+                    status, _, _ = send(port, 'GET', '/', cookie)
+                elif kind == 'menu_detail':
+                    status, _, _ = send(port, 'GET', f'/menus/{menu_id}', cookie)
+                elif kind == 'api_menus':
+                    status, _, _ = send(port, 'GET', '/api/v1/menus', cookie)
+                elif kind == 'post_review':
+                    status, _, _ = send(port, 'POST', f'/menus/{menu_id}/review', cookie,
+                                        form={'rating': rng.randint(1, 5), 'taste_rating': rng.randint(1, 5),
+                                              'comment': 'ベンチマーク'})
+                elif kind == 'login':
+                    status, set_cookie, _ = send(port, 'POST', '/login', form={
+                        'username': username, 'password': PASSWORD
+                    })
+                    if set_cookie:
+                        cookie = set_cookie.split(';', 1)[0]
+                else:
+                    status, _, _ = send(port, 'GET', '/analysis', cookie)
+                ok = status < 400
+            except OSError:
+                ok = False
+            finished = time.perf_counter()
+            # 起動直後（ワーカーごとの初回の読み込み・学習）は計測しない
+            if began >= measure_from[0]:
+                if ok:
+                    local[kind].append((finished - began) * 1000)
+                else:
+                    local_errors[kind] += 1
+        with lock:
+            for kind in MIX:
+                latencies[kind] += local[kind]
+                errors[kind] += local_errors[kind]
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    now = time.perf_counter()
+    measure_from[0] = now + args.warmup
+    deadline[0] = measure_from[0] + args.seconds
+    start.set()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default='sync,threaded', help='比較するSERVER_PROFILE（カンマ区切り。:Nでプロファイラあり）')
+    parser.add_argument('--workers', type=int, default=2, help='gunicornのワーカー数（全プロファイル共通）')
+    parser.add_argument('--threads', type=int, default=0, help='SERVER_THREADS（0ならプロファイルの既定値）')
+    parser.add_argument('--clients', type=int, default=16, help='同時にリクエストを送るクライアントのスレッド数')
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=10, help='計測しない最初の秒数（ワーカーごとの初回の読み込み）')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--menus', type=int, default=100)
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--method', default='scrypt:32768:8:1', help='パスワードハッシュの方式')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        usernames, menu_ids = prepare_database(tmp, args)
+        for name in args.profiles.split(','):
+            process, port = start_server(tmp, name, args)
+            try:
+                report.append((name, *run_clients(port, usernames, menu_ids, args)))
+            finally:
+                process.terminate()
+                process.wait()
+
+    print(f'ワーカー {args.workers} / クライアント {args.clients}スレッド / {args.seconds:g}秒（最初の{args.warmup:g}秒を除く）')
+    print(f"{'profile':<14} {'req/s':>7} {'p50':>7} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for name, latencies, errors in report:
+        values = [value for kind in MIX for value in latencies[kind]]
+        print(f'{name:<14} {len(values) / args.seconds:>7.1f} '
+              f'{statistics.median(values) if values else float("nan"):>7.1f} '
+              f'{percentile(values, 0.95):>8.1f} {percentile(values, 0.99):>8.1f} {sum(errors.values()):>7}')
+    print()
+    print(f"{'p95 (ms)':<14} " + ' '.join(f'{kind:>12}' for kind in MIX))
+    for name, latencies, _ in report:
+        print(f'{name:<14} ' + ' '.join(f'{percentile(latencies[kind], 0.95):>12.1f}' for kind in MIX))
+
+
+if __name__ == '__main__':
+    main()
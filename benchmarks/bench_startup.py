@@ -0,0 +1,113 @@
+"""
+起動時間（コールドスタート）のベンチマークとimport時間のプロファイル
+毎回新しいPythonプロセスで main を読み込み、最初の /login の応答までの時間を計測する
+（プロセスの起動からの時間。1回目は空のDBのためテーブル作成・マイグレーションを含む）
+--preload を付けると PRELOAD_ANALYSIS=1（分析用のライブラリを起動時に読み込む）でも計測して比べる
+
+続けて python -X importtime の結果をパッケージごとに集計し、import時間の大きい順に表示する
+分析用のライブラリ（pandas・matplotlib・scikit-learn など）が起動時に読み込まれていれば警告する
+
+使い方:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --top 20 --preload
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 起動時に読み込まれていないはずのライブラリ（最初の分析ページ・書き出しで読み込む）
+LAZY_PACKAGES = ('numpy', 'pandas', 'matplotlib', 'sklearn', 'scipy', 'joblib', 'pyarrow')
+
+# 子プロセスで実行する: import main → 最初の /login → 各時点の時刻を出力
+CHILD = '''
+import time
+imported_from = time.perf_counter()
+import main
+imported = time.perf_counter()
+response = main.app.test_client().get('/login')
+assert response.status_code == 200, response.status_code
+print(time.time(), imported - imported_from, time.perf_counter() - imported)
+'''
+
+
+def cold_start(env):
+    """(プロセス起動から最初の応答までの秒数, import main の秒数, /login の秒数)"""
+    started = time.time()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    responded, import_seconds, request_seconds = (float(value) for value in output.split())
+    return responded - started, import_seconds, request_seconds
+
+
+def import_times(env):
+    """python -X importtime の結果を (モジュール名, 自身の時間, 累計時間)（マイクロ秒）のリストにする"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=ROOT, env=env, check=True,
+        capture_output=True, text=True
+    ).stderr
+    results = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        results.append((name.strip(), int(self_us), int(cumulative_us)))
+    return results
+
+
+def report_cold_start(label, env, runs):
+    totals, imports, requests = [], [], []
+    for i in range(runs):
+        total, import_seconds, request_seconds = cold_start(env)
+        if i == 0:
+            # 1回目は空のDBからの起動（create_all・マイグレーションあり）
+            print(f"{label + ' (new db)':<24} {total * 1000:>9.0f} {import_seconds * 1000:>9.0f} {request_seconds * 1000:>9.0f}")
+            continue
+        totals.append(total)
+        imports.append(import_seconds)
+        requests.append(request_seconds)
+    if totals:
+        print(f'{label:<24} {statistics.median(totals) * 1000:>9.0f} {statistics.median(imports) * 1000:>9.0f} '
+              f'{statistics.median(requests) * 1000:>9.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='起動の回数（1回目は新規DB、2回目以降の中央値も表示）')
+    parser.add_argument('--top', type=int, default=15, help='表示するパッケージ数')
+    parser.add_argument('--preload', action='store_true', help='PRELOAD_ANALYSIS=1 でも計測する')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(tmp, "bench.db")}', PRELOAD_ANALYSIS='0')
+        print(f"{'':<24} {'total ms':>9} {'import ms':>9} {'/login ms':>9}")
+        report_cold_start('lazy', env, args.runs)
+        if args.preload:
+            os.remove(os.path.join(tmp, 'bench.db'))
+            report_cold_start('PRELOAD_ANALYSIS=1', dict(env, PRELOAD_ANALYSIS='1'), args.runs)
+
+        # パッケージ（先頭の名前）ごとに自身の時間を合計する
+        modules = import_times(env)
+        packages = {}
+        for name, self_us, _ in modules:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + self_us
+        print()
+        print(f"{'package':<28} {'ms':>8}")
+        for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f'{package:<28} {self_us / 1000:>8.1f}')
+        print(f"{'total':<28} {sum(packages.values()) / 1000:>8.1f}")
+
+        loaded = [package for package in LAZY_PACKAGES if package in packages]
+        if loaded:
+            print(f"\n警告: 起動時に分析用のライブラリが読み込まれています: {', '.join(loaded)}")
+
+
+if __name__ == '__main__':
+    main()
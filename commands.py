@@ -0,0 +1,160 @@
+"""
+flaskコマンド（flask --app main <コマンド名>）の定義
+"""
+import csv
+import click
+from flask import current_app
+from models import db, User
+from services.menu_stats import rebuild_daily_stats, rebuild_menu_stats
+from services.migrations import LATEST_VERSION, migrate, schema_version
+from services.query_plans import ALLOWED_SCANS, check_query_plans, first_user_id
+from services.render_pool import RenderPool
+from services.review_export import FORMATS as EXPORT_FORMATS, ReviewExport, export_criteria, parquet_available
+from services.review_import import FORMATS, MAX_CHUNK_SIZE, detect_format, import_reviews
+
+
+def register_commands(app):
+    """アプリケーションにCLIコマンドを登録"""
+    
+    @app.cli.command('rebuild-menu-stats')
+    def rebuild_menu_stats_command():
+        """reviewsテーブルからメニューごとの集計と評価の組み合わせごとの件数を作り直す"""
+        rebuild_menu_stats()
+        click.echo('メニュー集計を再構築しました')
+    
+    @app.cli.command('backfill-daily-stats')
+    def backfill_daily_stats_command():
+        """reviews.created_at から日別集計を作り直す"""
+        rebuild_daily_stats()
+        click.echo('日別集計を再構築しました')
+    
+    @app.cli.command('train-rating-model')
+    @click.option('--incremental', is_flag=True, help='前回の学習以降に投稿・編集されたレビューだけを追加学習する')
+    def train_rating_model_command(incremental):
+        """評価の回帰モデルを学習して保存する（既定は全レビューから学習し直す）"""
+        model = current_app.extensions['rating_model']
+        if not incremental:
+            state = model.fit()
+            click.echo(f"{state['trained_rows']}件で学習しました（{state['fit_seconds']:.2f}秒）")
+            return
+        state, added = model.update()
+        if added is None:
+            click.echo(f"{state['trained_rows']}件で学習し直しました（{state['fit_seconds']:.2f}秒）")
+        elif added == 0:
+            click.echo(f"追加で学習するレビューはありません（学習件数: {state['trained_rows']}件）")
+        else:
+            click.echo(f"{added}件を追加学習しました（学習件数: {state['trained_rows']}件・{state['update_seconds']:.2f}秒）")
+
+    @app.cli.command('build-recommendations')
+    @click.option('--if-changed', is_flag=True, help='前回の作成後にレビュー・メニューが変わっている場合だけ作り直す')
+    def build_recommendations_command(if_changed):
+        """全レビューからメニューのおすすめを作り直して保存する"""
+        recommender = current_app.extensions['recommender']
+        if if_changed and not recommender.is_outdated():
+            click.echo('前回の作成後にレビュー・メニューは変わっていません')
+            return
+        state = recommender.refresh()
+        if state is None:
+            raise click.ClickException('他のプロセスがおすすめを作成中です。しばらくしてから実行してください')
+        click.echo(f"ユーザー{len(state['user_ids'])}人・メニュー{len(state['menu_ids'])}件・"
+                   f"レビュー{state['reviews']}件から作成しました（{state['build_seconds']:.2f}秒）")
+
+    @app.cli.command('set-admin')
+    @click.argument('username')
+    @click.option('--revoke', is_flag=True, help='管理者権限を外す')
+    def set_admin_command(username, revoke):
+        """ユーザーに管理者権限（SQL統計の閲覧など）を付ける"""
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'ユーザー {username} が見つかりません')
+        user.is_admin = not revoke
+        db.session.commit()
+        click.echo(f"{username} の管理者権限を{'外しました' if revoke else '付けました'}")
+    
+    @app.cli.command('migrate-db')
+    def migrate_db_command():
+        """既存のデータベースに未適用のマイグレーションを適用する"""
+        db.create_all()
+        applied = migrate()
+        for version, description in applied:
+            click.echo(f'{version}: {description}')
+        with db.engine.connect() as connection:
+            click.echo(f'スキーマのバージョン: {schema_version(connection)}（最新: {LATEST_VERSION}）')
+    
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', is_flag=True, help='全SQLの実行計画を表示する')
+    def check_query_plans_command(verbose):
+        """主要画面のSQLを EXPLAIN QUERY PLAN で調べ、全件走査があれば失敗する"""
+        user_id = first_user_id()
+        if user_id is None:
+            raise click.ClickException('ユーザーがいません（先にダミーデータを投入してください）')
+        # グラフはプロセスプールを使わずこのプロセス内で描画する
+        current_app.extensions['chart_pool'] = RenderPool(current_app.extensions['chart_cache'], max_workers=0)
+        
+        failures = 0
+        for path, statement, plan, scans in check_query_plans(current_app, user_id):
+            if scans:
+                failures += 1
+            if scans or verbose:
+                click.echo(f"{'NG' if scans else 'OK'} {path}\n  {statement}")
+                for detail in plan:
+                    click.echo(f'    {detail}')
+        if failures:
+            raise click.ClickException(f'{failures}件のSQLでテーブルの全件走査があります')
+        allowed = '、'.join(ALLOWED_SCANS)
+        click.echo(f'全件走査はありません（{allowed} は対象外）')
+    
+    @app.cli.command('import-reviews')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'format_', type=click.Choice(FORMATS), help='ファイルの形式（省略時は拡張子から判断）')
+    @click.option('--encoding', default='utf-8-sig', show_default=True, help='ファイルの文字コード')
+    @click.option('--chunk-size', type=click.IntRange(1, MAX_CHUNK_SIZE), default=1000, show_default=True,
+                  help='1回のトランザクションで取り込む行数')
+    @click.option('--rejects', type=click.Path(dir_okay=False, writable=True), help='不正な行（行番号と理由）を書き出すCSV')
+    def import_reviews_command(path, format_, encoding, chunk_size, rejects):
+        """CSV / JSONL のレビューを一括で追加・更新する（同じユーザー・メニューのレビューは上書き）"""
+        reject_file = open(rejects, 'w', encoding='utf-8', newline='') if rejects else None
+        try:
+            on_reject = None
+            if reject_file is not None:
+                writer = csv.writer(reject_file)
+                writer.writerow(['line', 'reason'])
+                on_reject = lambda line_number, reason: writer.writerow([line_number, reason])
+            with open(path, encoding=encoding, newline='') as stream:
+                report = import_reviews(stream, format_ or detect_format(path), chunk_size, on_reject)
+        finally:
+            if reject_file is not None:
+                reject_file.close()
+        
+        click.echo(f'{report.rows:,}行を{report.seconds:.1f}秒で処理しました（{report.rows_per_second:,.0f}行/秒）')
+        click.echo(f'追加: {report.inserted:,}件 / 更新: {report.updated:,}件 / 不正: {report.rejected:,}件')
+        if report.rejected and reject_file is None:
+            for line_number, reason in report.rejects[:20]:
+                click.echo(f'  {line_number}行目: {reason}')
+            if report.rejected > 20:
+                click.echo('  ...（全件は --rejects で書き出せます）')
+        elif reject_file is not None:
+            click.echo(f'不正な行は {rejects} に書き出しました')
+    
+    @app.cli.command('export-reviews')
+    @click.argument('path', type=click.Path(dir_okay=False, writable=True))
+    @click.option('--format', 'format_', type=click.Choice(EXPORT_FORMATS), help='ファイルの形式（省略時は拡張子から判断）')
+    @click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='この日以降の投稿')
+    @click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='この日までの投稿')
+    @click.option('--category-id', type=int, help='カテゴリで絞り込む')
+    @click.option('--menu-id', type=int, help='メニューで絞り込む')
+    def export_reviews_command(path, format_, start, end, category_id, menu_id):
+        """レビュー・メニュー・カテゴリを結合した生データをCSV / Parquetで書き出す"""
+        format_ = format_ or ('parquet' if path.lower().endswith('.parquet') else 'csv')
+        if format_ == 'parquet' and not parquet_available():
+            raise click.ClickException('Parquetでの書き出しには pyarrow が必要です')
+        export = ReviewExport(export_criteria(
+            start=start.date() if start else None,
+            end=end.date() if end else None,
+            category_id=category_id,
+            menu_id=menu_id,
+        ))
+        with open(path, 'wb') as f:
+            for chunk in export.chunks(format_):
+                f.write(chunk)
+        click.echo(f'{export.rows:,}件を{export.seconds:.1f}秒で書き出しました（{export.rows_per_second:,.0f}件/秒）: {path}')
@@ -0,0 +1,117 @@
+"""
+環境変数から読み込む設定とSQLiteのストレージプロファイル
+  DATABASE_URL       データベースのURL（既定: sqlite:///app.db → instance/app.db）
+  SECRET_KEY         セッション管理のための秘密鍵
+  STORAGE_PROFILE    'concurrent'（既定: WAL・同時アクセス向け）/ 'simple'（従来どおり）
+  SQLITE_BUSY_TIMEOUT_MS  ロック解除を待つ時間（ミリ秒）
+  PASSWORD_HASH_METHOD    パスワードハッシュの方式とコスト（werkzeugの形式。既定: scrypt:32768:8:1）
+  PRELOAD_ANALYSIS        '1' なら分析用のライブラリを起動時に読み込む（gunicorn --preload 用。既定: 最初の利用時）
+  PROFILE_SAMPLE_EVERY    エンドポイントごとに何回に1回のリクエストのスタックを採取するか（既定: 0 = 採取しない）
+  SERVER_PROFILE          'sync'（既定: 1ワーカー1リクエストずつ）/ 'threaded'（1ワーカーで複数スレッド）
+  SERVER_THREADS          threaded のときの1ワーカーあたりのスレッド数（既定: SERVER_PROFILES の値）
+"""
+import os
+
+DEFAULT_DATABASE_URL = 'sqlite:///app.db'
+DEFAULT_SECRET_KEY = 'abc1234'
+
+# プロファイル名 → 設定
+#   pragmas: 接続ごとに実行するPRAGMA
+#   write_pool / read_pool: 書き込み用・読み込み用エンジンのプール設定（read_poolがNoneなら読み込み用エンジンを作らない）
+STORAGE_PROFILES = {
+    'simple': {
+        'pragmas': {},
+        'write_pool': {},
+        'read_pool': None,
+    },
+    'concurrent': {
+        'pragmas': {
+            # 書き込み中も読み込みをブロックしない
+            'journal_mode': 'WAL',
+            # WALではチェックポイント時だけfsyncすれば十分
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,  # 負の値はKiB単位（64MiB）
+            'temp_store': 'MEMORY',
+        },
+        # SQLiteの書き込みは1本ずつなので、接続は少なく保ちロック待ちはbusy_timeoutに任せる
+        'write_pool': {'pool_size': 4, 'max_overflow': 4, 'pool_timeout': 10},
+        'read_pool': {'pool_size': 8, 'max_overflow': 8, 'pool_timeout': 10},
+    },
+}
+
+# gunicornのワーカーの種類（gunicorn.conf.py が参照する）
+#   worker_class: gunicornのワーカークラス
+#   threads: 1ワーカーで同時に処理するリクエスト数の既定値
+#   password_hash_workers: PASSWORD_HASH_WORKERS の既定値。ハッシュ計算のプールと待ちの上限はワーカーのプロセスごとなので、
+#     1リクエストずつ処理する sync ではプロセス数がそのまま同時計算数の上限になり、プールを使っても制限にならない
+SERVER_PROFILES = {
+    'sync': {'worker_class': 'sync', 'threads': 1, 'password_hash_workers': 0},
+    # DB・パスワードのハッシュ計算（GILを解放する）を待つ間に他のリクエストを処理する
+    'threaded': {'worker_class': 'gthread', 'threads': 8, 'password_hash_workers': 2},
+}
+
+# リクエスト以外でDBに接続するスレッド（おすすめの作成など）の分として、プールに加える接続数
+BACKGROUND_CONNECTIONS = 2
+
+
+def load_config(environ=None):
+    """環境変数からアプリケーション設定を作る"""
+    environ = os.environ if environ is None else environ
+    profile = environ.get('STORAGE_PROFILE', 'concurrent')
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f'STORAGE_PROFILE は {", ".join(STORAGE_PROFILES)} のいずれかを指定してください: {profile}')
+    server_profile = environ.get('SERVER_PROFILE', 'sync')
+    if server_profile not in SERVER_PROFILES:
+        raise ValueError(f'SERVER_PROFILE は {", ".join(SERVER_PROFILES)} のいずれかを指定してください: {server_profile}')
+    return {
+        'SECRET_KEY': environ.get('SECRET_KEY', DEFAULT_SECRET_KEY),
+        'SQLALCHEMY_DATABASE_URI': environ.get('DATABASE_URL', DEFAULT_DATABASE_URL),
+        'STORAGE_PROFILE': profile,
+        'SQLITE_BUSY_TIMEOUT_MS': int(environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        # 変更すると、古い設定のハッシュは各ユーザーの次回ログイン時に作り直される
+        'PASSWORD_HASH_METHOD': environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+        'PRELOAD_ANALYSIS': environ.get('PRELOAD_ANALYSIS', '0') == '1',
+        'PROFILE_SAMPLE_EVERY': int(environ.get('PROFILE_SAMPLE_EVERY', 0)),
+        'SERVER_PROFILE': server_profile,
+        'SERVER_THREADS': int(environ.get('SERVER_THREADS', SERVER_PROFILES[server_profile]['threads'])),
+    }
+
+
+def _pool_for_threads(pool, threads):
+    """1ワーカーの全スレッドが同時に接続を取れるプール設定（足りなければ max_overflow を増やす）"""
+    # 指定が無ければSQLAlchemyの既定（5 + 10）
+    pool_size = pool.get('pool_size', 5)
+    max_overflow = pool.get('max_overflow', 10)
+    needed = threads + BACKGROUND_CONNECTIONS
+    if pool_size + max_overflow >= needed:
+        return dict(pool)
+    return dict(pool, pool_size=pool_size, max_overflow=needed - pool_size)
+
+
+def apply_storage_profile(config):
+    """STORAGE_PROFILE からエンジン設定（SQLALCHEMY_ENGINE_OPTIONS / SQLITE_READ_ENGINE_OPTIONS）を組み立てる
+
+    db.init_app() より前に、上書き後の設定に対して呼び出す
+    """
+    profile = STORAGE_PROFILES[config['STORAGE_PROFILE']]
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    # インメモリDBは接続ごとに別のDBになるためプロファイルを適用しない
+    if not uri.startswith('sqlite') or uri in ('sqlite://', 'sqlite:///:memory:'):
+        return
+
+    busy_timeout_ms = config['SQLITE_BUSY_TIMEOUT_MS']
+    pragmas = dict(profile['pragmas'], busy_timeout=busy_timeout_ms)
+    config['SQLITE_PRAGMAS'] = pragmas
+
+    # sqlite3モジュール側のロック待ちもbusy_timeoutに揃える
+    connect_args = {'timeout': busy_timeout_ms / 1000}
+    # スレッドで処理するワーカーでは、スレッドごとのセッションが同時に接続を取るためプールを足りる大きさにする
+    threads = config.get('SERVER_THREADS', 1)
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+        **_pool_for_threads(profile['write_pool'], threads), 'connect_args': connect_args,
+    })
+    if profile['read_pool'] is not None:
+        config.setdefault('SQLITE_READ_ENGINE_OPTIONS', {
+            **_pool_for_threads(profile['read_pool'], threads), 'connect_args': connect_args,
+        })
@@ -0,0 +1,14 @@
+"""
+gunicornの設定（gunicorn main:app で自動的に読み込まれる）
+SERVER_PROFILE でワーカーの種類を選ぶ（config.py の SERVER_PROFILES）
+  sync      1ワーカーで1リクエストずつ処理する（既定。従来どおり）
+  threaded  1ワーカーで SERVER_THREADS 本のスレッドで処理する（DBの読み書き・パスワードのハッシュ計算を
+            待つ間に他のリクエストを処理する。セッションはリクエストごと、DBの接続はスレッド数に合わせたプールから取る）
+ワーカー数は --workers か環境変数 WEB_CONCURRENCY で指定する
+"""
+from config import SERVER_PROFILES, load_config
+
+_config = load_config()
+
+worker_class = SERVER_PROFILES[_config['SERVER_PROFILE']]['worker_class']
+threads = _config['SERVER_THREADS']
@@ -1,16 +1,113 @@
 """
 ダミーデータ挿入スクリプト
 テスト用のユーザー、カテゴリ、メニュー、レビューを作成
+
+使い方:
+    python insert_dummy_data.py
+        講義用の少量データ（ユーザー30人・メニュー23品目・レビュー約400-500件）
+    DATABASE_URL=sqlite:///loadtest.db python insert_dummy_data.py --users 50000 --menus 500 --reviews 10000000 --seed 1
+        負荷試験・ベンチマーク用の大量データ（開発用の instance/app.db とは別のファイルに作る。
+        相対パスは instance/ 配下で、instance/ はリポジトリに含めない）
 """
+import argparse
+import time
 from main import create_app
-from models import db, User, Category, Menu, Review
+from models import db, User, Category, Menu, MenuDailyStat, MenuStat, RatingCombinationStat, Review
+from services.menu_stats import rebuild_daily_stats, rebuild_menu_stats
+from services.search import search_index_suspended
 from werkzeug.security import generate_password_hash
+import numpy as np
 import random
 from datetime import datetime, timedelta
 
-app = create_app()
+CATEGORIES_DATA = [
+    {'name': '定食', 'description': '主菜・ご飯・味噌汁のセット'},
+    {'name': '丼もの', 'description': 'ご飯の上に具材を乗せたメニュー'},
+    {'name': '麺類', 'description': 'ラーメン、うどん、そば'},
+    {'name': 'カレー', 'description': '各種カレーライス'},
+    {'name': '軽食', 'description': 'おにぎり、パン、サンドイッチ'},
+    {'name': 'デザート', 'description': 'デザート・飲み物'}
+]
+
+MENUS_DATA = [
+    # 定食
+    {'name': '唐揚げ定食', 'description': 'ジューシーな唐揚げ5個', 'price': 550, 'category_id': 1},
+    {'name': '生姜焼き定食', 'description': '豚肉の生姜焼き', 'price': 600, 'category_id': 1},
+    {'name': '焼き魚定食', 'description': '日替わりの焼き魚', 'price': 580, 'category_id': 1},
+    {'name': 'ハンバーグ定食', 'description': 'デミグラスソースのハンバーグ', 'price': 620, 'category_id': 1},
+    {'name': 'チキン南蛮定食', 'description': 'タルタルソースたっぷり', 'price': 600, 'category_id': 1},
+
+    # 丼もの
+    {'name': 'ピリ辛そぼろ丼', 'description': '少しスパイシーなそぼろ丼', 'price': 450, 'category_id': 2},
+    {'name': 'ソースチキンカツ丼', 'description': 'ボリューム満点', 'price': 500, 'category_id': 2},
+    {'name': '豚の照り焼き丼', 'description': '味濃いめの豚肉', 'price': 400, 'category_id': 2},
+    {'name': '唐揚げおろし丼', 'description': '大きな唐揚げ', 'price': 550, 'category_id': 2},
+
+    # 麺類
+    {'name': '醤油ラーメン', 'description': 'あっさり醤油スープ', 'price': 480, 'category_id': 3},
+    {'name': '味噌ラーメン', 'description': '濃厚味噌スープ', 'price': 500, 'category_id': 3},
+    {'name': 'かけうどん', 'description': 'シンプルなうどん', 'price': 300, 'category_id': 3},
+    {'name': '天ぷらうどん', 'description': 'エビ天入りうどん', 'price': 450, 'category_id': 3},
+    {'name': 'ざるそば', 'description': '冷たいそば', 'price': 400, 'category_id': 3},
+
+    # カレー
+    {'name': 'カツカレー', 'description': 'とんかつのせカレー', 'price': 550, 'category_id': 4},
+    {'name': 'チキンカレー', 'description': '鶏肉のカレー', 'price': 450, 'category_id': 4},
+    {'name': '野菜カレー', 'description': '野菜たっぷりカレー', 'price': 400, 'category_id': 4},
+
+    # 軽食
+    {'name': 'おにぎりセット', 'description': 'おにぎり2個と味噌汁', 'price': 250, 'category_id': 5},
+    {'name': 'サンドイッチ', 'description': 'ハムとチーズのサンド', 'price': 300, 'category_id': 5},
+    {'name': '焼きそばパン', 'description': '学食の定番', 'price': 200, 'category_id': 5},
+
+    # デザート
+    {'name': 'プリン', 'description': '手作りプリン', 'price': 150, 'category_id': 6},
+    {'name': 'アイスクリーム', 'description': 'バニラアイス', 'price': 120, 'category_id': 6},
+    {'name': 'コーヒー', 'description': 'ホット/アイス', 'price': 100, 'category_id': 6},
+]
+
+COMMENTS_POSITIVE = [
+    '美味しかったです！',
+    'ボリュームがあって満足！',
+    'コスパ最高！',
+    '味付けがちょうど良い',
+    'また食べたい',
+    'お気に入りメニューです',
+    '量もちょうど良かった',
+    '値段の割に美味しい',
+    '定番で安心の味',
+    '友達にもおすすめしたい',
+    '期待以上でした',
+    'リピート確定です',
+    '毎週食べてます',
+    '最高の一品',
+    '文句なし！'
+]
 
-with app.app_context():
+COMMENTS_NEUTRAL = [
+    '普通に美味しい',
+    '可もなく不可もなく',
+    'まあまあかな',
+    '値段相応',
+    '悪くはない',
+    '普通の学食メニュー',
+    '標準的な味',
+    'たまに食べる分には良い'
+]
+
+COMMENTS_NEGATIVE = [
+    '少し物足りない',
+    '値段が高い気がする',
+    '味が薄い',
+    '量が少ない',
+    'もう少し改善してほしい',
+    '期待外れでした',
+    'もう注文しないかも'
+]
+
+
+def reset_database():
+    """テーブルを作成し、既存データを削除する"""
     # データベーステーブルを作成
     print("データベーステーブルを作成中...")
     db.create_all()
@@ -19,12 +116,18 @@ with app.app_context():
     # 既存データを削除
     print("\n既存データを削除中...")
     Review.query.delete()
+    MenuStat.query.delete()
+    MenuDailyStat.query.delete()
+    RatingCombinationStat.query.delete()
     Menu.query.delete()
     Category.query.delete()
     User.query.delete()
     db.session.commit()
     print("削除完了")
-    
+
+
+def insert_sample_data():
+    """講義用の少量データを作成"""
     # ユーザーを作成
     print("\nユーザーを作成中...")
     users = []
@@ -51,17 +154,8 @@ with app.app_context():
     
     # カテゴリを作成
     print("\nカテゴリを作成中...")
-    categories_data = [
-        {'name': '定食', 'description': '主菜・ご飯・味噌汁のセット'},
-        {'name': '丼もの', 'description': 'ご飯の上に具材を乗せたメニュー'},
-        {'name': '麺類', 'description': 'ラーメン、うどん、そば'},
-        {'name': 'カレー', 'description': '各種カレーライス'},
-        {'name': '軽食', 'description': 'おにぎり、パン、サンドイッチ'},
-        {'name': 'デザート', 'description': 'デザート・飲み物'}
-    ]
-    
     categories = []
-    for cat_data in categories_data:
+    for cat_data in CATEGORIES_DATA:
         category = Category(**cat_data)
         categories.append(category)
         db.session.add(category)
@@ -71,45 +165,8 @@ with app.app_context():
     
     # メニューを作成
     print("\nメニューを作成中...")
-    menus_data = [
-        # 定食
-        {'name': '唐揚げ定食', 'description': 'ジューシーな唐揚げ5個', 'price': 550, 'category_id': 1},
-        {'name': '生姜焼き定食', 'description': '豚肉の生姜焼き', 'price': 600, 'category_id': 1},
-        {'name': '焼き魚定食', 'description': '日替わりの焼き魚', 'price': 580, 'category_id': 1},
-        {'name': 'ハンバーグ定食', 'description': 'デミグラスソースのハンバーグ', 'price': 620, 'category_id': 1},
-        {'name': 'チキン南蛮定食', 'description': 'タルタルソースたっぷり', 'price': 600, 'category_id': 1},
-        
-        # 丼もの
-        {'name': 'ピリ辛そぼろ丼', 'description': '少しスパイシーなそぼろ丼', 'price': 450, 'category_id': 2},
-        {'name': 'ソースチキンカツ丼', 'description': 'ボリューム満点', 'price': 500, 'category_id': 2},
-        {'name': '豚の照り焼き丼', 'description': '味濃いめの豚肉', 'price': 400, 'category_id': 2},
-        {'name': '唐揚げおろし丼', 'description': '大きな唐揚げ', 'price': 550, 'category_id': 2},
-        
-        # 麺類
-        {'name': '醤油ラーメン', 'description': 'あっさり醤油スープ', 'price': 480, 'category_id': 3},
-        {'name': '味噌ラーメン', 'description': '濃厚味噌スープ', 'price': 500, 'category_id': 3},
-        {'name': 'かけうどん', 'description': 'シンプルなうどん', 'price': 300, 'category_id': 3},
-        {'name': '天ぷらうどん', 'description': 'エビ天入りうどん', 'price': 450, 'category_id': 3},
-        {'name': 'ざるそば', 'description': '冷たいそば', 'price': 400, 'category_id': 3},
-        
-        # カレー
-        {'name': 'カツカレー', 'description': 'とんかつのせカレー', 'price': 550, 'category_id': 4},
-        {'name': 'チキンカレー', 'description': '鶏肉のカレー', 'price': 450, 'category_id': 4},
-        {'name': '野菜カレー', 'description': '野菜たっぷりカレー', 'price': 400, 'category_id': 4},
-        
-        # 軽食
-        {'name': 'おにぎりセット', 'description': 'おにぎり2個と味噌汁', 'price': 250, 'category_id': 5},
-        {'name': 'サンドイッチ', 'description': 'ハムとチーズのサンド', 'price': 300, 'category_id': 5},
-        {'name': '焼きそばパン', 'description': '学食の定番', 'price': 200, 'category_id': 5},
-        
-        # デザート
-        {'name': 'プリン', 'description': '手作りプリン', 'price': 150, 'category_id': 6},
-        {'name': 'アイスクリーム', 'description': 'バニラアイス', 'price': 120, 'category_id': 6},
-        {'name': 'コーヒー', 'description': 'ホット/アイス', 'price': 100, 'category_id': 6},
-    ]
-    
     menus = []
-    for menu_data in menus_data:
+    for menu_data in MENUS_DATA:
         menu = Menu(**menu_data)
         menus.append(menu)
         db.session.add(menu)
@@ -119,45 +176,6 @@ with app.app_context():
     
     # レビューを作成
     print("\nレビューを作成中...")
-    comments_positive = [
-        '美味しかったです！',
-        'ボリュームがあって満足！',
-        'コスパ最高！',
-        '味付けがちょうど良い',
-        'また食べたい',
-        'お気に入りメニューです',
-        '量もちょうど良かった',
-        '値段の割に美味しい',
-        '定番で安心の味',
-        '友達にもおすすめしたい',
-        '期待以上でした',
-        'リピート確定です',
-        '毎週食べてます',
-        '最高の一品',
-        '文句なし！'
-    ]
-    
-    comments_neutral = [
-        '普通に美味しい',
-        '可もなく不可もなく',
-        'まあまあかな',
-        '値段相応',
-        '悪くはない',
-        '普通の学食メニュー',
-        '標準的な味',
-        'たまに食べる分には良い'
-    ]
-    
-    comments_negative = [
-        '少し物足りない',
-        '値段が高い気がする',
-        '味が薄い',
-        '量が少ない',
-        'もう少し改善してほしい',
-        '期待外れでした',
-        'もう注文しないかも'
-    ]
-    
     reviews = []
     review_count = 0
     
@@ -192,11 +210,11 @@ with app.app_context():
             
             # 評価に応じてコメントを選択
             if rating >= 4:
-                comment = random.choice(comments_positive)
+                comment = random.choice(COMMENTS_POSITIVE)
             elif rating >= 3:
-                comment = random.choice(comments_neutral)
+                comment = random.choice(COMMENTS_NEUTRAL)
             else:
-                comment = random.choice(comments_negative)
+                comment = random.choice(COMMENTS_NEGATIVE)
             
             # 詳細評価（90%の確率で入力）
             if random.random() < 0.9:
@@ -236,6 +254,11 @@ with app.app_context():
     db.session.commit()
     print(f"{review_count}件のレビューを作成しました")
     
+    # メニューごとの集計を作成
+    rebuild_menu_stats()
+    rebuild_daily_stats()
+    print("メニュー集計・日別集計を作成しました")
+    
     # サマリーを表示
     print("\n" + "="*50)
     print("ダミーデータの挿入が完了しました！")
@@ -244,3 +267,197 @@ with app.app_context():
     print(f"カテゴリ数: {len(categories)}")
     print(f"メニュー数: {len(menus)}")
     print(f"レビュー数: {review_count}")
+
+
+# 価格帯ごとの総合評価(1〜5)の出やすさ（サンプルデータと同じ傾向）
+RATING_WEIGHTS_BY_PRICE = (
+    (400, [3, 5, 20, 40, 32]),    # 400円以下: 高評価が多い
+    (500, [5, 10, 30, 35, 20]),   # 500円以下: バランス良く
+    (None, [8, 15, 35, 30, 12]),  # それ以上: やや低評価傾向
+)
+
+# 1回のgumbel行列（ユーザー数×メニュー数）の要素数の上限
+MAX_BLOCK_CELLS = 2000000
+
+
+def _report(label, rows, elapsed):
+    print(f"{label}: {rows:,}件 / {elapsed:.1f}秒 ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+
+def _insert_rows(conn, rng, num_users, num_menus, num_reviews, chunk_size, days):
+    """カテゴリ・メニュー・ユーザー・レビューを conn にチャンクごとに投入し、レビューの件数を返す"""
+    now = datetime.utcnow()
+
+    # カテゴリ（サンプルと同じ6種類）
+    conn.execute(Category.__table__.insert(), [
+        {'id': i + 1, **cat_data, 'created_at': now} for i, cat_data in enumerate(CATEGORIES_DATA)
+    ])
+
+    # メニュー: サンプルのメニューを元に名前・価格を少しずつ変えて増やす
+    start = time.perf_counter()
+    menu_prices = np.empty(num_menus, dtype=np.int64)
+    menu_rows = []
+    for i in range(num_menus):
+        base = MENUS_DATA[i % len(MENUS_DATA)]
+        price = max(50, base['price'] + 10 * int(rng.integers(-5, 6)))
+        menu_prices[i] = price
+        menu_rows.append({
+            'id': i + 1,
+            'name': f"{base['name']} #{i // len(MENUS_DATA) + 1}",
+            'description': base['description'],
+            'price': price,
+            'category_id': base['category_id'],
+            'is_available': True,
+            'created_at': now,
+            'updated_at': now,
+        })
+    conn.execute(Menu.__table__.insert(), menu_rows)
+    conn.commit()
+    _report('メニュー', num_menus, time.perf_counter() - start)
+
+    # ユーザー: パスワードハッシュは1回だけ計算して全員で使い回す
+    start = time.perf_counter()
+    password_hash = generate_password_hash('password123')
+    for offset in range(0, num_users, chunk_size):
+        conn.execute(User.__table__.insert(), [
+            {
+                'id': i + 1,
+                'username': f'user{i + 1:07d}',
+                'password_hash': password_hash,
+                'is_admin': i == 0,
+                'created_at': now,
+            }
+            for i in range(offset, min(offset + chunk_size, num_users))
+        ])
+        conn.commit()
+    _report('ユーザー', num_users, time.perf_counter() - start)
+
+    # レビュー
+    start = time.perf_counter()
+    per_user, extra = divmod(num_reviews, num_users)
+    max_per_user = per_user + (1 if extra else 0)
+    # メニューの人気に偏りを持たせる（順位の-0.8乗に比例）
+    log_popularity = -0.8 * np.log(rng.permutation(num_menus) + 1.0)
+    band_index = np.full(num_menus, len(RATING_WEIGHTS_BY_PRICE) - 1)
+    for i, (limit, _) in reversed(list(enumerate(RATING_WEIGHTS_BY_PRICE))):
+        if limit is not None:
+            band_index[menu_prices <= limit] = i
+    comment_pools = [np.array(pool, dtype=object) for pool in (COMMENTS_NEGATIVE, COMMENTS_NEUTRAL, COMMENTS_POSITIVE)]
+    sql = (
+        'INSERT INTO reviews (user_id, menu_id, rating, comment, taste_rating, volume_rating, price_rating, '
+        'created_at, updated_at) VALUES (?, ?, ?, ?, NULLIF(?, 0), NULLIF(?, 0), NULLIF(?, 0), ?, ?)'
+    )
+
+    block_size = max(1, min(chunk_size // max(1, max_per_user), MAX_BLOCK_CELLS // num_menus))
+    inserted = 0
+    # 全文検索の索引はトリガーで1行ずつ更新せず、投入後にまとめて作り直す
+    with search_index_suspended():
+        for first_user in range(0, num_users, block_size):
+            if max_per_user == 0:
+                break
+            users_in_block = min(block_size, num_users - first_user)
+            # Gumbel-top-k: ユーザーごとに人気の重み付きで重複なしのメニューを選ぶ
+            keys = log_popularity + rng.gumbel(size=(users_in_block, num_menus))
+            chosen = np.argpartition(-keys, max_per_user - 1, axis=1)[:, :max_per_user]
+            user_index = np.arange(first_user, first_user + users_in_block)
+            keep = np.ones_like(chosen, dtype=bool)
+            if extra:
+                # 余りの分は先頭のextra人だけが1件多くレビューする
+                keep[user_index >= extra, -1] = False
+            user_ids = np.broadcast_to(user_index[:, None] + 1, chosen.shape)[keep]
+            menu_index = chosen[keep]
+            n = len(menu_index)
+
+            ratings = np.empty(n, dtype=np.int64)
+            bands = band_index[menu_index]
+            for i, (_, weights) in enumerate(RATING_WEIGHTS_BY_PRICE):
+                mask = bands == i
+                p = np.asarray(weights, dtype=np.float64) / sum(weights)
+                ratings[mask] = rng.choice(5, size=int(mask.sum()), p=p) + 1
+
+            # 詳細評価（90%の確率で入力、未入力は0で渡してNULLにする）
+            has_detail = rng.random(n) < 0.9
+            sub_ratings = [
+                np.where(has_detail, np.clip(ratings + rng.integers(-1, 2, n), 1, 5), 0) for _ in range(3)
+            ]
+
+            # 評価に応じたコメント
+            sentiment = np.where(ratings >= 4, 2, np.where(ratings >= 3, 1, 0))
+            comments = np.empty(n, dtype=object)
+            for i, pool in enumerate(comment_pools):
+                mask = sentiment == i
+                comments[mask] = pool[rng.integers(0, len(pool), int(mask.sum()))]
+
+            # 過去days日以内のランダムな日時（SQLAlchemyの保存形式に合わせる）
+            offsets = rng.integers(0, days * 86400 * 10**6, n).astype('timedelta64[us]')
+            created_at = np.char.replace(
+                np.datetime_as_string(np.datetime64(now, 'us') - offsets, unit='us'), 'T', ' '
+            ).tolist()
+
+            conn.exec_driver_sql(sql, list(zip(
+                user_ids.tolist(), (menu_index + 1).tolist(), ratings.tolist(), comments.tolist(),
+                sub_ratings[0].tolist(), sub_ratings[1].tolist(), sub_ratings[2].tolist(),
+                created_at, created_at,
+            )))
+            conn.commit()
+            inserted += n
+            elapsed = time.perf_counter() - start
+            print(f"\r  {inserted:,} / {num_reviews:,}件 ({inserted / elapsed:,.0f} rows/sec)", end='', flush=True)
+        print()
+    _report('レビュー', inserted, time.perf_counter() - start)
+    return inserted
+
+
+def generate_data(num_users, num_menus, num_reviews, seed=0, chunk_size=100000, days=365):
+    """負荷試験用の大量データをCoreのexecutemanyでチャンクごとに投入する
+
+    (user_id, menu_id) の一意制約を守るため、ユーザーごとに重複なしでメニューを選ぶ
+    """
+    if num_reviews > num_users * num_menus:
+        raise ValueError('レビュー数は ユーザー数×メニュー数 以下にしてください')
+
+    total_start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    # 投入は専用の接続で行い、同期書き込みの省略（途中で落ちた場合は作り直す前提）をこの接続だけに限る
+    conn = db.engine.connect()
+    synchronous = conn.exec_driver_sql('PRAGMA synchronous').scalar()
+    conn.exec_driver_sql('PRAGMA synchronous=OFF')
+    try:
+        inserted = _insert_rows(conn, rng, num_users, num_menus, num_reviews, chunk_size, days)
+    finally:
+        # 接続はプールに戻って再利用されるため、元の設定に戻してから閉じる
+        conn.rollback()
+        conn.exec_driver_sql(f'PRAGMA synchronous={synchronous}')
+        conn.close()
+
+    # メニューごとの集計・日別集計
+    start = time.perf_counter()
+    rebuild_menu_stats()
+    rebuild_daily_stats()
+    print(f"集計の再構築: {time.perf_counter() - start:.1f}秒")
+
+    total_rows = num_menus + num_users + inserted
+    _report('合計', total_rows, time.perf_counter() - total_start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ダミーデータを作成する')
+    parser.add_argument('--users', type=int, help='ユーザー数（指定すると大量データ生成モード）')
+    parser.add_argument('--menus', type=int, default=500, help='メニュー数（大量データ生成モード）')
+    parser.add_argument('--reviews', type=int, default=100000, help='レビュー数（大量データ生成モード）')
+    parser.add_argument('--seed', type=int, default=None, help='乱数のシード')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='1トランザクションで投入する行数')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        reset_database()
+        if args.users is None:
+            random.seed(args.seed)
+            insert_sample_data()
+        else:
+            generate_data(args.users, args.menus, args.reviews, args.seed or 0, args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,166 @@
 # flaskパッケージをインポート
+import os
 from flask import Flask
-from models import db
+from config import SERVER_PROFILES, apply_storage_profile, load_config
+from models import db, MenuDailyStat, MenuStat, Review
 from routes.index import index_bp
 from routes.auth import auth_bp
 from routes.analysis import analysis_bp
+from routes.admin import admin_bp
+from routes.api import api_bp
+from routes.search import search_bp
+from commands import register_commands
+from services.menu_stats import rebuild_daily_stats, rebuild_menu_stats
+from services.charts import ChartCache, pyplot
+from services.render_pool import RenderPool
+from services.rating_model import RatingModel
+from services.sql_instrumentation import SqlInstrumentation
+from services.profiler import SamplingProfiler
+from services.storage import init_storage
+from services.migrations import LATEST_VERSION, migrate, schema_version
+from services.current_user import UserCache
+from services.password_hasher import PasswordHasher
+from services.page_cache import FragmentCache
+from services.leaderboard import Leaderboard
+from services.dashboard_stats import DashboardStats
+from services.recommender import Recommender
 
-def create_app():
+def create_app(config=None):
     # Flaskのインスタンスを作成
     app = Flask(__name__)
-    app.config['SECRET_KEY'] = 'abc1234'  # セッション管理のための秘密鍵
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+    # 秘密鍵・データベースURL・ストレージプロファイルは環境変数から読み込む（config.py）
+    app.config.update(load_config())
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['REVIEWS_PER_PAGE'] = 20  # メニュー詳細で1ページに表示するレビュー数
+    app.config['CHART_CACHE_SIZE'] = 32  # キャッシュしておくグラフ画像の最大数
+    app.config['CHART_POOL_SIZE'] = 2  # グラフ描画プロセス数（0ならリクエスト内で描画）
+    app.config['CHART_QUEUE_LIMIT'] = 8  # 同時に受け付ける描画ジョブの上限
+    # 評価の回帰モデルの保存先（全ワーカーで共有する）
+    app.config['RATING_MODEL_PATH'] = os.path.join(app.instance_path, 'rating_model.joblib')
+    app.config['SLOW_QUERY_MS'] = 100  # これ以上かかったSQLをログに出す（ミリ秒）
+    app.config['N_PLUS_ONE_THRESHOLD'] = 5  # 1リクエストで同じSQLがこの回数以上ならN+1の疑い
+    app.config['PROFILE_INTERVAL_MS'] = 5  # プロファイラがスタックを採取する間隔（ミリ秒）
+    # 採取したスタック（折りたたみ形式）の追記先（全ワーカーで共有する）
+    app.config['PROFILE_DIR'] = os.path.join(app.instance_path, 'profiles')
+    app.config['PROFILE_MAX_FILE_MB'] = 10  # エンドポイントごとの追記ファイルの上限（超えたら1世代だけ残す）
+    app.config['USER_CACHE_TTL'] = 60  # ログイン中ユーザーの情報をキャッシュする秒数
+    app.config['PASSWORD_HASH_QUEUE_LIMIT'] = 8  # ハッシュ計算の待ちの上限（超えたら503）
+    app.config['LEADERBOARD_PRIOR_REVIEWS'] = 10  # ランキングで全体の平均評価を何件分のレビューとして加えるか
+    app.config['LEADERBOARD_REFRESH_SECONDS'] = 300  # ランキングをDBから読み直す間隔（他のワーカーの投稿の反映）
+    # おすすめ（似ているメニュー・ユーザーごとのおすすめ）の保存先（全ワーカーで共有する）
+    app.config['RECOMMENDER_PATH'] = os.path.join(app.instance_path, 'recommendations.joblib')
+    app.config['RECOMMENDER_NEIGHBORS'] = 20  # メニューごとに保存する似ているメニューの数
+    app.config['RECOMMENDER_RESULTS'] = 10  # ユーザーごとに保存するおすすめの数
+    if config:
+        # ベンチマーク等から設定を上書きする
+        app.config.update(config)
+    # 同時にパスワードのハッシュを計算する数（0ならリクエスト内で計算）。既定ではthreadedのワーカーでだけプールを使う
+    app.config.setdefault('PASSWORD_HASH_WORKERS', SERVER_PROFILES[app.config['SERVER_PROFILE']]['password_hash_workers'])
     
-    # データベースの初期化
+    # JSONの日本語をエスケープせずに返す（APIのレスポンスを小さくする）
+    app.json.ensure_ascii = False
+    
+    # データベースの初期化（WALなどのSQLite設定を含む）
+    apply_storage_profile(app.config)
     db.init_app(app)
+    init_storage(app)
+    
+    # 分析グラフのキャッシュ
+    app.extensions['chart_cache'] = ChartCache(app.config['CHART_CACHE_SIZE'])
+    app.extensions['chart_pool'] = RenderPool(
+        app.extensions['chart_cache'],
+        max_workers=app.config['CHART_POOL_SIZE'],
+        queue_limit=app.config['CHART_QUEUE_LIMIT']
+    )
+    app.extensions['rating_model'] = RatingModel(app.config['RATING_MODEL_PATH'])
+    app.extensions['user_cache'] = UserCache(app.config['USER_CACHE_TTL'])
+    app.extensions['fragment_cache'] = FragmentCache()
+    app.extensions['leaderboard'] = Leaderboard(
+        prior_reviews=app.config['LEADERBOARD_PRIOR_REVIEWS'],
+        refresh_seconds=app.config['LEADERBOARD_REFRESH_SECONDS']
+    )
+    app.extensions['dashboard_stats'] = DashboardStats()
+    app.extensions['recommender'] = Recommender(
+        app.config['RECOMMENDER_PATH'],
+        neighbors=app.config['RECOMMENDER_NEIGHBORS'],
+        results=app.config['RECOMMENDER_RESULTS']
+    )
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        max_workers=app.config['PASSWORD_HASH_WORKERS'],
+        queue_limit=app.config['PASSWORD_HASH_QUEUE_LIMIT']
+    )
+    
+    # リクエストごとのSQL計測
+    sql_instrumentation = SqlInstrumentation(
+        slow_query_ms=app.config['SLOW_QUERY_MS'],
+        n_plus_one_threshold=app.config['N_PLUS_ONE_THRESHOLD']
+    )
+    with app.app_context():
+        engines = [db.engine]
+        if 'read_engine' in app.extensions:
+            # 集計・分析・エクスポートのSQLは読み込み用エンジンで発行される
+            engines.append(app.extensions['read_engine'])
+        sql_instrumentation.init_app(app, *engines)
+    app.extensions['sql_instrumentation'] = sql_instrumentation
+    
+    # リクエストのサンプリングプロファイラ（PROFILE_SAMPLE_EVERY が0なら何もしない）
+    profiler = SamplingProfiler(
+        sample_every=app.config['PROFILE_SAMPLE_EVERY'],
+        interval_ms=app.config['PROFILE_INTERVAL_MS'],
+        output_dir=app.config['PROFILE_DIR'],
+        max_file_bytes=app.config['PROFILE_MAX_FILE_MB'] * 1024 * 1024
+    )
+    profiler.init_app(app)
+    app.extensions['profiler'] = profiler
     
     # Blueprintの登録
     app.register_blueprint(index_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(analysis_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(search_bp)
+    
+    # CLIコマンドの登録
+    register_commands(app)
+    
+    if app.config['PRELOAD_ANALYSIS']:
+        preload_analysis()
     
     return app
 
 
+def preload_analysis():
+    """分析用のライブラリ（pandas・matplotlib・scikit-learn）を読み込んでおく
+
+    通常は最初の分析ページ・グラフの表示時に読み込む。gunicorn --preload と組み合わせると
+    親プロセスで1回だけ読み込み、forkした各ワーカーはそれを共有する
+    """
+    import joblib  # noqa: F401
+    import sklearn.linear_model  # noqa: F401
+    import services.analysis_data  # noqa: F401
+    pyplot()
+
+
 def init_database(app):
     # Cloud Runのgunicorn起動時にもテーブルを自動作成する
     with app.app_context():
-        db.create_all()
+        # 最新のバージョンまでマイグレーション済みのDBでは、テーブルの確認（create_allによる全テーブルの読み取り）を省く
+        with db.engine.connect() as connection:
+            migrated = schema_version(connection) == LATEST_VERSION
+        if not migrated:
+            db.create_all()
+            # create_all() では既存テーブルにインデックス等が追加されないため、マイグレーションを適用する
+            migrate()
+            # 集計テーブル追加前のDBではレビューから集計を作っておく
+            if Review.query.first() is not None:
+                if MenuStat.query.first() is None:
+                    rebuild_menu_stats()
+                if MenuDailyStat.query.first() is None:
+                    rebuild_daily_stats()
+        # 評価ランキングはワーカーの起動時に読み込み、最初のランキングの表示で全メニューを読まないようにする
+        app.extensions['leaderboard'].load()
 
 # Cloud Run (gunicorn main:app) が参照する公開変数
 app = create_app()
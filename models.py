@@ -47,6 +47,11 @@ class Menu(db.Model):
     
     # リレーション
     reviews = db.relationship('Review', backref='menu', lazy=True, cascade='all, delete-orphan')
+    
+    # インデックス: 提供中メニューの一覧（カテゴリ別）
+    __table_args__ = (
+        db.Index('ix_menus_is_available_category_id', 'is_available', 'category_id'),
+    )
 
 
 # Reviewテーブルの定義
@@ -65,6 +70,67 @@ class Review(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # 制約: 1ユーザーは1メニューに1レビューまで
+    # インデックス: メニューごとの新着順レビュー、最終更新日時（グラフのバージョン・追加学習）
     __table_args__ = (
         db.UniqueConstraint('user_id', 'menu_id', name='unique_user_menu_review'),
-    )
\ No newline at end of file
+        db.Index('ix_reviews_menu_id_created_at', 'menu_id', 'created_at'),
+        db.Index('ix_reviews_updated_at', 'updated_at'),
+    )
+
+# MenuStatテーブルの定義（メニューごとのレビュー集計）
+class MenuStat(db.Model):
+    __tablename__ = 'menu_stats'
+    
+    menu_id = db.Column(db.Integer, db.ForeignKey('menus.id'), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    # 詳細評価は任意入力のため、合計と入力件数を別々に保持する
+    taste_sum = db.Column(db.Integer, nullable=False, default=0)
+    taste_count = db.Column(db.Integer, nullable=False, default=0)
+    volume_sum = db.Column(db.Integer, nullable=False, default=0)
+    volume_count = db.Column(db.Integer, nullable=False, default=0)
+    price_sum = db.Column(db.Integer, nullable=False, default=0)
+    price_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # リレーション
+    menu = db.relationship('Menu', backref=db.backref('stat', uselist=False, cascade='all, delete-orphan'))
+
+
+# MenuDailyStatテーブルの定義（メニュー・日付ごとのレビュー集計）
+class MenuDailyStat(db.Model):
+    __tablename__ = 'menu_daily_stats'
+    
+    menu_id = db.Column(db.Integer, db.ForeignKey('menus.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # レビューの投稿日（UTC）
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    taste_sum = db.Column(db.Integer, nullable=False, default=0)
+    taste_count = db.Column(db.Integer, nullable=False, default=0)
+    volume_sum = db.Column(db.Integer, nullable=False, default=0)
+    volume_count = db.Column(db.Integer, nullable=False, default=0)
+    price_sum = db.Column(db.Integer, nullable=False, default=0)
+    price_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # インデックス: 期間別の推移・前週比（全メニューを日付の範囲で読む）
+    __table_args__ = (
+        db.Index('ix_menu_daily_stats_day', 'day'),
+    )
+
+
+# RatingCombinationStatテーブルの定義（評価の組み合わせごとのレビュー数。分析ダッシュボードの分布・相関に使う）
+class RatingCombinationStat(db.Model):
+    __tablename__ = 'rating_combination_stats'
+    
+    # 総合・味・量・コスパの評価（詳細評価の未入力は0）を6進数の各桁にした番号
+    code = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# DataVersionテーブルの定義（キャッシュの無効化用のバージョン）
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)  # キャッシュの対象（例: menu_list）
+    # 変更のたびに新しい値にする（DBを作り直しても以前の値と重ならないようランダムな文字列）
+    version = db.Column(db.String(32), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,145 @@
+import io
+from flask import Blueprint, render_template, abort, current_app, jsonify, flash, g, redirect, url_for, request, Response, stream_with_context
+from models import Category, Menu
+from services.current_user import load_current_user, login_required, login_required_json
+from services.review_export import FORMATS, MIMETYPES, ReviewExport, export_criteria, parquet_available, parse_date
+from services.review_import import FIELDS, detect_format, import_reviews
+
+admin_bp = Blueprint('admin', __name__)
+
+
+def require_admin():
+    """ログイン中のユーザーが管理者でなければ403
+
+    管理者権限は set-admin --revoke（CLI）や他のワーカーで外されることがあるため、キャッシュを使わずDBで確かめる
+    """
+    user = load_current_user(fresh=True)
+    if user is None or not user.is_admin:
+        abort(403)
+    g.user = user
+
+
+@admin_bp.route('/admin/metrics')
+@login_required
+def metrics():
+    """エンドポイントごとのSQL統計"""
+    require_admin()
+    instrumentation = current_app.extensions['sql_instrumentation']
+    return render_template('admin_metrics.html',
+                         user=g.user,
+                         stats=instrumentation.snapshot(),
+                         slow_query_ms=instrumentation.slow_query_ms,
+                         n_plus_one_threshold=instrumentation.n_plus_one_threshold)
+
+
+@admin_bp.route('/admin/metrics.json')
+@login_required_json
+def metrics_json():
+    """エンドポイントごとのSQL統計（JSON）"""
+    require_admin()
+    return jsonify({'endpoints': current_app.extensions['sql_instrumentation'].snapshot()})
+
+
+@admin_bp.route('/admin/metrics/reset', methods=['POST'])
+@login_required
+def reset_metrics():
+    """SQL統計をリセット"""
+    require_admin()
+    current_app.extensions['sql_instrumentation'].reset()
+    flash('SQL統計をリセットしました')
+    return redirect(url_for('admin.metrics'))
+
+
+@admin_bp.route('/admin/profiles')
+@login_required
+def profiles():
+    """エンドポイントごとのサンプリングプロファイル（時間のかかっている関数）"""
+    require_admin()
+    profiler = current_app.extensions['profiler']
+    return render_template('admin_profiles.html',
+                         user=g.user,
+                         profiler=profiler,
+                         profiles=profiler.snapshot())
+
+
+@admin_bp.route('/admin/profiles/<name>.folded')
+@login_required
+def profile_stacks(name):
+    """折りたたみ形式のスタック（flamegraph.pl・speedscope 用。name はエンドポイント名、all なら全エンドポイント）"""
+    require_admin()
+    profiler = current_app.extensions['profiler']
+    response = Response(profiler.collapsed(None if name == 'all' else name), mimetype='text/plain')
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.folded'
+    return response
+
+
+@admin_bp.route('/admin/profiles/reset', methods=['POST'])
+@login_required
+def reset_profiles():
+    """プロファイルをリセット"""
+    require_admin()
+    current_app.extensions['profiler'].reset()
+    flash('プロファイルをリセットしました')
+    return redirect(url_for('admin.profiles'))
+
+
+@admin_bp.route('/admin/import', methods=['GET', 'POST'])
+@login_required
+def import_reviews_upload():
+    """レビューの一括取り込み（CSV / JSONL のアップロード）"""
+    require_admin()
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            flash('ファイルを選択してください')
+            return redirect(url_for('admin.import_reviews_upload'))
+        # アップロードされたファイルは読み込みながら取り込む（大きいファイルは一時ファイルに置かれる）
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            report = import_reviews(stream, detect_format(upload.filename))
+        except UnicodeDecodeError:
+            # 読めた所までのチャンクは取り込み済み
+            flash('ファイルをUTF-8として読めませんでした（途中まで取り込まれている場合があります）')
+            return redirect(url_for('admin.import_reviews_upload'))
+    return render_template('admin_import.html', user=g.user, fields=FIELDS, report=report)
+
+
+@admin_bp.route('/admin/export')
+@login_required
+def export_form():
+    """レビューの書き出し（条件の指定）"""
+    require_admin()
+    return render_template('admin_export.html',
+                         user=g.user,
+                         categories=Category.query.order_by(Category.id).all(),
+                         menus=Menu.query.order_by(Menu.id).all(),
+                         formats=[format for format in FORMATS if format != 'parquet' or parquet_available()])
+
+
+@admin_bp.route('/admin/export/reviews')
+@login_required
+def export_reviews():
+    """条件に合うレビューをCSV / Parquetで書き出す（読み込みながら少しずつ送る）"""
+    require_admin()
+    format = request.args.get('format', 'csv')
+    if format not in FORMATS:
+        return jsonify({'error': f"format は {' / '.join(FORMATS)} のどちらかです"}), 400
+    if format == 'parquet' and not parquet_available():
+        return jsonify({'error': 'Parquetでの書き出しには pyarrow が必要です'}), 501
+    try:
+        criteria = export_criteria(
+            start=parse_date(request.args.get('start'), 'start'),
+            end=parse_date(request.args.get('end'), 'end'),
+            category_id=request.args.get('category_id', type=int),
+            menu_id=request.args.get('menu_id', type=int),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    export = ReviewExport(criteria)
+    # Content-Lengthを付けずに返すため、チャンク形式で送られる
+    response = Response(stream_with_context(export.chunks(format)), mimetype=MIMETYPES[format])
+    response.headers['Content-Disposition'] = f'attachment; filename=reviews.{format}'
+    response.cache_control.no_store = True
+    return response
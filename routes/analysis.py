@@ -1,74 +1,133 @@
-from flask import Blueprint, render_template, session, redirect, url_for
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # GUI不要でmatplotlib利用
-import matplotlib.pyplot as plt
-import io
-import base64
-from models import User, Menu, Review
+from flask import Blueprint, render_template, request, abort, current_app, make_response, jsonify, g
+from services.current_user import login_required, login_required_json
+from models import Category
+from services.charts import CHARTS, data_version, load_chart_data
+from services.leaderboard import PRICE_BANDS
+from services.trends import TREND_WINDOWS, week_over_week
+from services.render_pool import RenderQueueFull
 
 analysis_bp = Blueprint('analysis', __name__)
 
-# 日本語フォント設定
-plt.rcParams['font.sans-serif'] = ['MS Gothic', 'Yu Gothic', 'Meiryo']
-plt.rcParams['axes.unicode_minus'] = False
+# グラフ画像をブラウザ・中間キャッシュに保持させる期間（URLにバージョンを含むため変わらない）
+CHART_MAX_AGE = 365 * 24 * 60 * 60
 
+# 描画待ちのときにクライアントへ再確認を促す間隔（秒）
+CHART_RETRY_AFTER = 1
 
-def plot_to_base64(fig):
-    """matplotlibのfigureをbase64エンコードした画像に変換"""
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close(fig)
-    return img_base64
+# 描画が間に合わなかったときに画像の代わりに返す画像（static/ からのパス）
+CHART_PENDING_IMAGE = 'img/chart_pending.svg'
+
+# 評価ランキングの表示件数（全体 / カテゴリ別・価格帯別）
+RANKING_SIZE = 10
+GROUP_RANKING_SIZE = 3
+
+
+def submit_chart(name, version):
+    """グラフの描画ジョブを登録し、状態を返す（描画待ちが上限なら 'busy'）"""
+    pool = current_app.extensions['chart_pool']
+    try:
+        return pool.submit(name, version, lambda: load_chart_data(name))
+    except RenderQueueFull:
+        return 'busy'
 
 
 @analysis_bp.route('/analysis')
+@login_required
 def analysis_dashboard():
     """データ分析ダッシュボード"""
-    # ログインチェック
-    if 'user_id' not in session:
-        return redirect(url_for('auth.login'))
-    
-    user = User.query.get(session['user_id'])
-    
-    # レビューデータをDataFrameに変換
-    reviews = Review.query.all()
-    if not reviews:
-        return render_template('analysis.html', 
+    user = g.user
+
+    # グラフはページの表示後にブラウザが集計結果のJSON（/api/v1/dashboard）から描くため、ここでは描画しない
+    review_count, version = data_version()
+    if review_count == 0:
+        return render_template('analysis.html',
                              user=user,
-                             charts={})
-    
-    review_data = []
-    for r in reviews:
-        review_data.append({
-            'menu_id': r.menu_id,
-            'menu_name': r.menu.name,
-            'category': r.menu.category.name,
-            'price': r.menu.price,
-            'rating': r.rating,
-            'taste_rating': r.taste_rating or 0,
-            'volume_rating': r.volume_rating or 0,
-            'price_rating': r.price_rating or 0,
-            'user_id': r.user_id
-        })
-    
-    df = pd.DataFrame(review_data)
-    
-    # グラフ生成
-    charts = {}
-    
-    # 人気メニューTOP10
-    fig, ax = plt.subplots(figsize=(10, 6))
-    menu_counts = df['menu_name'].value_counts().head(10)
-    menu_counts.plot(kind='barh', ax=ax, color='lightgreen')
-    ax.set_title('レビュー数が多いメニュー TOP10')
-    ax.set_xlabel('レビュー数')
-    ax.set_ylabel('メニュー名')
-    charts['popular_menus'] = plot_to_base64(fig)
-    
+                             has_reviews=False)
+
+    # 評価ランキング（ベイズ平均）はプロセス内のランキングから取得する
+    leaderboard = current_app.extensions['leaderboard']
+    rankings = {
+        'all': leaderboard.top(RANKING_SIZE),
+        'categories': [
+            (category.name, leaderboard.top(GROUP_RANKING_SIZE, category_id=category.id))
+            for category in Category.query.order_by(Category.id)
+        ],
+        'price_bands': [
+            (label, leaderboard.top(GROUP_RANKING_SIZE, band=band)) for band, (_, label) in enumerate(PRICE_BANDS)
+        ],
+    }
+
+    # 前週比は日別集計から直接求める
+    weekly = week_over_week()
+
+    # 回帰モデル（学習はCLIで行い、ここでは保存済みのモデルで予測するだけ）と全メニューの予測評価
+    model = current_app.extensions['rating_model']
+    predictions, predict_seconds = model.predict_menus()
+    predictions = sorted(predictions, key=lambda p: p['predicted_rating'], reverse=True)
+
     return render_template('analysis.html',
                          user=user,
-                         charts=charts)
+                         has_reviews=True,
+                         chart_version=version,
+                         trend_windows=TREND_WINDOWS,
+                         rankings=rankings,
+                         prior_reviews=leaderboard.prior_reviews,
+                         group_size=GROUP_RANKING_SIZE,
+                         weekly=weekly,
+                         model=model.state,
+                         coefficients=model.coefficients(),
+                         predictions=predictions[:10],
+                         predict_seconds=predict_seconds)
+
+
+@analysis_bp.route('/analysis/predictions')
+@login_required_json
+def predictions():
+    """提供中の全メニューの予測評価（1回の呼び出しでまとめて返す）"""
+    model = current_app.extensions['rating_model']
+    results, predict_seconds = model.predict_menus()
+    state = model.state
+    return jsonify({
+        'predictions': results,
+        'trained_rows': state['trained_rows'] if state else 0,
+        'fit_seconds': state['fit_seconds'] if state else None,
+        'predict_seconds': predict_seconds,
+    })
+
+
+@analysis_bp.route('/analysis/charts/<name>.png')
+@login_required
+def chart(name):
+    """グラフ画像のダウンロード（データのバージョンごとにキャッシュ。画面のグラフはブラウザで描く）"""
+    if name not in CHARTS:
+        abort(404)
+
+    review_count, version = data_version()
+    if review_count == 0:
+        abort(404)
+
+    # 描画はプールに任せて待たずに返す。終わっていなければ作成中の画像と状態を返し、画面が再確認する
+    png = current_app.extensions['chart_cache'].get(name, version)
+    if png is None:
+        status = submit_chart(name, version)
+        png = current_app.extensions['chart_cache'].get(name, version)
+        if png is None:
+            response = current_app.send_static_file(CHART_PENDING_IMAGE)
+            response.status_code = 202
+            response.cache_control.no_store = True
+            response.headers['Retry-After'] = str(CHART_RETRY_AFTER)
+            response.headers['X-Chart-Status'] = status
+            return response
 
+    response = make_response(png)
+    response.mimetype = 'image/png'
+    response.set_etag(f'{name}-{version}')
+    if request.args.get('v') == version:
+        # URLのバージョンが最新なら内容は変わらないので長期キャッシュ可
+        response.cache_control.public = True
+        response.cache_control.max_age = CHART_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # バージョン無しのURLは毎回ETagで再検証させる
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -0,0 +1,295 @@
+"""
+読み取り専用のJSON API（/api/v1）
+モバイルアプリやキオスク端末向けに、メニュー（集計付き）・カテゴリ・メニューごとのレビューを返す
+分析ダッシュボードのグラフのデータ（/dashboard）もここから返す
+- fields=id,name,... で返す項目を選べる
+- ETagはメニュー一覧と同じデータのバージョンから求め、変更が無ければクエリを発行せずに304を返す
+  （プロセス内のランキングから作る /rankings は、返す内容から求める）
+- Accept-Encoding に応じて br（brotliがインストールされている場合）か gzip で圧縮する
+"""
+import gzip
+import hashlib
+from datetime import datetime
+from flask import Blueprint, request, jsonify, make_response, current_app, abort
+from models import db, Category, Menu, MenuStat
+from services.current_user import authenticate
+from services.leaderboard import PRICE_BANDS
+from services.menu_stats import summarize
+from services.page_cache import MENU_LIST, current_version
+from services.review_feed import fetch_review_page
+
+try:
+    import brotli
+except ImportError:  # brotliが無い環境ではgzipだけを使う
+    brotli = None
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# これより小さいレスポンスは圧縮しない（バイト）
+MIN_COMPRESS_SIZE = 500
+
+# レビューの1ページの件数の上限
+MAX_REVIEWS_PER_PAGE = 100
+
+# リソースごとの返せる項目（fields未指定時は全項目）
+CATEGORY_FIELDS = ('id', 'name', 'description')
+MENU_FIELDS = (
+    'id', 'name', 'description', 'price', 'category_id', 'category', 'image_url', 'is_available',
+    'avg_rating', 'avg_taste', 'avg_volume', 'avg_price', 'review_count',
+)
+RANKING_FIELDS = (
+    'rank', 'menu_id', 'menu_name', 'category_id', 'price_band', 'score', 'avg_rating', 'review_count',
+)
+REVIEW_FIELDS = (
+    'id', 'menu_id', 'user_id', 'username', 'rating', 'comment',
+    'taste_rating', 'volume_rating', 'price_rating', 'created_at', 'updated_at',
+)
+
+
+class ApiError(Exception):
+    """APIのエラー（JSONで返す）"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api_bp.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({'error': error.message}), error.status
+
+
+@api_bp.errorhandler(404)
+def handle_not_found(error):
+    return jsonify({'error': 'not found'}), 404
+
+
+@api_bp.before_request
+def require_login():
+    # ログインチェック（画面と同じく authenticate() で確かめ、エラーはAPIの形式で返す）
+    if authenticate() is None:
+        raise ApiError('login required', 401)
+
+
+def selected_fields(allowed):
+    """クエリ文字列の fields=a,b,c を検証して返す"""
+    value = request.args.get('fields')
+    if not value:
+        return allowed
+    fields = tuple(field.strip() for field in value.split(',') if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(f"unknown fields: {', '.join(unknown)}（指定できる項目: {', '.join(allowed)}）")
+    return fields
+
+
+def pick(values, fields):
+    return {field: values[field] for field in fields}
+
+
+# --- 圧縮とETag ---
+
+def choose_encoding():
+    """クライアントが受け付ける圧縮方式（br > gzip > なし）"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def versioned_etag(extra=''):
+    """データのバージョン・URL・圧縮方式から求めるETag（圧縮方式ごとに内容が違うため強いETagを分ける）
+
+    extra: データのバージョン以外に内容を変えるもの（日付など）
+    """
+    raw = f'{current_version(MENU_LIST)}:{request.full_path}:{choose_encoding()}:{extra}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _with_etag(response, etag):
+    """ETagを付け、表示のたびにETagで再検証させる"""
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(build, extra=''):
+    """ETagが一致すれば304、そうでなければ build() の結果をJSONで返す"""
+    etag = versioned_etag(extra)
+    if request.if_none_match.contains(etag):
+        return _with_etag(make_response('', 304), etag)
+    return _with_etag(jsonify(build()), etag)
+
+
+def content_conditional(build):
+    """build() の結果の内容と圧縮方式から求めたETagで304を判定する
+
+    プロセス内の状態から作る応答用（DBのバージョンが同じでもワーカーごとに内容が違うことがあるため、
+    毎回 build() し、返す内容そのものからETagを求める）
+    """
+    response = jsonify(build())
+    etag = hashlib.sha1(response.get_data() + f':{choose_encoding()}'.encode('utf-8')).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    return _with_etag(response, etag)
+
+
+@api_bp.after_request
+def compress(response):
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    encoding = choose_encoding()
+    if encoding is None or len(data) < MIN_COMPRESS_SIZE:
+        return response
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=5))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# --- エンドポイント ---
+
+@api_bp.route('/categories')
+def categories():
+    """カテゴリ一覧"""
+    fields = selected_fields(CATEGORY_FIELDS)
+
+    def build():
+        rows = Category.query.order_by(Category.id).all()
+        return {'categories': [
+            pick({'id': c.id, 'name': c.name, 'description': c.description}, fields) for c in rows
+        ]}
+    return conditional(build)
+
+
+def menu_values(menu, category_name, stat):
+    return {
+        'id': menu.id,
+        'name': menu.name,
+        'description': menu.description,
+        'price': menu.price,
+        'category_id': menu.category_id,
+        'category': category_name,
+        'image_url': menu.image_url,
+        'is_available': bool(menu.is_available),
+        **summarize(stat),
+    }
+
+
+def menu_query():
+    """メニュー・カテゴリ名・集計を1回で取得するクエリ"""
+    return (
+        db.session.query(Menu, Category.name, MenuStat)
+        .join(Category, Category.id == Menu.category_id)
+        .outerjoin(MenuStat, MenuStat.menu_id == Menu.id)
+    )
+
+
+@api_bp.route('/menus')
+def menus():
+    """メニュー一覧（集計付き）  category_id で絞り込み、available=0 で提供終了のメニューも含める"""
+    fields = selected_fields(MENU_FIELDS)
+    category_id = request.args.get('category_id', type=int)
+    include_unavailable = request.args.get('available') == '0'
+
+    def build():
+        query = menu_query()
+        if not include_unavailable:
+            query = query.filter(Menu.is_available == True)
+        if category_id is not None:
+            query = query.filter(Menu.category_id == category_id)
+        rows = query.order_by(Menu.id).all()
+        return {'menus': [pick(menu_values(*row), fields) for row in rows]}
+    return conditional(build)
+
+
+@api_bp.route('/menus/<int:id>')
+def menu(id):
+    """メニュー1件（集計付き）"""
+    fields = selected_fields(MENU_FIELDS)
+
+    def build():
+        row = menu_query().filter(Menu.id == id).first()
+        if row is None:
+            abort(404)
+        return {'menu': pick(menu_values(*row), fields)}
+    return conditional(build)
+
+
+@api_bp.route('/menus/<int:id>/reviews')
+def reviews(id):
+    """メニューのレビュー（新しい順）  cursor で次のページ、limit で件数を指定する"""
+    fields = selected_fields(REVIEW_FIELDS)
+    limit = request.args.get('limit', current_app.config['REVIEWS_PER_PAGE'], type=int)
+    if not 1 <= limit <= MAX_REVIEWS_PER_PAGE:
+        raise ApiError(f'limit は1〜{MAX_REVIEWS_PER_PAGE}で指定してください')
+
+    def build():
+        if db.session.get(Menu, id) is None:
+            abort(404)
+        # 投稿者も同じクエリで取得するため、件数に関係なくクエリは1回
+        page, next_cursor = fetch_review_page(id, request.args.get('cursor'), limit)
+        return {
+            'reviews': [pick({
+                'id': review.id,
+                'menu_id': review.menu_id,
+                'user_id': review.user_id,
+                'username': review.user.username,
+                'rating': review.rating,
+                'comment': review.comment,
+                'taste_rating': review.taste_rating,
+                'volume_rating': review.volume_rating,
+                'price_rating': review.price_rating,
+                'created_at': review.created_at.isoformat(),
+                'updated_at': review.updated_at.isoformat() if review.updated_at else None,
+            }, fields) for review in page],
+            'next_cursor': next_cursor,
+        }
+    return conditional(build)
+
+
+@api_bp.route('/rankings')
+def rankings():
+    """ベイズ平均による評価ランキング  category_id か price_band（0始まりの価格帯の番号）で絞り込む"""
+    fields = selected_fields(RANKING_FIELDS)
+    limit = request.args.get('limit', 10, type=int)
+    if not 1 <= limit <= MAX_REVIEWS_PER_PAGE:
+        raise ApiError(f'limit は1〜{MAX_REVIEWS_PER_PAGE}で指定してください')
+    category_id = request.args.get('category_id', type=int)
+    band = request.args.get('price_band', type=int)
+    if band is not None and not 0 <= band < len(PRICE_BANDS):
+        raise ApiError(f'price_band は0〜{len(PRICE_BANDS) - 1}で指定してください')
+
+    # ランキングはプロセス内にあり、他のワーカーの投稿は読み直すまで反映されないため、
+    # ETagはDBのバージョンではなく返す内容から求める（DBは読まない）
+    def build():
+        leaderboard = current_app.extensions['leaderboard']
+        return {
+            'rankings': [pick(row, fields) for row in leaderboard.top(limit, category_id=category_id, band=band)],
+            'prior_mean': round(leaderboard.prior_mean, 3),
+            'prior_reviews': leaderboard.prior_reviews,
+        }
+    return content_conditional(build)
+
+
+@api_bp.route('/dashboard')
+def dashboard():
+    """分析ダッシュボードのグラフのデータ（評価の分布・カテゴリ別の平均・価格と評価・相関・話題のメニュー・期間別の推移）
+
+    集計はデータのバージョンと日付ごとに1回だけ行い、同じ間は全員に同じ結果を返す
+    """
+    # 期間別の推移は日付が変わると対象期間がずれるため、日付もETagに含める
+    today = datetime.utcnow().date()
+
+    def build():
+        return current_app.extensions['dashboard_stats'].get(current_version(MENU_LIST), today)
+    return conditional(build, extra=today)
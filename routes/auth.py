@@ -1,10 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User
+from services.password_hasher import HashingBusy
+
+# ハッシュ計算が混雑しているときに再試行を促す間隔（秒）
+BUSY_RETRY_AFTER = 2
 
 auth_bp = Blueprint('auth', __name__)
 
+
+def busy_response(template):
+    """ハッシュ計算の待ちが上限に達したときの応答（503）"""
+    flash('ただいま混み合っています。しばらくしてからもう一度お試しください')
+    return render_template(template), 503, {'Retry-After': str(BUSY_RETRY_AFTER)}
+
+
 # ユーザー登録
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
@@ -24,9 +34,13 @@ def register():
             return render_template('register.html')
         
         # 新しいユーザーを作成
+        try:
+            password_hash = current_app.extensions['password_hasher'].hash(password)
+        except HashingBusy:
+            return busy_response('register.html')
         user = User(
             username=username,
-            password_hash=generate_password_hash(password)
+            password_hash=password_hash
         )
         db.session.add(user)
         db.session.commit()
@@ -43,8 +57,20 @@ def login():
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '')
         
+        hasher = current_app.extensions['password_hasher']
         user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            verified = user is not None and hasher.verify(user.password_hash, password)
+        except HashingBusy:
+            return busy_response('login.html')
+        if verified:
+            if hasher.needs_rehash(user.password_hash):
+                # 古い方式・コストのハッシュは、平文が手元にあるこの機会に作り直す
+                try:
+                    user.password_hash = hasher.hash(password)
+                    db.session.commit()
+                except HashingBusy:
+                    pass  # 混雑時は次回のログインに回す
             session['user_id'] = user.id
             flash('ログインしました')
             return redirect(url_for('index.index'))
@@ -1,86 +1,104 @@
-from flask import Blueprint, render_template, session, request, redirect, url_for, flash
+import hashlib
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, g, session, make_response
+from markupsafe import Markup
 from datetime import datetime
-from models import db, User, Menu, Review, Category
+from models import db, Menu, MenuStat, Review, Category
+from services.current_user import login_required
+from services.page_cache import MENU_LIST, current_version
+from services.menu_stats import record_review_change, review_values, summarize
+from services.review_feed import fetch_review_page
 
 index_bp = Blueprint('index', __name__)
 
+# おすすめの表示件数（一覧の「あなたへのおすすめ」 / 詳細の「似ているメニュー」）
+FOR_YOU_SIZE = 5
+SIMILAR_MENUS_SIZE = 5
+
 # （/）エンドポイントでの処理を定義 - メニュー一覧
 @index_bp.route('/')
+@login_required
 def index():
-    # ログインチェック
-    if 'user_id' not in session:
-        return redirect(url_for('auth.login'))
-    
-    user = User.query.get(session['user_id'])
+    user = g.user
     
-    # カテゴリとメニューを取得
-    categories = Category.query.all()
-    menus = Menu.query.filter_by(is_available=True).all()
+    # メニュー一覧の表はデータのバージョンが変わるまで同じ内容になる
+    version = current_version(MENU_LIST)
+    # おすすめは保存済みの結果を引くだけ（作り直されたら作成日時が変わる）
+    recommender = current_app.extensions['recommender']
+    for_you = recommender.for_user(user.id, FOR_YOU_SIZE)
+    # ヘッダーのユーザー名・おすすめも含めてページ全体を表すETag（フラッシュメッセージがある場合は付けない）
+    etag = hashlib.sha1(f'{version}:{recommender.version}:{user.id}:{user.username}'.encode('utf-8')).hexdigest()
+    has_flashes = bool(session.get('_flashes'))
+    if not has_flashes and request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
     
-    # メニューごとの平均評価とレビュー数を計算
-    menu_stats = {}
-    for menu in menus:
-        reviews = Review.query.filter_by(menu_id=menu.id).all()
-        if reviews:
-            avg_rating = sum(r.rating for r in reviews) / len(reviews)
-            menu_stats[menu.id] = {
-                'avg_rating': round(avg_rating, 1),
-                'review_count': len(reviews)
-            }
-        else:
-            menu_stats[menu.id] = {
-                'avg_rating': 0,
-                'review_count': 0
-            }
+    cache = current_app.extensions['fragment_cache']
+    menu_list = cache.get(MENU_LIST, version)
+    if menu_list is None:
+        # カテゴリとメニューを取得
+        categories = Category.query.all()
+        # メニューと集計をまとめて1回のクエリで取得
+        rows = (
+            db.session.query(Menu, MenuStat)
+            .outerjoin(MenuStat, MenuStat.menu_id == Menu.id)
+            .filter(Menu.is_available == True)
+            .all()
+        )
+        menus = [menu for menu, _ in rows]
+        menu_stats = {menu.id: summarize(stat) for menu, stat in rows}
+        menu_list = Markup(render_template('_menu_list.html', menus=menus, categories=categories, menu_stats=menu_stats))
+        cache.put(MENU_LIST, version, menu_list)
     
-    return render_template('index.html', user=user, menus=menus, categories=categories, menu_stats=menu_stats)
+    response = make_response(render_template('index.html', user=user, menu_list=menu_list, for_you=for_you))
+    if not has_flashes:
+        response.set_etag(etag)
+        # ブラウザには保存させるが、表示のたびにETagで再検証させる
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
 
 
 # メニュー詳細とレビュー一覧
 @index_bp.route('/menus/<int:id>')
+@login_required
 def menu_detail(id):
-    # ログインチェック
-    if 'user_id' not in session:
-        return redirect(url_for('auth.login'))
-    
-    user = User.query.get(session['user_id'])
+    user = g.user
     menu = Menu.query.get_or_404(id)
     
-    # レビューを取得（新しい順）
-    reviews = Review.query.filter_by(menu_id=id).order_by(Review.created_at.desc()).all()
+    # レビューを取得（新しい順・カーソルでページ分割）
+    cursor = request.args.get('cursor')
+    reviews, next_cursor = fetch_review_page(id, cursor, current_app.config['REVIEWS_PER_PAGE'])
     
-    # 平均評価を計算
-    if reviews:
-        avg_rating = sum(r.rating for r in reviews) / len(reviews)
-        avg_taste = sum(r.taste_rating for r in reviews if r.taste_rating) / len([r for r in reviews if r.taste_rating]) if any(r.taste_rating for r in reviews) else 0
-        avg_volume = sum(r.volume_rating for r in reviews if r.volume_rating) / len([r for r in reviews if r.volume_rating]) if any(r.volume_rating for r in reviews) else 0
-        avg_price = sum(r.price_rating for r in reviews if r.price_rating) / len([r for r in reviews if r.price_rating]) if any(r.price_rating for r in reviews) else 0
-    else:
-        avg_rating = avg_taste = avg_volume = avg_price = 0
+    # 平均評価は集計テーブルから取得
+    stats = summarize(db.session.get(MenuStat, id))
     
     # ユーザーが既にレビュー済みかチェック
     user_review = Review.query.filter_by(user_id=user.id, menu_id=id).first()
     
+    # このメニューを高く評価した人が高く評価しているメニュー（保存済みの結果を引くだけ）
+    similar_menus = current_app.extensions['recommender'].similar_menus(id, SIMILAR_MENUS_SIZE)
+    
     return render_template('menu_detail.html', 
                          user=user, 
                          menu=menu, 
                          reviews=reviews,
-                         avg_rating=round(avg_rating, 1),
-                         avg_taste=round(avg_taste, 1),
-                         avg_volume=round(avg_volume, 1),
-                         avg_price=round(avg_price, 1),
-                         review_count=len(reviews),
-                         user_review=user_review)
+                         cursor=cursor,
+                         next_cursor=next_cursor,
+                         avg_rating=stats['avg_rating'],
+                         avg_taste=stats['avg_taste'],
+                         avg_volume=stats['avg_volume'],
+                         avg_price=stats['avg_price'],
+                         review_count=stats['review_count'],
+                         user_review=user_review,
+                         similar_menus=similar_menus)
 
 
 # レビュー投稿
 @index_bp.route('/menus/<int:id>/review', methods=['GET', 'POST'])
+@login_required
 def post_review(id):
-    # ログインチェック
-    if 'user_id' not in session:
-        return redirect(url_for('auth.login'))
-    
-    user = User.query.get(session['user_id'])
+    user = g.user
     menu = Menu.query.get_or_404(id)
     
     if request.method == 'POST':
@@ -99,16 +117,20 @@ def post_review(id):
             return redirect(url_for('index.post_review', id=id))
         
         if existing_review:
-            # 既存レビューを更新
+            # 既存レビューを更新（集計から変更前の値を差し引くために控えておく）
+            old_values = review_values(existing_review)
             existing_review.rating = rating
             existing_review.comment = comment if comment else None
             existing_review.taste_rating = int(taste_rating) if taste_rating else None
             existing_review.volume_rating = int(volume_rating) if volume_rating else None
             existing_review.price_rating = int(price_rating) if price_rating else None
             existing_review.updated_at = datetime.utcnow()
+            record_review_change(id, old_values, review_values(existing_review))
             flash('レビューを更新しました')
         else:
             # 新規レビューを作成
+            # 日別集計の投稿日とそろえるため投稿日時をここで決める
+            now = datetime.utcnow()
             review = Review(
                 user_id=user.id,
                 menu_id=id,
@@ -116,11 +138,15 @@ def post_review(id):
                 comment=comment if comment else None,
                 taste_rating=int(taste_rating) if taste_rating else None,
                 volume_rating=int(volume_rating) if volume_rating else None,
-                price_rating=int(price_rating) if price_rating else None
+                price_rating=int(price_rating) if price_rating else None,
+                created_at=now,
+                updated_at=now
             )
             db.session.add(review)
+            record_review_change(id, None, review_values(review))
             flash('レビューを投稿しました')
         
+        # レビューと集計を同じトランザクションでコミット
         db.session.commit()
         return redirect(url_for('index.menu_detail', id=id))
     
@@ -0,0 +1,34 @@
+from flask import Blueprint, render_template, request, g, current_app
+from services.current_user import login_required
+from services.search import QueryTooShort, search_menus, search_reviews
+
+search_bp = Blueprint('search', __name__)
+
+
+# 全文検索（レビューのコメント・メニュー名・説明）
+@search_bp.route('/search')
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    menus = []
+    reviews, has_next = [], False
+    review_error = None
+    if query:
+        # メニューは1ページ目にだけ表示する
+        if page == 1:
+            menus = search_menus(query)
+        try:
+            reviews, has_next = search_reviews(query, page, current_app.config['REVIEWS_PER_PAGE'])
+        except QueryTooShort as e:
+            review_error = str(e)
+    
+    return render_template('search.html',
+                         user=g.user,
+                         query=query,
+                         page=page,
+                         menus=menus,
+                         reviews=reviews,
+                         review_error=review_error,
+                         has_next=has_next)
@@ -0,0 +1,91 @@
+"""
+分析用のレビューデータ読み込み
+必要なカラムだけを1回の結合SELECTで取得し、チャンクごとに型付きの列へ詰めてDataFrameにする
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import func, select
+from models import Category, Menu, Review
+from services.storage import raw_cursor
+
+# 1回にDBから受け取る行数
+DEFAULT_CHUNK_SIZE = 50000
+
+reviews_table = Review.__table__
+menus_table = Menu.__table__
+categories_table = Category.__table__
+
+# 列名 → (SELECTする式, 列の型)  'category' はpandasのカテゴリ型
+REVIEW_COLUMNS = {
+    'id': (reviews_table.c.id, np.int64),
+    'menu_id': (reviews_table.c.menu_id, np.int32),
+    'menu_name': (menus_table.c.name, 'category'),
+    'category': (categories_table.c.name, 'category'),
+    'price': (menus_table.c.price, np.int32),
+    'rating': (reviews_table.c.rating, np.int8),
+    # 詳細評価の未入力は0として扱う
+    'taste_rating': (func.coalesce(reviews_table.c.taste_rating, 0), np.int8),
+    'volume_rating': (func.coalesce(reviews_table.c.volume_rating, 0), np.int8),
+    'price_rating': (func.coalesce(reviews_table.c.price_rating, 0), np.int8),
+    'user_id': (reviews_table.c.user_id, np.int32),
+    'created_at': (reviews_table.c.created_at, 'datetime64[ns]'),
+    'updated_at': (reviews_table.c.updated_at, 'datetime64[ns]'),
+}
+
+# columns未指定時に読み込む列
+DEFAULT_COLUMNS = (
+    'menu_id', 'menu_name', 'category', 'price', 'rating',
+    'taste_rating', 'volume_rating', 'price_rating', 'user_id',
+)
+
+
+def _to_column(values, dtype):
+    """1チャンク分の値を型付きの配列に変換"""
+    if dtype == 'category':
+        return pd.Categorical(values)
+    if dtype == 'datetime64[ns]':
+        # DBAPIから直接受け取るため日時は文字列で届く
+        return pd.to_datetime(pd.Series(values, dtype=object), format='ISO8601').to_numpy(dtype='datetime64[ns]')
+    return np.asarray(values, dtype=dtype)
+
+
+def _concat(chunks, dtype):
+    """チャンクごとの配列を1列にまとめる"""
+    if dtype == 'category':
+        return union_categoricals(chunks)
+    return np.concatenate(chunks)
+
+
+def load_review_frame(columns=None, criteria=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """レビュー・メニュー・カテゴリを結合した分析用DataFrameを返す
+
+    columns: 読み込む列名（REVIEW_COLUMNSのキー）
+    criteria: SELECTに追加するWHERE条件のリスト
+    """
+    names = list(columns or DEFAULT_COLUMNS)
+    stmt = (
+        select(*[REVIEW_COLUMNS[name][0].label(name) for name in names])
+        .select_from(reviews_table)
+        .join(menus_table, menus_table.c.id == reviews_table.c.menu_id)
+        .join(categories_table, categories_table.c.id == menus_table.c.category_id)
+        .where(*criteria)
+    )
+
+    chunks = {name: [] for name in names}
+    with raw_cursor(stmt) as cursor:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            # 行のリストを列ごとに転置して、すぐに型付き配列へ変換する
+            for name, values in zip(names, zip(*rows)):
+                chunks[name].append(_to_column(values, REVIEW_COLUMNS[name][1]))
+
+    if not chunks[names[0]]:
+        return pd.DataFrame({
+            name: _to_column([], REVIEW_COLUMNS[name][1]) for name in names
+        })
+    return pd.DataFrame({
+        name: _concat(chunks[name], REVIEW_COLUMNS[name][1]) for name in names
+    })
@@ -0,0 +1,163 @@
+"""
+分析グラフの描画とキャッシュ
+グラフはレビューデータのバージョンごとにPNGとして保持し、データが変わったときだけ描き直す
+matplotlib・pandasは読み込みに時間がかかるため、起動時ではなく最初の読み込み・描画のときにimportする
+"""
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import cache, partial
+from sqlalchemy import func, select
+from models import db, Menu, MenuStat, Review
+from services.trends import TREND_WINDOWS, load_daily_trend
+
+logger = logging.getLogger(__name__)
+
+# 日本語フォントの候補（Windows・macOS・Linuxの順。インストールされているものだけを使う）
+JAPANESE_FONTS = (
+    'MS Gothic', 'Yu Gothic', 'Meiryo',
+    'Hiragino Sans', 'Hiragino Kaku Gothic ProN',
+    'Noto Sans CJK JP', 'Noto Sans JP', 'IPAexGothic', 'IPAGothic', 'TakaoGothic', 'VL Gothic',
+)
+
+
+@cache
+def pyplot():
+    """matplotlibを読み込んで設定し、pyplotを返す（2回目以降は読み込み済みのものを返す）"""
+    import matplotlib
+    matplotlib.use('Agg')  # GUI不要でmatplotlib利用
+    import matplotlib.pyplot as plt
+    from matplotlib import font_manager
+    # 日本語フォント設定（候補が1つも無ければ既定のフォントのまま警告する）
+    installed = {font.name for font in font_manager.fontManager.ttflist}
+    fonts = [name for name in JAPANESE_FONTS if name in installed]
+    if not fonts:
+        logger.warning('日本語フォントが見つかりません。グラフの日本語が表示されないため、'
+                       'fonts-noto-cjk（Noto Sans CJK JP）などをインストールしてください')
+    plt.rcParams['font.sans-serif'] = fonts + list(plt.rcParams['font.sans-serif'])
+    plt.rcParams['axes.unicode_minus'] = False
+    return plt
+
+
+def data_version():
+    """レビュー件数と最終更新日時からデータのバージョンを求める（件数, バージョン文字列）
+
+    期間別のグラフは日付が変わると対象期間がずれるため、今日の日付もバージョンに含める
+    """
+    # 件数はレビューを数えずに集計テーブル（menu_stats）から、最終更新日時はインデックスから求める
+    count, last_updated = db.session.execute(
+        select(
+            select(func.coalesce(func.sum(MenuStat.review_count), 0)).scalar_subquery(),
+            select(func.max(Review.updated_at)).scalar_subquery(),
+        )
+    ).one()
+    today = datetime.utcnow().date()
+    digest = hashlib.sha1(f'{count}:{last_updated}:{today}'.encode('utf-8')).hexdigest()[:16]
+    return count, digest
+
+
+class ChartCache:
+    """バージョン付きPNGを保持するLRUキャッシュ（上限を超えると古いものから破棄）"""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, version):
+        with self._lock:
+            png = self._entries.get((name, version))
+            if png is not None:
+                self._entries.move_to_end((name, version))
+            return png
+
+    def put(self, name, version, png):
+        with self._lock:
+            self._entries[(name, version)] = png
+            self._entries.move_to_end((name, version))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def new_figure(figsize):
+    """描画用の (figure, axes)
+
+    pyplotの状態（現在のfigure）を使わないため、スレッドで処理するワーカーで同時に描いてもよい
+    """
+    pyplot()
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots()
+
+
+def plot_to_png(fig):
+    """matplotlibのfigureをPNGのバイト列に変換"""
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    return buf.getvalue()
+
+
+def render_popular_menus(menu_counts):
+    """人気メニューTOP10"""
+    fig, ax = new_figure((10, 6))
+    menu_counts.plot(kind='barh', ax=ax, color='lightgreen')
+    ax.set_title('レビュー数が多いメニュー TOP10')
+    ax.set_xlabel('レビュー数')
+    ax.set_ylabel('メニュー名')
+    return plot_to_png(fig)
+
+
+def render_trend(df, days):
+    """直近days日のレビュー数（棒）と平均評価（折れ線）"""
+    fig, ax = new_figure((10, 4))
+    labels = df.index.strftime('%m/%d')
+    ax.bar(labels, df['review_count'], color='lightskyblue')
+    ax.set_ylabel('レビュー数')
+    # 日数が多いときは目盛りを間引く
+    ax.set_xticks(range(0, len(labels), max(1, len(labels) // 10)))
+    rating_ax = ax.twinx()
+    rating_ax.plot(labels, df['avg_rating'], color='darkorange', marker='o', markersize=3)
+    rating_ax.set_ylim(0, 5.5)
+    rating_ax.set_ylabel('平均評価')
+    ax.set_title(f'直近{days}日間のレビュー数と平均評価')
+    return plot_to_png(fig)
+
+
+def load_popular_menus(limit=10):
+    """人気メニューTOP10の描画に使うデータ（メニュー名 → レビュー数のSeries、多い順）
+
+    レビューを読まずにメニュー集計（menu_stats）から求める
+    """
+    import pandas as pd
+    rows = db.session.execute(
+        select(Menu.name, MenuStat.review_count)
+        .join(MenuStat, MenuStat.menu_id == Menu.id)
+        .where(MenuStat.review_count > 0)
+        .order_by(MenuStat.review_count.desc(), Menu.id)
+        .limit(limit)
+    ).all()
+    return pd.Series([count for _, count in rows], index=[name for name, _ in rows], name='review_count')
+
+
+# グラフ名 → (データ読み込み関数, 描画関数)
+# 読み込み（集計テーブルの数十行）はリクエストを受けたプロセスで、描画は描画プールの子プロセスで行う
+CHARTS = {
+    'popular_menus': (load_popular_menus, render_popular_menus),
+}
+CHARTS.update({
+    f'trend_{days}': (partial(load_daily_trend, days), partial(render_trend, days=days))
+    for days in TREND_WINDOWS
+})
+
+
+def load_chart_data(name):
+    """グラフの描画に使うデータを読み込む"""
+    return CHARTS[name][0]()
+
+
+def render_chart(name, data):
+    """グラフ名を指定して描画する（描画プールの子プロセスから呼ばれる）"""
+    return CHARTS[name][1](data)
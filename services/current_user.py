@@ -0,0 +1,129 @@
+"""
+ログイン中のユーザーの取得と、ログイン必須の画面に付けるデコレータ
+画面に必要な項目（ID・ユーザー名・管理者か）だけをプロセス内のTTLキャッシュに持ち、表示のたびにusersを読まないようにする
+ユーザーが更新・削除されたらコミット後にキャッシュから消す（他のワーカー・CLIでの変更はTTLが切れた時点で反映される）
+そのため書き込みのリクエストと管理者の画面では、キャッシュを使わずにDBから読み直す
+"""
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+from flask import current_app, g, has_app_context, jsonify, redirect, request, session, url_for
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models import db, User
+
+CurrentUser = namedtuple('CurrentUser', ['id', 'username', 'is_admin'])
+
+
+class UserCache:
+    """ユーザーID → CurrentUser のTTLキャッシュ"""
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def put(self, user):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # 期限切れを掃除しても空かなければ全部捨てる（次のアクセスで読み直すだけ）
+                now = time.monotonic()
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[0] >= now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+def load_current_user(fresh=False):
+    """セッションのユーザーをキャッシュから（無ければDBから）取得する（存在しなければNone）
+
+    fresh=True のときはキャッシュを使わずにDBから読み直し、キャッシュも最新にする
+    """
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    cache = current_app.extensions['user_cache']
+    user = None if fresh else cache.get(user_id)
+    if user is None:
+        row = db.session.get(User, user_id)
+        if row is None:
+            cache.invalidate([user_id])
+            return None
+        user = CurrentUser(row.id, row.username, bool(row.is_admin))
+        cache.put(user)
+    return user
+
+
+def authenticate():
+    """ログイン中のユーザーを g.user に入れて返す（未ログイン・削除済みならNone）
+
+    GET以外（書き込み）のリクエストでは、他のワーカーで削除されたユーザーで書き込まないようDBから読み直す
+    """
+    # ログインチェック
+    if 'user_id' not in session:
+        return None
+    user = load_current_user(fresh=request.method not in ('GET', 'HEAD'))
+    if user is None:
+        # ログイン中にユーザーが削除された
+        session.pop('user_id', None)
+        return None
+    g.user = user
+    return user
+
+
+def login_required(view):
+    """未ログインならログイン画面へ移動し、ログイン中のユーザーを g.user に入れてから画面を表示する"""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if authenticate() is None:
+            return redirect(url_for('auth.login'))
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def login_required_json(view):
+    """login_required のJSON版（未ログインならログイン画面へ移動せず401のJSONを返す）"""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if authenticate() is None:
+            return jsonify({'error': 'login required'}), 401
+        return view(*args, **kwargs)
+    return wrapped
+
+
+# --- ユーザー変更時のキャッシュ破棄 ---
+
+def _remember_changed_user(mapper, connection, target):
+    session_ = object_session(target)
+    if session_ is not None:
+        session_.info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session_):
+    user_ids = session_.info.pop('changed_user_ids', None)
+    if user_ids and has_app_context() and 'user_cache' in current_app.extensions:
+        current_app.extensions['user_cache'].invalidate(user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session_):
+    session_.info.pop('changed_user_ids', None)
+
+
+event.listen(User, 'after_update', _remember_changed_user)
+event.listen(User, 'after_delete', _remember_changed_user)
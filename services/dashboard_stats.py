@@ -0,0 +1,204 @@
+"""
+分析ダッシュボードの集計（ブラウザで描くグラフのデータ）
+評価の分布・評価どうしの相関は、評価の組み合わせ（総合・味・量・コスパ）ごとの件数の集計テーブル
+（rating_combination_stats。最大6×6×6×6行）を表にしてnumpyで求める（レビューは読まない）
+カテゴリ別の平均・メニューごとの価格と評価・価格との相関・話題のメニューはメニュー集計（menu_stats）から、
+期間別の推移は日別集計（menu_daily_stats）から求める
+
+結果はメニュー一覧と同じデータのバージョン（と日付）ごとに1つだけ保持し、変更が無い間は集計し直さない
+グラフはサーバーで画像にせず、小さなJSONとして返してブラウザ（static/js/dashboard.js）で描く
+"""
+import threading
+from datetime import datetime
+from sqlalchemy import select
+from models import db, Category, Menu, MenuStat, RatingCombinationStat
+from services.menu_stats import COMBINATION_LEVELS as LEVELS
+from services.trends import TREND_WINDOWS, load_daily_trend
+
+# 話題のメニュー（レビュー数の多い順）の件数
+POPULAR_MENUS = 10
+
+# 評価: (reviews の列, menu_stats の合計の列, menu_stats の件数の列, 表示名)
+RATINGS = (
+    ('rating', 'rating_sum', 'review_count', '総合評価'),
+    ('taste_rating', 'taste_sum', 'taste_count', '味'),
+    ('volume_rating', 'volume_sum', 'volume_count', '量'),
+    ('price_rating', 'price_sum', 'price_count', 'コスパ'),
+)
+
+# JSONに入れる小数の桁数
+DECIMALS = 3
+
+
+def _floats(values):
+    """numpyの配列を小数のリストにする（NaNはnull）"""
+    return [None if value != value else round(float(value), DECIMALS) for value in values]
+
+
+def count_combinations():
+    """評価の組み合わせごとのレビュー数（[総合, 味, 量, コスパ] で引く6×6×6×6の配列）"""
+    import numpy as np
+    counts = np.zeros(LEVELS ** len(RATINGS), dtype=np.int64)
+    rows = db.session.execute(
+        select(RatingCombinationStat.code, RatingCombinationStat.review_count)
+        .where(RatingCombinationStat.review_count > 0)
+    ).all()
+    if rows:
+        codes, values = zip(*rows)
+        counts[list(codes)] = values
+    return counts.reshape((LEVELS,) * len(RATINGS))
+
+
+def _correlation(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy):
+    """件数と合計から相関係数を求める（配列の要素ごと。求められない組はNaN）"""
+    import numpy as np
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = sum_xy / n - (sum_x / n) * (sum_y / n)
+        variance_x = sum_xx / n - (sum_x / n) ** 2
+        variance_y = sum_yy / n - (sum_y / n) ** 2
+        result = covariance / np.sqrt(variance_x * variance_y)
+    # 分散が0（全員が同じ評価など）の組は丸め誤差で値が出ないようNaNにする
+    result[(n < 2) | (variance_x <= 1e-12) | (variance_y <= 1e-12)] = np.nan
+    return np.clip(result, -1.0, 1.0)
+
+
+def compute_dashboard_stats(today=None):
+    """ダッシュボードの全グラフのデータを求める（列ごとの配列でまとめた辞書）"""
+    # pandas・numpyは起動を遅くするため、集計するときにimportする
+    import numpy as np
+    import pandas as pd
+
+    combinations = count_combinations()
+    axes = range(len(RATINGS))
+    # 評価ごとの値（0〜5）の件数
+    marginals = [combinations.sum(axis=tuple(a for a in axes if a != i)) for i in axes]
+    levels = np.arange(LEVELS)
+
+    stats = {
+        'review_count': int(combinations.sum()),
+        'rating_histogram': marginals[0][1:].tolist(),
+        'sub_ratings': [
+            {
+                'name': name,
+                'histogram': marginal[1:].tolist(),
+                'missing': int(marginal[0]),
+                'mean': _floats([(marginal * levels).sum() / marginal[1:].sum() if marginal[1:].sum() else np.nan])[0],
+            }
+            for marginal, (_, _, _, name) in zip(marginals[1:], RATINGS[1:])
+        ],
+    }
+
+    # メニューごとの集計（レビューのあるメニュー）
+    rows = db.session.execute(
+        select(Menu.id, Menu.name, Menu.price, Category.id, Category.name,
+               *[getattr(MenuStat, column) for _, total, count, _ in RATINGS for column in (total, count)])
+        .join(MenuStat, MenuStat.menu_id == Menu.id)
+        .join(Category, Category.id == Menu.category_id)
+        .where(MenuStat.review_count > 0)
+        .order_by(Menu.id)
+    ).all()
+    stat_columns = [column for _, total, count, _ in RATINGS for column in (total, count)]
+    menus = pd.DataFrame(rows, columns=['id', 'name', 'price', 'category_id', 'category'] + stat_columns)
+
+    def means(frame):
+        return {
+            column: _floats(frame[total] / frame[count].where(frame[count] > 0))
+            for column, total, count, _ in RATINGS
+        }
+
+    # カテゴリ別の件数と平均（カテゴリID順）
+    by_category = menus.groupby(['category_id', 'category'])[stat_columns].sum()
+    stats['categories'] = {
+        'names': by_category.index.get_level_values('category').tolist(),
+        'review_count': by_category['review_count'].tolist(),
+        **means(by_category),
+    }
+
+    # メニューごとの価格と平均評価（散布図）
+    stats['menus'] = {
+        'ids': menus['id'].tolist(),
+        'names': menus['name'].tolist(),
+        'price': menus['price'].tolist(),
+        'rating': means(menus)['rating'],
+        'review_count': menus['review_count'].tolist(),
+    }
+
+    # 話題のメニュー（レビュー数の多い順）
+    popular = menus.sort_values(['review_count', 'id'], ascending=[False, True]).head(POPULAR_MENUS)
+    stats['popular_menus'] = {
+        'ids': popular['id'].tolist(),
+        'names': popular['name'].tolist(),
+        'review_count': popular['review_count'].tolist(),
+    }
+
+    # 期間別の日ごとのレビュー数と平均評価
+    stats['trends'] = []
+    for days in TREND_WINDOWS:
+        trend = load_daily_trend(days, today)
+        stats['trends'].append({
+            'days': days,
+            'dates': trend.index.strftime('%m/%d').tolist(),
+            'review_count': trend['review_count'].astype(int).tolist(),
+            'avg_rating': _floats(trend['avg_rating']),
+        })
+
+    # 相関: 2つとも入力のあるレビューどうしの件数・合計・二乗和・積の和を (評価+価格)×(評価+価格) の表にする
+    size = len(RATINGS) + 1
+    n, sum_x, sum_y, sum_xx, sum_yy, sum_xy = (np.zeros((size, size)) for _ in range(6))
+    value = levels.astype(np.float64)
+    for i in axes:
+        for j in axes:
+            if i == j:
+                table = np.diag(marginals[i])
+            else:
+                table = combinations.sum(axis=tuple(a for a in axes if a not in (i, j)))
+                if i > j:
+                    table = table.T
+            # 未入力（0）を含む組は除く
+            table = table[1:, 1:]
+            n[i, j] = table.sum()
+            sum_x[i, j] = table.sum(axis=1) @ value[1:]
+            sum_y[i, j] = table.sum(axis=0) @ value[1:]
+            sum_xx[i, j] = table.sum(axis=1) @ value[1:] ** 2
+            sum_yy[i, j] = table.sum(axis=0) @ value[1:] ** 2
+            sum_xy[i, j] = value[1:] @ table @ value[1:]
+    # 価格はメニューごとに一定なので、メニュー集計の件数・合計に価格を掛けて求める
+    price = menus['price'].to_numpy(dtype=np.float64)
+    last = size - 1
+    for i, (_, total, count, _) in enumerate(RATINGS):
+        counts = menus[count].to_numpy(dtype=np.float64)
+        totals = menus[total].to_numpy(dtype=np.float64)
+        moments = (counts.sum(), totals.sum(), price @ counts, sum_xx[i, i], (price ** 2) @ counts, price @ totals)
+        n[i, last], sum_x[i, last], sum_y[i, last], sum_xx[i, last], sum_yy[i, last], sum_xy[i, last] = moments
+        n[last, i], sum_y[last, i], sum_x[last, i], sum_yy[last, i], sum_xx[last, i], sum_xy[last, i] = moments
+    counts = menus['review_count'].to_numpy(dtype=np.float64)
+    n[last, last] = counts.sum()
+    sum_x[last, last] = sum_y[last, last] = price @ counts
+    sum_xx[last, last] = sum_yy[last, last] = sum_xy[last, last] = (price ** 2) @ counts
+    stats['correlation'] = {
+        'names': [name for _, _, _, name in RATINGS] + ['価格'],
+        'matrix': [_floats(row) for row in _correlation(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy)],
+    }
+    return stats
+
+
+class DashboardStats:
+    """データのバージョンと日付ごとの集計結果（最新のものだけを保持する）
+
+    集計テーブルだけを読むため、レビューが投稿されるたびに集計し直してもレビューの件数によらず速い
+    同じバージョンの同時リクエストは1回の集計を待って結果を共有する
+    """
+
+    def __init__(self):
+        self._key = None
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def get(self, version, today=None):
+        # 期間別の推移は日付が変わると対象期間がずれるため、日付もキーに含める
+        today = today or datetime.utcnow().date()
+        with self._lock:
+            if self._key != (version, today):
+                self._stats = compute_dashboard_stats(today)
+                self._key = (version, today)
+            return self._stats
@@ -0,0 +1,220 @@
+"""
+メニューの評価ランキング（ベイズ平均）
+レビューが数件しかないメニューが平均評価だけで上位に来ないよう、全体の平均評価を prior_reviews 件分の
+事前の評価として加えた平均（ベイズ平均）で並べる
+  スコア = (prior_reviews × 全体の平均評価 + 評価の合計) / (prior_reviews + レビュー数)
+
+全体・カテゴリ別・価格帯別のランキングをプロセス内にソート済みのリストで持ち、
+レビューの投稿・編集のコミット時に変わったメニューだけを並べ替える（上位N件の取得はDBを読まずO(N)）
+他のワーカーでの変更は refresh_seconds ごとの menu_stats からの再読み込みで反映する
+最初の読み込みはワーカーの起動時（main.init_database）に行い、最初のランキングの表示で全メニューを読まない
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from models import db, Menu, MenuStat
+
+# 価格帯: (上限の価格（円）, 表示名)  上限Noneは最後の帯
+PRICE_BANDS = (
+    (400, '400円以下'),
+    (500, '401〜500円'),
+    (None, '501円以上'),
+)
+
+# 全体のランキング
+ALL = ('all',)
+
+# コミット待ちの集計の差分を控えておく session.info のキー
+PENDING_KEY = 'leaderboard_deltas'
+
+
+def price_band(price):
+    """価格から価格帯の番号を求める"""
+    for index, (limit, _) in enumerate(PRICE_BANDS):
+        if limit is None or price <= limit:
+            return index
+    return len(PRICE_BANDS) - 1
+
+
+def board_name(category_id=None, band=None):
+    """ランキングの種類（全体・カテゴリ別・価格帯別）"""
+    if category_id is not None:
+        return ('category', category_id)
+    if band is not None:
+        return ('price', band)
+    return ALL
+
+
+class Leaderboard:
+    """ベイズ平均によるメニューのランキング（スレッドセーフ）
+
+    prior_reviews: 全体の平均評価を何件分のレビューとして加えるか（大きいほどレビュー数の少ないメニューが平均に寄る）
+    refresh_seconds: DBから読み直す間隔（全体の平均評価もこのときに求め直す）
+    """
+
+    def __init__(self, prior_reviews=10, refresh_seconds=300):
+        self.prior_reviews = prior_reviews
+        self.refresh_seconds = refresh_seconds
+        self.prior_mean = 0.0
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # メニューID → {'name', 'category_id', 'band', 'count', 'total', 'key'}
+        self._menus = {}
+        # ランキングの種類 → (-スコア, -レビュー数, メニューID) の昇順リスト
+        self._boards = {}
+        self._loaded_at = None
+        # load() のたびに増やす（読み込みを待っている間に他のスレッドが読み込んだかの判定に使う）
+        self._generation = 0
+
+    def score(self, count, total):
+        return (self.prior_reviews * self.prior_mean + total) / (self.prior_reviews + count)
+
+    def _key(self, menu_id, entry):
+        return (-self.score(entry['count'], entry['total']), -entry['count'], menu_id)
+
+    @staticmethod
+    def _boards_of(entry):
+        return (ALL, ('category', entry['category_id']), ('price', entry['band']))
+
+    def load(self):
+        """提供中のメニューと集計をDBから読み、全ランキングを作り直す"""
+        started = time.perf_counter()
+        # ORMのオブジェクトを作らずタプルで受け取る（メニュー数が多くても起動時の読み込みを速くする）
+        rows = db.session.execute(
+            select(Menu.id, Menu.name, Menu.category_id, Menu.price,
+                   func.coalesce(MenuStat.review_count, 0), func.coalesce(MenuStat.rating_sum, 0))
+            .outerjoin(MenuStat, MenuStat.menu_id == Menu.id)
+            .where(Menu.is_available == True)
+        ).tuples().all()
+        review_count = sum(row[4] for row in rows)
+        rating_sum = sum(row[5] for row in rows)
+        prior_mean = rating_sum / review_count if review_count else 0.0
+        prior_total = self.prior_reviews * prior_mean
+
+        menus = {}
+        boards = {}
+        for menu_id, name, category_id, price, count, total in rows:
+            band = price_band(price)
+            key = (-(prior_total + total) / (self.prior_reviews + count), -count, menu_id)
+            menus[menu_id] = {
+                'name': name, 'category_id': category_id, 'band': band, 'count': count, 'total': total, 'key': key,
+            }
+            if count > 0:
+                for board in (ALL, ('category', category_id), ('price', band)):
+                    boards.setdefault(board, []).append(key)
+        for keys in boards.values():
+            keys.sort()
+
+        with self._lock:
+            self.prior_mean = prior_mean
+            self._menus = menus
+            self._boards = boards
+            self._loaded_at = time.monotonic()
+            self._generation += 1
+        self.load_seconds = time.perf_counter() - started
+
+    def _ensure_loaded(self):
+        with self._lock:
+            loaded_at, generation = self._loaded_at, self._generation
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_seconds:
+            return
+        # 読み込みは1スレッドだけが行い、他のスレッドは前回の結果を使う（初回は読み込みを待つ）
+        if not self._load_lock.acquire(blocking=loaded_at is None):
+            return
+        try:
+            # 待っている間に他のスレッドが読み込んでいれば読み直さない
+            if self._generation == generation:
+                self.load()
+        finally:
+            self._load_lock.release()
+
+    def invalidate(self):
+        """次の参照時にDBから読み直す"""
+        with self._lock:
+            self._loaded_at = None
+
+    def apply(self, deltas):
+        """コミットされた集計の差分（メニューID → 差分）を反映し、変わったメニューだけを並べ替える"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for menu_id, delta in deltas.items():
+                entry = self._menus.get(menu_id)
+                if entry is None:
+                    # 読み込み後に追加されたメニューは次の参照時に読み直す
+                    self._loaded_at = None
+                    return
+                if entry['count'] > 0:
+                    for board in self._boards_of(entry):
+                        keys = self._boards[board]
+                        del keys[bisect_left(keys, entry['key'])]
+                entry['count'] += delta['review_count']
+                entry['total'] += delta['rating_sum']
+                entry['key'] = self._key(menu_id, entry)
+                if entry['count'] > 0:
+                    for board in self._boards_of(entry):
+                        insort(self._boards.setdefault(board, []), entry['key'])
+
+    def top(self, limit=10, category_id=None, band=None):
+        """ランキングの上位 limit 件"""
+        self._ensure_loaded()
+        with self._lock:
+            keys = self._boards.get(board_name(category_id, band), [])[:limit]
+            results = []
+            for rank, (negative_score, _, menu_id) in enumerate(keys, 1):
+                entry = self._menus[menu_id]
+                results.append({
+                    'rank': rank,
+                    'menu_id': menu_id,
+                    'menu_name': entry['name'],
+                    'category_id': entry['category_id'],
+                    'price_band': PRICE_BANDS[entry['band']][1],
+                    'score': round(-negative_score, 2),
+                    'avg_rating': round(entry['total'] / entry['count'], 2),
+                    'review_count': entry['count'],
+                })
+            return results
+
+
+# --- レビューのコミット時の反映 ---
+
+def record_pending(deltas, session=None):
+    """集計の差分をコミット時にランキングへ反映するよう控えておく"""
+    session = session or db.session
+    pending = session.info.setdefault(PENDING_KEY, {})
+    if pending is None:
+        # 同じトランザクションで集計を作り直していれば、コミット時に全体を読み直す
+        return
+    for menu_id, delta in deltas.items():
+        total = pending.setdefault(menu_id, {'review_count': 0, 'rating_sum': 0})
+        total['review_count'] += delta['review_count']
+        total['rating_sum'] += delta['rating_sum']
+
+
+def record_rebuild(session=None):
+    """集計を作り直したので、コミット時にランキングも読み直すよう控えておく"""
+    session = session or db.session
+    session.info[PENDING_KEY] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session_):
+    if PENDING_KEY not in session_.info:
+        return
+    deltas = session_.info.pop(PENDING_KEY)
+    if not has_app_context() or 'leaderboard' not in current_app.extensions:
+        return
+    leaderboard = current_app.extensions['leaderboard']
+    if deltas is None:
+        leaderboard.invalidate()
+    else:
+        leaderboard.apply(deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_pending(session_):
+    session_.info.pop(PENDING_KEY, None)
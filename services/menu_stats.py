@@ -0,0 +1,204 @@
+"""
+メニューごとのレビュー集計（menu_stats）・日別集計（menu_daily_stats）・評価の組み合わせごとの件数
+（rating_combination_stats）の更新・再構築
+レビューの投稿/編集時に差分だけを加算し、一覧画面や分析ダッシュボードでは集計テーブルを読むだけで済むようにする
+"""
+from datetime import datetime
+from sqlalchemy import and_, bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, MenuDailyStat, MenuStat, RatingCombinationStat, Review
+from services.leaderboard import record_pending, record_rebuild
+from services.page_cache import MENU_LIST, bump_version
+
+# 詳細評価: (Reviewのカラム名, 合計カラム名, 入力件数カラム名)
+SUB_RATINGS = (
+    ('taste_rating', 'taste_sum', 'taste_count'),
+    ('volume_rating', 'volume_sum', 'volume_count'),
+    ('price_rating', 'price_sum', 'price_count'),
+)
+
+STAT_COLUMNS = ('review_count', 'rating_sum') + tuple(
+    column for _, sum_column, count_column in SUB_RATINGS for column in (sum_column, count_column)
+)
+
+# 評価の組み合わせの番号にする評価（上の桁から）と、1桁の値の種類（0は詳細評価の未入力、1〜5が評価）
+COMBINATION_FIELDS = ('rating', 'taste_rating', 'volume_rating', 'price_rating')
+COMBINATION_LEVELS = 6
+
+
+def review_values(review):
+    """集計に使う評価値と投稿日を取り出す（レビューが無ければNone）"""
+    if review is None:
+        return None
+    # 新規レビューはflush前でcreated_atが未設定のため現在日時を使う
+    created_at = review.created_at or datetime.utcnow()
+    return {
+        'rating': review.rating,
+        'taste_rating': review.taste_rating,
+        'volume_rating': review.volume_rating,
+        'price_rating': review.price_rating,
+        'day': created_at.date(),
+    }
+
+
+def review_delta(old, new):
+    """変更前後の評価値から集計の差分を計算"""
+    delta = dict.fromkeys(STAT_COLUMNS, 0)
+    for values, sign in ((old, -1), (new, 1)):
+        if values is None:
+            continue
+        delta['review_count'] += sign
+        delta['rating_sum'] += sign * values['rating']
+        for field, sum_column, count_column in SUB_RATINGS:
+            if values[field] is not None:
+                delta[sum_column] += sign * values[field]
+                delta[count_column] += sign
+    return delta
+
+
+def daily_deltas(menu_id, old, new):
+    """変更前後の評価値から (メニューID, 日付) ごとの差分を計算"""
+    deltas = {}
+    for values, delta in ((old, review_delta(old, None)), (new, review_delta(None, new))):
+        if values is None:
+            continue
+        total = deltas.setdefault((menu_id, values['day']), dict.fromkeys(STAT_COLUMNS, 0))
+        for column in STAT_COLUMNS:
+            total[column] += delta[column]
+    return deltas
+
+
+def combination_code(values):
+    """評価値の辞書から評価の組み合わせの番号を求める"""
+    code = 0
+    for field in COMBINATION_FIELDS:
+        code = code * COMBINATION_LEVELS + (values[field] or 0)
+    return code
+
+
+def combination_code_column():
+    """reviewsの行の評価の組み合わせの番号（SQLの式）"""
+    code = None
+    for field in COMBINATION_FIELDS:
+        value = func.coalesce(getattr(Review, field), 0)
+        code = value if code is None else code * COMBINATION_LEVELS + value
+    return code
+
+
+def combination_deltas(old, new):
+    """変更前後の評価値から評価の組み合わせごとの件数の差分を計算"""
+    deltas = {}
+    for values, sign in ((old, -1), (new, 1)):
+        if values is not None:
+            code = combination_code(values)
+            deltas[code] = deltas.get(code, 0) + sign
+    return deltas
+
+
+def _add_to_table(table, key_columns, deltas, columns=STAT_COLUMNS):
+    """キー→差分の辞書を集計テーブルの各行に加算する"""
+    deltas = {key: delta for key, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+
+    # 集計行が無いキーは0件の行を先に作っておく
+    db.session.execute(
+        sqlite_insert(table).on_conflict_do_nothing(index_elements=list(key_columns)),
+        [dict(zip(key_columns, key)) for key in deltas]
+    )
+    # 加算はSQL側で行い、同時に投稿されても値を取りこぼさないようにする
+    stmt = (
+        update(table)
+        .where(and_(*[table.c[column] == bindparam(f'key_{column}') for column in key_columns]))
+        .values({column: table.c[column] + bindparam(f'delta_{column}') for column in columns})
+    )
+    db.session.execute(stmt, [
+        {
+            **{f'key_{column}': value for column, value in zip(key_columns, key)},
+            **{f'delta_{column}': delta[column] for column in columns},
+        }
+        for key, delta in deltas.items()
+    ])
+
+
+def apply_deltas(deltas, day_deltas=None, code_deltas=None):
+    """集計テーブルに差分を加算（コミットは呼び出し側のトランザクションで行う）
+
+    deltas: メニューID → 差分
+    day_deltas: (メニューID, 日付) → 差分
+    code_deltas: 評価の組み合わせの番号 → 件数の差分
+    """
+    _add_to_table(MenuStat.__table__, ('menu_id',), {(menu_id,): delta for menu_id, delta in deltas.items()})
+    # コミットされたらランキングにも反映する
+    record_pending(deltas)
+    if day_deltas:
+        _add_to_table(MenuDailyStat.__table__, ('menu_id', 'day'), day_deltas)
+    if code_deltas:
+        _add_to_table(RatingCombinationStat.__table__, ('code',), {
+            (code,): {'review_count': count} for code, count in code_deltas.items()
+        }, columns=('review_count',))
+
+
+def record_review_change(menu_id, old, new):
+    """1件のレビューの投稿（old=None）または編集を集計に反映"""
+    apply_deltas({menu_id: review_delta(old, new)}, daily_deltas(menu_id, old, new), combination_deltas(old, new))
+
+
+def _aggregate_columns():
+    """reviewsから集計カラムを求めるSELECT句"""
+    columns = [func.count(Review.id), func.sum(Review.rating)]
+    for field, _, _ in SUB_RATINGS:
+        rating_column = getattr(Review, field)
+        columns += [func.coalesce(func.sum(rating_column), 0), func.count(rating_column)]
+    return columns
+
+
+def rebuild_menu_stats():
+    """reviewsテーブルからメニューごとの集計と評価の組み合わせごとの件数を作り直す"""
+    table = MenuStat.__table__
+    aggregate = select(Review.menu_id, *_aggregate_columns()).group_by(Review.menu_id)
+
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select(['menu_id', *STAT_COLUMNS], aggregate))
+    _rebuild_combination_stats()
+    bump_version(MENU_LIST)
+    record_rebuild()
+    db.session.commit()
+
+
+def _rebuild_combination_stats():
+    """reviewsから評価の組み合わせごとの件数を作り直す（コミットは呼び出し側で行う）"""
+    table = RatingCombinationStat.__table__
+    code = combination_code_column().label('code')
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select(
+        ['code', 'review_count'], select(code, func.count()).select_from(Review).group_by(code)
+    ))
+
+
+def rebuild_daily_stats():
+    """reviews.created_at から日別集計を作り直す"""
+    table = MenuDailyStat.__table__
+    day = func.date(Review.created_at)
+    aggregate = select(Review.menu_id, day, *_aggregate_columns()).group_by(Review.menu_id, day)
+
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select(['menu_id', 'day', *STAT_COLUMNS], aggregate))
+    db.session.commit()
+
+
+def summarize(stat):
+    """テンプレート表示用に平均評価とレビュー数を計算（未レビューは0）"""
+    if stat is None or stat.review_count == 0:
+        return {'avg_rating': 0, 'avg_taste': 0, 'avg_volume': 0, 'avg_price': 0, 'review_count': 0}
+
+    def average(total, count):
+        return round(total / count, 1) if count else 0
+
+    return {
+        'avg_rating': average(stat.rating_sum, stat.review_count),
+        'avg_taste': average(stat.taste_sum, stat.taste_count),
+        'avg_volume': average(stat.volume_sum, stat.volume_count),
+        'avg_price': average(stat.price_sum, stat.price_count),
+        'review_count': stat.review_count,
+    }
@@ -0,0 +1,82 @@
+"""
+既存のデータベースに対するスキーマのマイグレーション
+db.create_all() は既存テーブルを変更しないため、インデックスの追加などはここにバージョン付きで書く
+適用済みのバージョンはSQLiteの PRAGMA user_version に記録する
+
+新しいDBでは create_all() が作ったテーブルに対しても全マイグレーションが流れるので、
+各SQLは何度実行しても同じ結果になるように書く（CREATE ... IF NOT EXISTS など）
+
+起動時（main.init_database）は user_version が最新なら create_all() を省くため、
+models.py にテーブルを追加したときは CREATE TABLE IF NOT EXISTS のマイグレーションも追加する
+"""
+from models import db
+
+# (バージョン, 説明, SQLのリスト)  バージョンは1から連番で追加する
+MIGRATIONS = [
+    (1, 'レビュー・メニュー・日別集計のインデックス', [
+        'CREATE INDEX IF NOT EXISTS ix_reviews_menu_id_created_at ON reviews (menu_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_reviews_updated_at ON reviews (updated_at)',
+        'CREATE INDEX IF NOT EXISTS ix_menus_is_available_category_id ON menus (is_available, category_id)',
+        'CREATE INDEX IF NOT EXISTS ix_menu_daily_stats_day ON menu_daily_stats (day)',
+    ]),
+    (2, 'レビューのコメントとメニュー名・説明の全文検索（FTS5・trigram）', [
+        # 本文は元のテーブルにあり、FTSテーブルは索引だけを持つ（external content）
+        "CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5("
+        "comment, content='reviews', content_rowid='id', tokenize='trigram')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS menus_fts USING fts5("
+        "name, description, content='menus', content_rowid='id', tokenize='trigram')",
+        # 投稿・編集・削除のたびに索引を更新するトリガー
+        "CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN "
+        "INSERT INTO reviews_fts(rowid, comment) VALUES (new.id, new.comment); END",
+        "CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN "
+        "INSERT INTO reviews_fts(reviews_fts, rowid, comment) VALUES ('delete', old.id, old.comment); END",
+        "CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF comment ON reviews BEGIN "
+        "INSERT INTO reviews_fts(reviews_fts, rowid, comment) VALUES ('delete', old.id, old.comment); "
+        "INSERT INTO reviews_fts(rowid, comment) VALUES (new.id, new.comment); END",
+        "CREATE TRIGGER IF NOT EXISTS menus_fts_insert AFTER INSERT ON menus BEGIN "
+        "INSERT INTO menus_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS menus_fts_delete AFTER DELETE ON menus BEGIN "
+        "INSERT INTO menus_fts(menus_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS menus_fts_update AFTER UPDATE OF name, description ON menus BEGIN "
+        "INSERT INTO menus_fts(menus_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+        "INSERT INTO menus_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+        # 既存の行から索引を作る
+        "INSERT INTO reviews_fts(reviews_fts) VALUES ('rebuild')",
+        "INSERT INTO menus_fts(menus_fts) VALUES ('rebuild')",
+    ]),
+    (3, '評価の組み合わせごとのレビュー数（分析ダッシュボードの分布・相関）', [
+        'CREATE TABLE IF NOT EXISTS rating_combination_stats ('
+        'code INTEGER NOT NULL, review_count INTEGER NOT NULL, PRIMARY KEY (code))',
+        # 既存のレビューから作る（総合・味・量・コスパを6進数の各桁にした番号ごとの件数）
+        'DELETE FROM rating_combination_stats',
+        'INSERT INTO rating_combination_stats (code, review_count) '
+        'SELECT ((rating * 6 + COALESCE(taste_rating, 0)) * 6 + COALESCE(volume_rating, 0)) * 6 '
+        '+ COALESCE(price_rating, 0) AS code, COUNT(*) FROM reviews GROUP BY code',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(connection):
+    """適用済みのマイグレーションのバージョン"""
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def migrate():
+    """未適用のマイグレーションを順に適用し、適用したものの一覧を返す
+
+    user_version は各マイグレーションの全SQLを実行した後に更新するため、途中で失敗したら次回その版から再実行する
+    """
+    applied = []
+    with db.engine.connect() as connection:
+        current = schema_version(connection)
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        with db.engine.begin() as connection:
+            for statement in statements:
+                connection.exec_driver_sql(statement)
+            connection.exec_driver_sql(f'PRAGMA user_version = {version}')
+        applied.append((version, description))
+    return applied
@@ -0,0 +1,80 @@
+"""
+画面の一部（メニュー一覧の表など）のキャッシュ
+DBのdata_versionsテーブルに対象ごとのバージョンを持ち、データの変更と同じトランザクションで更新する
+各ワーカーはバージョンだけを読み、同じバージョンの描画結果があれば使い回す（複数ワーカーでも古い表示が残らない）
+"""
+import threading
+import uuid
+from datetime import datetime
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from models import db, Category, DataVersion, Menu, MenuStat, Review
+
+# メニュー一覧（メニュー・カテゴリ・レビューの集計）
+MENU_LIST = 'menu_list'
+
+# 変更されたらバージョンを更新するモデル → 対象
+VERSIONED_MODELS = {
+    Menu: MENU_LIST,
+    Category: MENU_LIST,
+    Review: MENU_LIST,
+    MenuStat: MENU_LIST,
+}
+
+
+def bump_version(*names, session=None):
+    """対象のバージョンを新しくする（コミットは呼び出し側のトランザクションで行う）"""
+    session = session or db.session
+    table = DataVersion.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'version': stmt.excluded.version, 'updated_at': stmt.excluded.updated_at}
+    )
+    now = datetime.utcnow()
+    session.execute(stmt, [
+        {'name': name, 'version': uuid.uuid4().hex, 'updated_at': now} for name in names
+    ])
+
+
+def current_version(name):
+    """対象の現在のバージョン（まだ無ければ '0'）"""
+    version = db.session.execute(
+        select(DataVersion.version).where(DataVersion.name == name)
+    ).scalar()
+    return version or '0'
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_changed_versions(session, flush_context, instances):
+    """ORMでの追加・変更・削除をflushする前に、関係する対象のバージョンを更新する
+
+    集計テーブルへのSQLでの一括更新などORMを通らない変更は、bump_version() を直接呼ぶ
+    """
+    names = {
+        VERSIONED_MODELS[type(obj)]
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if type(obj) in VERSIONED_MODELS
+    }
+    if names:
+        bump_version(*sorted(names), session=session)
+
+
+class FragmentCache:
+    """(対象, バージョン) → 描画済みHTML（対象ごとに最新のバージョンだけを保持する）"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, version):
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return None
+
+    def put(self, name, version, html):
+        with self._lock:
+            self._entries[name] = (version, html)
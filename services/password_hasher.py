@@ -0,0 +1,71 @@
+"""
+パスワードのハッシュ計算用の専用スレッドプール
+scryptやpbkdf2はCPU・メモリを多く使うため、同時に計算する数をプロセスごとに制限し、
+待ちが上限を超えたら HashingBusy で断ってメニュー閲覧などの他のリクエストを詰まらせないようにする
+（hashlibのscrypt・pbkdf2は計算中にGILを解放するので、スレッドでも並行して計算できる）
+制限はワーカーのプロセスごとなので、1ワーカーで複数のリクエストを処理する threaded のプロファイルで使う
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """ハッシュ計算の待ちが上限に達している"""
+
+
+class PasswordHasher:
+    """ハッシュの作成・照合を上限付きのスレッドプールで行う
+
+    method: werkzeugの形式（例: 'scrypt:32768:8:1', 'pbkdf2:sha256:600000'）
+    max_workers=0 のときはプールを使わずその場で計算する（比較・開発用）
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', max_workers=2, queue_limit=8, timeout=10):
+        self.method = method
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_workers + queue_limit) if max_workers else None
+        self._lock = threading.Lock()
+        self._method_prefix = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='password-hash')
+            return self._executor
+
+    def _run(self, func, *args):
+        if not self.max_workers:
+            return func(*args)
+        # 計算中と待ちの合計が上限なら、待たせずに断る
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # 計算は続き、終わった時点で枠が空く。待たせているリクエストは混雑として断る
+            raise HashingBusy()
+
+    def hash(self, password):
+        """設定された方式でハッシュを作る"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """パスワードがハッシュと一致するか"""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """現在の設定と異なる方式・コストで作られたハッシュか"""
+        if self._method_prefix is None:
+            # 'scrypt' のような省略形も、実際に作られるハッシュの先頭（'scrypt:32768:8:1'）で比べる
+            self._method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_prefix
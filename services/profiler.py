@@ -0,0 +1,255 @@
+"""
+リクエストのサンプリングプロファイラ（既定では無効。PROFILE_SAMPLE_EVERY で有効にする）
+エンドポイントごとに sample_every 回に1回のリクエストを選び、処理中のスレッドのスタックを
+別スレッドから interval_ms ごとに採取する（選ばれなかったリクエストは回数を数えるだけ）
+採取は経過時間で行うため、DB・ハッシュ計算などの待ち時間も呼び出し元の関数の時間として数える
+
+採取したスタックは折りたたみ形式（1行が「呼び出し元;…;関数 回数」。flamegraph.pl や speedscope で
+フレームグラフにできる）でエンドポイントごとにプロセス内に集計し、output_dir のファイルにも追記する
+ファイルは max_file_bytes を超えたら「.folded.1」に置き換えて新しく書き始める（古い1世代だけ残す）
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import count
+from flask import Flask, g, request
+
+# エンドポイントごとに保持するスタックの種類の上限（超えた分は OTHER_STACK にまとめる）
+DEFAULT_MAX_STACKS = 2000
+
+OTHER_STACK = '(その他)'
+
+# エンドポイントごとの追記ファイルの上限（超えたら1世代だけ残して書き直す）
+DEFAULT_MAX_FILE_BYTES = 10 * 1024 * 1024
+
+# 画面に出す関数の数
+TOP_FUNCTIONS = 15
+
+# スタックはここから下だけを残す（gunicorn・テスト用クライアントなど、サーバー側の呼び出し元は除く）
+WSGI_ENTRY = Flask.wsgi_app.__code__
+
+
+def _path_prefixes():
+    """関数名に付けるパスから除く接頭辞（sys.path のうち長いものから順に）"""
+    prefixes = {os.path.abspath(path) + os.sep for path in sys.path if path}
+    prefixes.add(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')) + os.sep)
+    return sorted(prefixes, key=len, reverse=True)
+
+
+class EndpointProfile:
+    """1エンドポイントの採取結果の累計"""
+
+    def __init__(self):
+        self.requests = 0
+        self.seconds = 0.0
+        self.samples = 0
+        self.stacks = Counter()
+
+    def functions(self, limit=TOP_FUNCTIONS):
+        """採取数の多い関数（自身: スタックの先頭にあった回数 / 累計: スタックに含まれていた回数）"""
+        own, total = Counter(), Counter()
+        for stack, samples in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += samples
+            # 再帰で同じ関数が何度も出てくるスタックは1回と数える
+            for frame in set(frames):
+                total[frame] += samples
+        samples = self.samples or 1
+        return [
+            {
+                'function': function,
+                'own_samples': own[function],
+                'own_percent': round(own[function] * 100 / samples, 1),
+                'total_percent': round(total[function] * 100 / samples, 1),
+            }
+            for function, _ in own.most_common(limit)
+        ]
+
+
+class SamplingProfiler:
+    """1/sample_every のリクエストのスタックを採取し、エンドポイントごとに集計する
+
+    sample_every: 0 なら何もしない（フックも登録しない）
+    interval_ms: 採取の間隔（CPUを使い続けるスレッドがGILを手放すのは既定で5msごとのため、それより短くしても増えない）
+    output_dir: 採取した折りたたみ形式のスタックを「エンドポイント名.folded」に追記する（Noneなら書かない）
+    max_file_bytes: 追記ファイルの上限（超えたら「.folded.1」に移して新しいファイルに書く）
+    """
+
+    def __init__(self, sample_every=0, interval_ms=5, output_dir=None, max_stacks=DEFAULT_MAX_STACKS,
+                 max_file_bytes=DEFAULT_MAX_FILE_BYTES):
+        self.sample_every = sample_every
+        self.interval_ms = interval_ms
+        self.output_dir = output_dir
+        self.max_stacks = max_stacks
+        self.max_file_bytes = max_file_bytes
+        self._counters = {}
+        # エンドポイント → これまでに受けたリクエスト数（採取しなかったものも含む）
+        self._seen = {}
+        self._profiles = {}
+        # 採取中のリクエスト: スレッドID → そのリクエストのスタックの Counter
+        self._active = {}
+        self._labels = {}
+        self._prefixes = _path_prefixes()
+        # reset() のたびに増やす（リセット前に始まったリクエストの結果は捨てる）
+        self._generation = 0
+        self._sampler = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_every > 0
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+
+    # --- 採取 ---
+
+    def _label(self, code):
+        """関数の表示名（「パス:関数名」。パスはプロジェクト・site-packages からの相対パス）"""
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in self._prefixes:
+                if filename.startswith(prefix):
+                    filename = filename[len(prefix):]
+                    break
+            # 折りたたみ形式の区切り文字は使えない
+            label = f'{filename}:{code.co_name}'.replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            if frame.f_code is WSGI_ENTRY:
+                break
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def _sample_loop(self):
+        interval = self.interval_ms / 1000
+        while True:
+            self._wakeup.wait()
+            time.sleep(interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._wakeup.clear()
+                    continue
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._collapse(frame)] += 1
+            del frames
+
+    # --- リクエスト単位の記録 ---
+
+    def _start_request(self):
+        endpoint = request.endpoint
+        if endpoint is None or endpoint == 'static':
+            return
+        counter = self._counters.get(endpoint)
+        if counter is None:
+            counter = self._counters.setdefault(endpoint, count())
+        number = next(counter)
+        self._seen[endpoint] = number + 1
+        # エンドポイントごとの1回目, sample_every+1回目, … を採取する
+        if number % self.sample_every:
+            return
+
+        stacks = Counter()
+        g.profile = {'start': time.perf_counter(), 'stacks': stacks, 'generation': self._generation}
+        with self._lock:
+            self._active[threading.get_ident()] = stacks
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name='request-profiler', daemon=True)
+                self._sampler.start()
+        self._wakeup.set()
+
+    def _finish_request(self, exc=None):
+        trace = g.pop('profile', None)
+        if trace is None:
+            return
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+        stacks = trace['stacks']
+        endpoint = request.endpoint
+
+        with self._lock:
+            if trace['generation'] != self._generation:
+                return
+            profile = self._profiles.setdefault(endpoint, EndpointProfile())
+            profile.requests += 1
+            profile.seconds += time.perf_counter() - trace['start']
+            profile.samples += sum(stacks.values())
+            for stack, samples in stacks.items():
+                if stack not in profile.stacks and len(profile.stacks) >= self.max_stacks:
+                    stack = OTHER_STACK
+                profile.stacks[stack] += samples
+
+        if self.output_dir and stacks:
+            lines = ''.join(f'{stack} {samples}\n' for stack, samples in stacks.items())
+            self._append(endpoint, lines.encode('utf-8'))
+
+    def _append(self, endpoint, data):
+        """エンドポイントのファイルに追記する（上限を超えていたら先に1世代前のファイルへ移す）"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f'{endpoint}.folded')
+        try:
+            if os.path.getsize(path) + len(data) > self.max_file_bytes:
+                # 複数のワーカーが同時に移しても、どちらかのファイルが .1 に残るだけで壊れない
+                os.replace(path, f'{path}.1')
+        except OSError:
+            pass
+        # 1リクエスト分を1回のwriteで追記する（複数のワーカーが同じファイルに書いても行が混ざらない）
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    # --- 集計結果 ---
+
+    def snapshot(self):
+        """エンドポイントごとの採取結果（採取数の多い順）"""
+        with self._lock:
+            items = sorted(self._profiles.items(), key=lambda item: item[1].samples, reverse=True)
+            return [
+                {
+                    'endpoint': endpoint,
+                    'requests': self._seen.get(endpoint, 0),
+                    'profiled_requests': profile.requests,
+                    'avg_request_ms': round(profile.seconds * 1000 / (profile.requests or 1), 2),
+                    'samples': profile.samples,
+                    'functions': profile.functions(),
+                }
+                for endpoint, profile in items
+            ]
+
+    def collapsed(self, endpoint=None):
+        """折りたたみ形式のスタック（endpoint がNoneなら全エンドポイント。先頭にエンドポイント名を付ける）"""
+        with self._lock:
+            if endpoint is not None:
+                profile = self._profiles.get(endpoint)
+                stacks = dict(profile.stacks) if profile is not None else {}
+            else:
+                stacks = {
+                    f'{name};{stack}': samples
+                    for name, profile in self._profiles.items()
+                    for stack, samples in profile.stacks.items()
+                }
+        return ''.join(f'{stack} {samples}\n' for stack, samples in sorted(stacks.items()))
+
+    def reset(self):
+        with self._lock:
+            self._profiles.clear()
+            self._counters.clear()
+            self._seen.clear()
+            self._generation += 1
@@ -0,0 +1,80 @@
+"""
+よく使う画面が発行するSQLの実行計画チェック
+テストクライアントで画面を表示して実際に発行されたSELECTを集め、EXPLAIN QUERY PLAN でテーブルの全件走査が無いか調べる
+"""
+from sqlalchemy import event
+from models import db, MenuStat, User
+from services.review_feed import fetch_review_page
+from services.sql_instrumentation import statement_shape
+
+# 全件走査しても問題ないテーブル → 理由（行数がメニュー数・カテゴリ数程度に収まる）
+ALLOWED_SCANS = {
+    'categories': 'カテゴリ一覧は全件を表示する',
+    'menu_stats': '行数はメニュー数まで',
+}
+
+
+def hot_paths():
+    """チェックする画面のURL（レビュー数の一番多いメニューを対象にする）"""
+    stat = MenuStat.query.order_by(MenuStat.review_count.desc()).first()
+    if stat is None:
+        return ['/']
+    menu_id = stat.menu_id
+    _, next_cursor = fetch_review_page(menu_id, limit=1)
+    paths = ['/', f'/menus/{menu_id}', f'/menus/{menu_id}/review', '/analysis']
+    if next_cursor:
+        paths.append(f'/menus/{menu_id}?cursor={next_cursor}')
+    return paths
+
+
+def capture_selects(app, paths, user_id):
+    """画面を表示し、発行されたSELECTを {SQLの形: (SQL, パラメータ, URL)} で返す"""
+    statements = {}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            statements.setdefault(statement_shape(statement), (statement, parameters, current_path))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+    event.listen(db.engine, 'before_cursor_execute', on_execute)
+    try:
+        for current_path in paths:
+            response = client.get(current_path)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{current_path}: status {response.status_code}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', on_execute)
+    return statements
+
+
+def full_scans(plan_details):
+    """実行計画の中で、許可されていないテーブルの全件走査"""
+    scans = []
+    for detail in plan_details:
+        # 例: 'SCAN reviews'、'SCAN reviews USING COVERING INDEX ...'（インデックス全体の走査も全件扱い）
+        # 'SCAN CONSTANT ROW' はFROMの無いSELECTでテーブルではない
+        if detail.startswith('SCAN ') and detail != 'SCAN CONSTANT ROW':
+            table = detail.split()[1]
+            if table not in ALLOWED_SCANS:
+                scans.append(detail)
+    return scans
+
+
+def check_query_plans(app, user_id):
+    """各SELECTの実行計画を調べ、(URL, SQL, 実行計画, 全件走査) のリストを返す"""
+    results = []
+    statements = capture_selects(app, hot_paths(), user_id)
+    with db.engine.connect() as connection:
+        for statement, parameters, path in statements.values():
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+            plan = [row[-1] for row in rows]
+            results.append((path, statement_shape(statement), plan, full_scans(plan)))
+    return results
+
+
+def first_user_id():
+    user = User.query.order_by(User.id).first()
+    return user.id if user is not None else None
@@ -0,0 +1,241 @@
+"""
+総合評価（rating）の線形回帰モデル
+説明変数は価格・カテゴリ・詳細評価（味・量・コスパ）
+学習済みモデルはファイルに保存してワーカー間・再起動後も使い回し、新しいレビューはオンライン学習で追加する
+学習はCLI（flask --app main train-rating-model、定期実行では --incremental）で行い、画面のリクエストでは
+保存済みのモデルを読んで予測するだけにする
+scikit-learn・numpy・pandasは読み込みに時間がかかるため、起動時ではなくモデルを使うときにimportする
+"""
+import os
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy import select
+from models import db, Category, Menu, MenuStat, Review
+from services.page_cache import MENU_LIST, current_version
+
+MODEL_COLUMNS = ['id', 'price', 'category', 'rating', 'taste_rating', 'volume_rating', 'price_rating', 'updated_at']
+
+# 追加学習で前回の続きより前から読み直す幅（秒）。updated_at を決めてからコミットまでの間に
+# 他のレビューが先にコミットされて続きの位置を越えても、この幅の中なら取りこぼさない
+WATERMARK_MARGIN_SECONDS = 300
+
+# 数値の説明変数: (列名, 表示名, スケール)  オンライン学習でも同じ尺度になるよう固定値で割る
+NUMERIC_FEATURES = (
+    ('price', '価格(千円)', 1000.0),
+    ('taste_rating', '味', 5.0),
+    ('volume_rating', '量', 5.0),
+    ('price_rating', 'コスパ', 5.0),
+)
+
+
+def _new_estimator():
+    from sklearn.linear_model import SGDRegressor
+    return SGDRegressor(random_state=0, max_iter=1000, tol=1e-4)
+
+
+def build_features(price, taste, volume, price_rating, category, categories):
+    """説明変数の行列を作る（詳細評価の未入力は0とし、未入力フラグを加える）"""
+    import numpy as np
+    numeric = [
+        np.asarray(values, dtype=np.float64) / scale
+        for values, (_, _, scale) in zip((price, taste, volume, price_rating), NUMERIC_FEATURES)
+    ]
+    missing = (np.asarray(taste) == 0).astype(np.float64)
+    # 学習時に無かったカテゴリはどの列も0にする
+    category_codes = {name: i for i, name in enumerate(categories)}
+    codes = np.fromiter((category_codes.get(c, -1) for c in category), dtype=np.int64, count=len(missing))
+    known = codes >= 0
+    one_hot = np.zeros((len(missing), len(categories)))
+    one_hot[np.nonzero(known)[0], codes[known]] = 1.0
+    return np.column_stack(numeric + [missing, one_hot])
+
+
+def _frame_features(df, categories):
+    return build_features(
+        df['price'], df['taste_rating'], df['volume_rating'], df['price_rating'],
+        df['category'], categories
+    )
+
+
+def _recent(df, watermark):
+    """続きの位置から WATERMARK_MARGIN_SECONDS 以内に更新されたレビューの ID → updated_at（学習済みの印）"""
+    if watermark is None:
+        return {}
+    rows = df[df['updated_at'] >= watermark - timedelta(seconds=WATERMARK_MARGIN_SECONDS)]
+    return dict(zip(rows['id'].astype(int), rows['updated_at']))
+
+
+class RatingModel:
+    """ファイルに永続化される回帰モデル（プロセス内ではロックで共有する）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = None
+        self._loaded_mtime = None
+        self._predictions = (None, None)
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self):
+        """他のワーカーが保存したモデルがあれば読み直す"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            import joblib
+            self.state = joblib.load(self.path)
+            self._loaded_mtime = mtime
+
+    def _save(self):
+        import joblib
+        # 書きかけのファイルを他のワーカーが読まないよう、一時ファイルから置き換える
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        joblib.dump(self.state, tmp_path)
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+    def fit(self):
+        """全レビューから学習し直す"""
+        with self._lock:
+            self._fit()
+            return self.state
+
+    def _fit(self):
+        import numpy as np
+        from services.analysis_data import load_review_frame
+        start = time.perf_counter()
+        df = load_review_frame(MODEL_COLUMNS)
+        categories = [name for (name,) in db.session.execute(select(Category.name).order_by(Category.id))]
+        estimator = _new_estimator()
+        r2 = None
+        if len(df):
+            X = _frame_features(df, categories)
+            estimator.fit(X, df['rating'].to_numpy(dtype=np.float64))
+            r2 = float(estimator.score(X, df['rating']))
+        watermark = df['updated_at'].max() if len(df) else None
+        self.state = {
+            'estimator': estimator if len(df) else None,
+            'categories': categories,
+            # 学習済みのレビューの updated_at の最大値。次の追加学習はこれより少し前から読む
+            'watermark': watermark,
+            # 読み直す幅の中の学習済みのレビュー（同じ updated_at のままなら学習し直さない）
+            'recent': _recent(df, watermark),
+            # 学習済みのレビューのIDの最大値（これ以下のIDは編集されたレビューとして件数に数えない）
+            'max_review_id': int(df['id'].max()) if len(df) else 0,
+            'trained_rows': len(df),
+            'r2': r2,
+            'fit_seconds': time.perf_counter() - start,
+            'update_seconds': None,
+            'updated_rows': 0,
+        }
+        self._save()
+
+    def current(self):
+        """保存済みのモデルの状態（他のワーカー・CLIが保存し直していれば読み直す。未学習ならNone）"""
+        return self._current()[0]
+
+    def _current(self):
+        """(状態, 読み込んだファイルの更新日時) をロックの中でそろえて返す"""
+        with self._lock:
+            self._reload_if_changed()
+            return self.state, self._loaded_mtime
+
+    def update(self):
+        """前回の学習以降に投稿・編集されたレビューをオンライン学習で取り込む
+
+        (状態, 追加学習した件数) を返す。未学習・カテゴリが増えた場合は全件で学習し直し、件数はNoneになる
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if self.state is None or self.state['estimator'] is None or 'recent' not in self.state:
+                self._fit()
+                return self.state, None
+
+            import numpy as np
+            from services.analysis_data import load_review_frame
+            start = time.perf_counter()
+            # updated_at を決めてからコミットするまでの間に続きの位置が先へ進んでも取りこぼさないよう、
+            # 少し前から読み直し、読み直した中で学習済み（IDと updated_at が同じ）のものは除く
+            since = self.state['watermark'].to_pydatetime() - timedelta(seconds=WATERMARK_MARGIN_SECONDS)
+            loaded = load_review_frame(MODEL_COLUMNS, [Review.updated_at >= since])
+            trained = loaded['id'].map(self.state['recent']) == loaded['updated_at']
+            df = loaded[~trained]
+            if not len(df):
+                return self.state, 0
+            if not set(df['category'].cat.categories) <= set(self.state['categories']):
+                # カテゴリが増えた場合は説明変数の数が変わるため学習し直す
+                self._fit()
+                return self.state, None
+
+            self.state['estimator'].partial_fit(
+                _frame_features(df, self.state['categories']), df['rating'].to_numpy(dtype=np.float64)
+            )
+            self.state['watermark'] = max(self.state['watermark'], df['updated_at'].max())
+            self.state['recent'] = _recent(loaded, self.state['watermark'])
+            # 編集されたレビューは学習し直すが、学習件数には新しく投稿されたものだけを加える
+            new_rows = df['id'] > self.state['max_review_id']
+            self.state['trained_rows'] += int(new_rows.sum())
+            self.state['max_review_id'] = max(self.state['max_review_id'], int(df['id'].max()))
+            self.state['updated_rows'] = len(df)
+            self.state['update_seconds'] = time.perf_counter() - start
+            self._save()
+            return self.state, len(df)
+
+    def coefficients(self):
+        """説明変数ごとの係数（表示用）"""
+        if self.state is None or self.state['estimator'] is None:
+            return []
+        names = [label for _, label, _ in NUMERIC_FEATURES] + ['詳細評価なし']
+        names += [f'カテゴリ: {name}' for name in self.state['categories']]
+        return list(zip(names, self.state['estimator'].coef_.round(3)))
+
+    def predict_menus(self):
+        """提供中の全メニューの評価を1回の予測でまとめて求める
+
+        詳細評価はメニューごとの平均値（menu_stats）を使う。学習はしない（未学習なら空のリスト）
+        結果はモデルとメニュー一覧のバージョンごとに保持し、どちらも変わらない間は予測し直さない
+        """
+        state, mtime = self._current()
+        if state is None or state['estimator'] is None:
+            return [], 0.0
+        key = (mtime, current_version(MENU_LIST))
+        cached_key, cached = self._predictions
+        if cached_key == key:
+            return cached
+        rows = db.session.execute(
+            select(Menu.id, Menu.name, Menu.price, Category.name, MenuStat)
+            .join(Category, Category.id == Menu.category_id)
+            .outerjoin(MenuStat, MenuStat.menu_id == Menu.id)
+            .where(Menu.is_available == True)
+        ).all()
+        if not rows:
+            return [], 0.0
+
+        def average(stat, total, count):
+            return getattr(stat, total) / getattr(stat, count) if stat is not None and getattr(stat, count) else 0
+
+        start = time.perf_counter()
+        X = build_features(
+            [row[2] for row in rows],
+            [average(row[4], 'taste_sum', 'taste_count') for row in rows],
+            [average(row[4], 'volume_sum', 'volume_count') for row in rows],
+            [average(row[4], 'price_sum', 'price_count') for row in rows],
+            [row[3] for row in rows],
+            state['categories'],
+        )
+        predicted = state['estimator'].predict(X)
+        predict_seconds = time.perf_counter() - start
+
+        predictions = []
+        for row, value in zip(rows, predicted):
+            stat = row[4]
+            predictions.append({
+                'menu_id': row[0],
+                'menu_name': row[1],
+                'predicted_rating': round(float(value), 2),
+                'avg_rating': round(stat.rating_sum / stat.review_count, 2) if stat is not None and stat.review_count else None,
+            })
+        self._predictions = (key, (predictions, predict_seconds))
+        return predictions, predict_seconds
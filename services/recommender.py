@@ -0,0 +1,301 @@
+"""
+メニューのおすすめ（アイテムベースの協調フィルタリング）
+レビューからユーザー×メニューの疎行列（そのユーザーの平均より高く評価したメニューが1）を作り、
+メニューどうしのコサイン類似度の上位 neighbors 件と、ユーザーごとのおすすめの上位 results 件を
+まとめて行列演算で求めてファイルに保存する（学習済みの回帰モデルと同じく全ワーカーで共有する）
+
+表示時は保存済みの結果を引くだけで、リクエストごとに行列の計算はしない
+作り直しはWebのワーカーの外で行う（手動・cronでの定期実行: flask --app main build-recommendations --if-changed）
+"""
+import os
+import threading
+import time
+import uuid
+from sqlalchemy import select
+from models import db, Menu, Review
+from services.page_cache import MENU_LIST, current_version
+from services.storage import raw_cursor
+
+# 1回にDBから受け取るレビューの行数
+DEFAULT_CHUNK_SIZE = 100000
+
+# 類似度・スコアを密な配列で計算するときの1ブロックのセル数の上限（float32で約40MB）
+MAX_BLOCK_CELLS = 10_000_000
+
+# 保存済みの結果が更新されていないか確認する間隔（秒）
+CHECK_SECONDS = 10
+
+# 作成中の印（ロックファイル）がこれより古ければ、作成が中断されたものとして無視する（秒）
+LOCK_TIMEOUT = 600
+
+
+def load_ratings(chunk_size=DEFAULT_CHUNK_SIZE):
+    """全レビューの (ユーザーIDの配列, メニューIDの配列, 評価の配列)"""
+    import numpy as np
+    users, menus, ratings = [], [], []
+    with raw_cursor(select(Review.user_id, Review.menu_id, Review.rating)) as cursor:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            user_ids, menu_ids, values = zip(*rows)
+            users.append(np.array(user_ids, dtype=np.int64))
+            menus.append(np.array(menu_ids, dtype=np.int64))
+            ratings.append(np.array(values, dtype=np.int8))
+    if not users:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8)
+    return np.concatenate(users), np.concatenate(menus), np.concatenate(ratings)
+
+
+def load_menus():
+    """全メニューの (IDの配列（昇順）, 名前のリスト, 提供中かの配列)"""
+    import numpy as np
+    rows = db.session.execute(select(Menu.id, Menu.name, Menu.is_available).order_by(Menu.id)).all()
+    return (
+        np.array([row[0] for row in rows], dtype=np.int64),
+        [row[1] for row in rows],
+        np.array([bool(row[2]) for row in rows], dtype=bool),
+    )
+
+
+def _top_k(block, k):
+    """行ごとの値の大きい順の上位k件の (列番号, 値)（値が正のものだけ。足りない分は列番号-1）"""
+    import numpy as np
+    k = min(k, block.shape[1])
+    if k == 0:
+        return np.full((block.shape[0], 0), -1, dtype=np.int32), np.zeros((block.shape[0], 0), dtype=np.float32)
+    columns = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(block, columns, axis=1)
+    order = np.argsort(-values, axis=1, kind='stable')
+    columns = np.take_along_axis(columns, order, axis=1).astype(np.int32)
+    values = np.take_along_axis(values, order, axis=1).astype(np.float32)
+    columns[~(values > 0)] = -1
+    values[~(values > 0)] = 0
+    return columns, values
+
+
+def build_recommendations(user_ids, menu_ids, ratings, menus, neighbors=20, results=10):
+    """レビューの配列から、メニューごとの似ているメニューとユーザーごとのおすすめを求める
+
+    menus: load_menus() の (IDの配列, 名前のリスト, 提供中かの配列)。提供中のメニューだけを候補にする
+    """
+    import numpy as np
+    from scipy import sparse
+
+    started = time.perf_counter()
+    all_menu_ids, menu_names, available = menus
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    menu_index = np.searchsorted(all_menu_ids, menu_ids)
+    n_users, n_menus = len(users), len(all_menu_ids)
+
+    # 甘め・辛めの付け方の違いを除くため、そのユーザーの平均評価より高く評価したメニューを「好き」とする
+    values = ratings.astype(np.float32)
+    counts = np.bincount(user_index, minlength=n_users)
+    means = np.bincount(user_index, weights=values, minlength=n_users) / np.maximum(counts, 1)
+    liked = values > means[user_index]
+    matrix = sparse.csr_matrix(
+        (np.ones(int(liked.sum()), dtype=np.float32), (user_index[liked], menu_index[liked])),
+        shape=(n_users, n_menus)
+    )
+    rated = sparse.csr_matrix(
+        (np.ones(len(values), dtype=np.int8), (user_index, menu_index)), shape=(n_users, n_menus)
+    )
+
+    # メニューどうしのコサイン類似度（メニューの行をブロックに分けて密な配列で求める）
+    items = matrix.T.tocsr()
+    norms = np.sqrt(np.asarray(items.multiply(items).sum(axis=1)).ravel())
+    inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0).astype(np.float32)
+    neighbor_index = np.full((n_menus, neighbors), -1, dtype=np.int32)
+    neighbor_similarity = np.zeros((n_menus, neighbors), dtype=np.float32)
+    block_rows = max(1, MAX_BLOCK_CELLS // max(n_menus, 1))
+    for start in range(0, n_menus, block_rows):
+        stop = min(start + block_rows, n_menus)
+        block = (items[start:stop] @ items.T).toarray()
+        block *= inverse_norms[start:stop, None]
+        block *= inverse_norms[None, :]
+        # 自分自身と提供終了のメニューは候補にしない
+        block[np.arange(stop - start), np.arange(start, stop)] = 0
+        block[:, ~available] = 0
+        top, similarity = _top_k(block, neighbors)
+        neighbor_index[start:stop, :top.shape[1]] = top
+        neighbor_similarity[start:stop, :top.shape[1]] = similarity
+
+    # ユーザーごとのおすすめ: 好きなメニューに似ているメニューの類似度の合計
+    valid = neighbor_index >= 0
+    weights = sparse.csr_matrix(
+        (neighbor_similarity[valid], (np.nonzero(valid)[0], neighbor_index[valid])),
+        shape=(n_menus, n_menus), dtype=np.float32
+    )
+    user_top = np.full((n_users, results), -1, dtype=np.int32)
+    block_rows = max(1, MAX_BLOCK_CELLS // max(n_menus, 1))
+    for start in range(0, n_users, block_rows):
+        stop = min(start + block_rows, n_users)
+        block = (matrix[start:stop] @ weights).toarray()
+        # レビュー済みのメニューと提供終了のメニューは除く
+        seen = rated[start:stop]
+        block[np.repeat(np.arange(stop - start), np.diff(seen.indptr)), seen.indices] = 0
+        block[:, ~available] = 0
+        top, _ = _top_k(block, results)
+        user_top[start:stop, :top.shape[1]] = top
+
+    return {
+        'menu_ids': all_menu_ids,
+        'menu_names': menu_names,
+        'neighbors': neighbor_index,
+        'similarities': neighbor_similarity,
+        'user_ids': users,
+        'for_user': user_top,
+        'reviews': len(values),
+        'built_at': time.time(),
+        'build_seconds': time.perf_counter() - started,
+        'data_version': None,
+    }
+
+
+class Recommender:
+    """保存済みのおすすめを引く（作り直しは refresh() をCLIから呼ぶ）
+
+    neighbors: メニューごとに保存する似ているメニューの数
+    results: ユーザーごとに保存するおすすめの数
+    """
+
+    def __init__(self, path, neighbors=20, results=10):
+        self.path = path
+        self.neighbors = neighbors
+        self.results = results
+        # (状態, メニューID → 似ているメニュー, ユーザーID → 行, メニューIDのリスト)  引くときに一度に読むため1つにまとめる
+        self._index = None
+        self._loaded_mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._index[0] if self._index is not None else None
+
+    @property
+    def version(self):
+        """作成日時（おすすめを含むページのETag用。未作成ならNone）"""
+        state = self.state
+        return state['built_at'] if state is not None else None
+
+    def _install(self, state):
+        menu_ids = state['menu_ids'].tolist()
+        names = state['menu_names']
+        # メニューの数は少ないため、似ているメニューは表示する形の辞書のリストにしておく
+        similar = {
+            menu_id: [
+                {'menu_id': menu_ids[column], 'menu_name': names[column], 'similarity': round(similarity, 2)}
+                for column, similarity in zip(columns, similarities)
+                if column >= 0
+            ]
+            for menu_id, columns, similarities in zip(
+                menu_ids, state['neighbors'].tolist(), state['similarities'].tolist()
+            )
+        }
+        self._index = (
+            state,
+            similar,
+            {user_id: row for row, user_id in enumerate(state['user_ids'].tolist())},
+            menu_ids,
+        )
+
+    def _reload_if_changed(self):
+        """他のワーカーが保存した結果があれば読み直す"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            import joblib
+            self._install(joblib.load(self.path))
+            self._loaded_mtime = mtime
+
+    def _save(self, state):
+        import joblib
+        # 書きかけのファイルを他のワーカーが読まないよう、一時ファイルから置き換える
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        joblib.dump(state, tmp_path)
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+    def is_outdated(self):
+        """保存済みの結果が無いか、作成後にレビュー・メニューが変わっている"""
+        with self._lock:
+            self._reload_if_changed()
+        state = self.state
+        return state is None or state['data_version'] != current_version(MENU_LIST)
+
+    def refresh(self):
+        """レビューから作り直して保存する（他のプロセスが作成中ならNoneを返す）"""
+        lock_path = f'{self.path}.lock'
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # 作成中の印には自分の値を書き、消すときに自分の印かを確かめる
+        token = f'{os.getpid()}:{uuid.uuid4().hex}'
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) >= LOCK_TIMEOUT:
+                    # 中断された作成の印は消して、次の実行時に作り直す
+                    os.remove(lock_path)
+            except OSError:
+                pass
+            return None
+        with os.fdopen(fd, 'w') as lock_file:
+            lock_file.write(token)
+        try:
+            # 読み込み中に投稿されたレビューは次の作り直しで反映されるよう、先にバージョンを控える
+            version = current_version(MENU_LIST)
+            state = build_recommendations(*load_ratings(), load_menus(), self.neighbors, self.results)
+            state['data_version'] = version
+            self._save(state)
+            with self._lock:
+                self._install(state)
+            return state
+        finally:
+            self._release_lock(lock_path, token)
+
+    @staticmethod
+    def _release_lock(lock_path, token):
+        """作成中の印が自分のものなら消す（時間切れで他のプロセスが作り直した印は残す）"""
+        try:
+            with open(lock_path) as lock_file:
+                if lock_file.read() != token:
+                    return
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+    def _current(self):
+        """保存済みの結果（確認の間隔ごとに、他のプロセスが保存し直していれば読み直す）"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + CHECK_SECONDS
+            with self._lock:
+                self._reload_if_changed()
+        return self._index
+
+    def similar_menus(self, menu_id, limit=5):
+        """このメニューを高く評価した人が高く評価しているメニュー（類似度の高い順）"""
+        index = self._current()
+        if index is None:
+            return []
+        return index[1].get(menu_id, [])[:limit]
+
+    def for_user(self, user_id, limit=5):
+        """ユーザーへのおすすめ（まだレビューしていない提供中のメニュー）"""
+        index = self._current()
+        if index is None:
+            return []
+        state, _, user_rows, menu_ids = index
+        row = user_rows.get(user_id)
+        if row is None:
+            return []
+        names = state['menu_names']
+        return [
+            {'menu_id': menu_ids[column], 'menu_name': names[column]}
+            for column in state['for_user'][row, :limit].tolist()
+            if column >= 0
+        ]
@@ -0,0 +1,119 @@
+"""
+グラフ描画用のプロセスプール
+matplotlibの描画をリクエスト処理のスレッドから切り離し、同じグラフの同時リクエストは1回の描画にまとめる
+"""
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from services.charts import render_chart
+
+
+class RenderQueueFull(Exception):
+    """描画待ちのジョブが上限に達している"""
+
+
+class RenderPool:
+    """(グラフ名, バージョン) 単位で描画ジョブを管理するプール
+
+    max_workers=0 のときはプロセスを使わずその場で描画する（開発・ベンチマーク用）
+    """
+
+    def __init__(self, cache, max_workers=2, queue_limit=8):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # gunicornのワーカーごとに、最初の描画時にプールを作る（スレッドで処理するワーカーでも1つだけ）
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """描画プロセスが落ちて使えなくなったプールを捨て、次の描画で作り直す"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def status(self, name, version):
+        """ジョブの状態: 'done' / 'pending' / 'error' / 'missing'
+
+        失敗したジョブは 'error' を一度返したら消す（次のsubmitで再実行される）
+        """
+        if self.cache.get(name, version) is not None:
+            return 'done'
+        key = (name, version)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return 'missing'
+            if job.done() and job.exception() is not None:
+                del self._jobs[key]
+                return 'error'
+        return 'pending'
+
+    def submit(self, name, version, load_data):
+        """描画ジョブを登録する（同じジョブが実行中なら何もしない）
+
+        load_data: 描画に渡すデータを返す関数。ジョブを新しく作るときだけ呼ばれる
+        """
+        if self.cache.get(name, version) is not None:
+            return 'done'
+
+        key = (name, version)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not (job.done() and job.exception() is not None):
+                return 'pending'
+            # 状態を確認されないまま残った失敗ジョブもここで消す
+            for failed in [k for k, j in self._jobs.items() if j.done() and j.exception() is not None]:
+                del self._jobs[failed]
+            pending = sum(1 for j in self._jobs.values() if not j.done())
+            if pending >= self.queue_limit:
+                raise RenderQueueFull()
+            # データ読み込み中の同時リクエストも重複させないよう、先に枠を確保する
+            job = Future()
+            self._jobs[key] = job
+
+        try:
+            data = load_data()
+            if self.max_workers == 0:
+                self._finish(key, job, png=render_chart(name, data))
+            else:
+                executor = self._get_executor()
+                try:
+                    future = executor.submit(render_chart, name, data)
+                except BrokenProcessPool:
+                    self._discard_executor(executor)
+                    raise
+                future.add_done_callback(lambda f: self._finish(key, job, future=f, executor=executor))
+        except Exception as e:
+            self._finish(key, job, error=e)
+        return self.status(name, version)
+
+    def _finish(self, key, job, png=None, future=None, error=None, executor=None):
+        """描画結果をキャッシュに入れ、ジョブの状態を更新"""
+        if future is not None:
+            error = future.exception()
+            png = None if error is not None else future.result()
+        if isinstance(error, BrokenProcessPool) and executor is not None:
+            # OOM killerなどで描画プロセスが落ちるとプール全体が使えなくなるため作り直す
+            self._discard_executor(executor)
+        if error is not None:
+            # 失敗したジョブは状態確認のために残し、次のsubmitで再実行する
+            job.set_exception(error)
+            return
+        self.cache.put(key[0], key[1], png)
+        with self._lock:
+            self._jobs.pop(key, None)
+        job.set_result(png)
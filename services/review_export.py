@@ -0,0 +1,201 @@
+"""
+レビューの書き出し（分析用の生データ）
+レビュー・メニュー・カテゴリを結合したSELECTを読み込み用エンジンのカーソルで実行し、
+chunk_size 行ずつ受け取ってはCSVのテキスト / Parquetのバイト列にして順に返す
+全件をメモリに載せないため、書き出す行数に関係なくメモリ使用量は一定
+（Parquetは ROW_GROUP_SIZE 行ごとの行グループにする）
+Parquetは pyarrow がインストールされている場合だけ使える（起動を遅くしないよう、書き出すときにimportする）
+"""
+import csv
+import importlib.util
+import io
+import time
+from datetime import date, timedelta
+from sqlalchemy import select
+from models import Category, Menu, Review
+from services.storage import raw_cursor
+
+# 1回にDBから受け取る行数（Pythonのタプルのまま持つのはこの行数まで）
+DEFAULT_CHUNK_SIZE = 10000
+
+# Parquetの1つの行グループの行数（Arrowの列形式で溜めてから書く）
+ROW_GROUP_SIZE = 100000
+
+FORMATS = ('csv', 'parquet')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+reviews_table = Review.__table__
+menus_table = Menu.__table__
+categories_table = Category.__table__
+
+# 列名 → (SELECTする式, Parquetの型名)
+EXPORT_COLUMNS = {
+    'review_id': (reviews_table.c.id, 'int64'),
+    'created_at': (reviews_table.c.created_at, 'timestamp'),
+    'updated_at': (reviews_table.c.updated_at, 'timestamp'),
+    'user_id': (reviews_table.c.user_id, 'int32'),
+    'menu_id': (reviews_table.c.menu_id, 'int32'),
+    'menu_name': (menus_table.c.name, 'string'),
+    'category_id': (menus_table.c.category_id, 'int32'),
+    'category': (categories_table.c.name, 'string'),
+    'price': (menus_table.c.price, 'int32'),
+    'rating': (reviews_table.c.rating, 'int8'),
+    'taste_rating': (reviews_table.c.taste_rating, 'int8'),
+    'volume_rating': (reviews_table.c.volume_rating, 'int8'),
+    'price_rating': (reviews_table.c.price_rating, 'int8'),
+    'comment': (reviews_table.c.comment, 'string'),
+}
+
+
+def parquet_available():
+    # pyarrowが無い環境ではCSVだけを使う（importせずにインストールの有無だけを調べる）
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def export_criteria(start=None, end=None, category_id=None, menu_id=None):
+    """書き出す範囲のWHERE条件（start・end は投稿日。end の日も含む）"""
+    criteria = []
+    if start is not None:
+        criteria.append(reviews_table.c.created_at >= start)
+    if end is not None:
+        criteria.append(reviews_table.c.created_at < end + timedelta(days=1))
+    if category_id is not None:
+        criteria.append(menus_table.c.category_id == category_id)
+    if menu_id is not None:
+        criteria.append(reviews_table.c.menu_id == menu_id)
+    return criteria
+
+
+def parse_date(value, name):
+    """'YYYY-MM-DD' の文字列を日付にする（空ならNone、不正なら ValueError）"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} は YYYY-MM-DD 形式で指定してください（{value}）')
+
+
+class _ChunkSink:
+    """pyarrowの書き込み先になるファイル風のオブジェクト（書かれたバイト列を取り出すまで溜めておく）"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ReviewExport:
+    """条件に合うレビューを順に書き出す（rows・seconds は書き出しの進み具合）"""
+
+    def __init__(self, criteria=(), chunk_size=DEFAULT_CHUNK_SIZE):
+        self.criteria = list(criteria)
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def _batches(self):
+        """chunk_size 行ずつの行のリスト（投稿順＝レビューID順）"""
+        stmt = (
+            select(*[expression.label(name) for name, (expression, _) in EXPORT_COLUMNS.items()])
+            .select_from(reviews_table)
+            .join(menus_table, menus_table.c.id == reviews_table.c.menu_id)
+            .join(categories_table, categories_table.c.id == menus_table.c.category_id)
+            .where(*self.criteria)
+            .order_by(reviews_table.c.id)
+        )
+        started = time.perf_counter()
+        with raw_cursor(stmt) as cursor:
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                self.rows += len(rows)
+                yield rows
+                self.seconds = time.perf_counter() - started
+        self.seconds = time.perf_counter() - started
+
+    def chunks(self, format):
+        """書き出す内容のバイト列を順に返す"""
+        if format == 'csv':
+            return self.csv_chunks()
+        if format == 'parquet':
+            return self.parquet_chunks()
+        raise ValueError(f"形式は {' / '.join(FORMATS)} のどちらかです")
+
+    def csv_chunks(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in self._batches():
+            writer.writerows(rows)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        # 1行も無い場合もヘッダーは返す
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+
+    def parquet_chunks(self):
+        if not parquet_available():
+            raise RuntimeError('Parquetでの書き出しには pyarrow が必要です')
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        types = {
+            'int64': pa.int64(), 'int32': pa.int32(), 'int8': pa.int8(),
+            'string': pa.string(), 'timestamp': pa.timestamp('us'),
+        }
+        schema = pa.schema([(name, types[type_name]) for name, (_, type_name) in EXPORT_COLUMNS.items()])
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        try:
+            batches = []
+            buffered = 0
+            for rows in self._batches():
+                columns = []
+                for field, values in zip(schema, zip(*rows)):
+                    if pa.types.is_timestamp(field.type):
+                        # DBAPIからは日時が文字列で届くため、Arrow側でまとめて変換する
+                        columns.append(pa.array(values, pa.string()).cast(field.type))
+                    else:
+                        columns.append(pa.array(values, field.type))
+                batches.append(pa.RecordBatch.from_arrays(columns, schema=schema))
+                buffered += len(rows)
+                if buffered >= ROW_GROUP_SIZE:
+                    # 溜まった分を1つの行グループとして書き、書かれた分をすぐに返す
+                    writer.write_table(pa.Table.from_batches(batches), row_group_size=buffered)
+                    batches = []
+                    buffered = 0
+                    yield sink.drain()
+            if batches:
+                writer.write_table(pa.Table.from_batches(batches), row_group_size=buffered)
+        finally:
+            writer.close()
+        yield sink.drain()
@@ -0,0 +1,45 @@
+"""
+メニューごとのレビュー一覧をキーセット方式でページ分割して取得する
+(created_at, id) の組をカーソルにするため、何ページ目でもコストが一定になる
+"""
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.orm import contains_eager
+from models import db, Review
+
+
+def encode_cursor(review):
+    """レビューの (created_at, id) をURLに埋め込める文字列に変換"""
+    raw = f'{review.created_at.isoformat()}|{review.id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """カーソル文字列を (created_at, id) に戻す（不正な値はNone）"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, review_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(review_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def fetch_review_page(menu_id, cursor=None, limit=20):
+    """新しい順にlimit件のレビューと次ページのカーソルを返す（投稿者も同じクエリで取得）"""
+    query = (
+        db.session.query(Review)
+        .join(Review.user)
+        .options(contains_eager(Review.user))
+        .filter(Review.menu_id == menu_id)
+    )
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.filter(tuple_(Review.created_at, Review.id) < position)
+
+    # 1件多く取得して次ページの有無を判定する
+    reviews = query.order_by(Review.created_at.desc(), Review.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(reviews[limit - 1]) if len(reviews) > limit else None
+    return reviews[:limit], next_cursor
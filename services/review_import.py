@@ -0,0 +1,286 @@
+"""
+レビューの一括取り込み（アンケート用紙・券売機のフィードバック端末の集計ファイル）
+CSV / JSONL を1行ずつ読んで検証し、chunk_size 行ごとのトランザクションで
+INSERT ... ON CONFLICT(user_id, menu_id) DO UPDATE によりレビューを追加・更新する
+ファイル全体を読み込まないため、ファイルの大きさに関係なくメモリ使用量は一定
+メニュー集計・日別集計・評価の組み合わせごとの件数・ランキング・一覧のキャッシュも、画面からの投稿と同じく同じトランザクションで更新する
+"""
+import csv
+import json
+import time
+from datetime import datetime, timezone
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Menu, Review, User
+from services.menu_stats import apply_deltas, combination_deltas, daily_deltas, review_delta, STAT_COLUMNS
+from services.page_cache import MENU_LIST, bump_version
+
+# 取り込める列（user_id か username のどちらかでユーザーを指定する）
+FIELDS = (
+    'user_id', 'username', 'menu_id', 'rating', 'comment',
+    'taste_rating', 'volume_rating', 'price_rating', 'created_at',
+)
+
+# 1回のトランザクションで取り込む行数の上限（SQLのパラメータ数の上限に収めるため）
+MAX_CHUNK_SIZE = 10000
+
+# 取り込み結果に残す不正な行の数の上限（それ以上は件数だけ数える）
+MAX_REPORTED_REJECTS = 100
+
+FORMATS = ('csv', 'jsonl')
+
+
+class ImportReport:
+    """取り込みの結果"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        # (行番号, 理由) の先頭 MAX_REPORTED_REJECTS 件
+        self.rejects = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def detect_format(filename):
+    """ファイル名の拡張子から形式を決める（.jsonl / .ndjson 以外はCSV）"""
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def iter_records(stream, format):
+    """テキストのストリームから (行番号, 辞書) を1行ずつ返す（JSONLの解析できない行は辞書の代わりに例外）"""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif format == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f'JSONとして読めません（{e}）')
+                continue
+            yield line_number, record if isinstance(record, dict) else ValueError('1行に1つのオブジェクトを書いてください')
+    else:
+        raise ValueError(f"形式は {' / '.join(FORMATS)} のどちらかです")
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _rating(record, field, required=False):
+    value = record.get(field)
+    if _blank(value):
+        if required:
+            raise ValueError(f'{field} は必須です')
+        return None
+    try:
+        rating = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} は整数で指定してください（{value!r}）')
+    if not 1 <= rating <= 5:
+        raise ValueError(f'{field} は1〜5の範囲で指定してください（{rating}）')
+    return rating
+
+
+def _datetime(value):
+    try:
+        parsed = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f'created_at は ISO 8601 形式で指定してください（{value!r}）')
+    # タイムゾーン付きの日時はUTCに直して保存形式（タイムゾーン無しのUTC）にそろえる
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def validate(record):
+    """1行の値を検証して取り込み用の辞書にする（不正なら ValueError）"""
+    if isinstance(record, Exception):
+        raise record
+    row = {}
+    if not _blank(record.get('user_id')):
+        try:
+            row['user_id'] = int(record['user_id'])
+        except (TypeError, ValueError):
+            raise ValueError(f"user_id は整数で指定してください（{record['user_id']!r}）")
+    elif not _blank(record.get('username')):
+        row['username'] = str(record['username']).strip()
+    else:
+        raise ValueError('user_id か username のどちらかが必要です')
+    if _blank(record.get('menu_id')):
+        raise ValueError('menu_id は必須です')
+    try:
+        row['menu_id'] = int(record['menu_id'])
+    except (TypeError, ValueError):
+        raise ValueError(f"menu_id は整数で指定してください（{record['menu_id']!r}）")
+    row['rating'] = _rating(record, 'rating', required=True)
+    for field in ('taste_rating', 'volume_rating', 'price_rating'):
+        row[field] = _rating(record, field)
+    comment = record.get('comment')
+    row['comment'] = None if _blank(comment) else str(comment).strip()
+    created_at = record.get('created_at')
+    row['created_at'] = None if _blank(created_at) else _datetime(created_at)
+    return row
+
+
+def _stat_values(values):
+    """集計に使う評価値と投稿日（services.menu_stats.review_values と同じ形）"""
+    if values is None:
+        return None
+    return {
+        'rating': values['rating'],
+        'taste_rating': values['taste_rating'],
+        'volume_rating': values['volume_rating'],
+        'price_rating': values['price_rating'],
+        # 投稿日時がNULLの既存レビューは review_values と同じく現在日時の日付で数える
+        'day': (values['created_at'] or datetime.utcnow()).date(),
+    }
+
+
+def _add_delta(total, delta):
+    for column in STAT_COLUMNS:
+        total[column] += delta[column]
+
+
+class ReviewImporter:
+    """検証済みの行をチャンクごとにまとめて追加・更新する"""
+
+    def __init__(self, chunk_size=1000, on_reject=None):
+        self.chunk_size = chunk_size
+        self.on_reject = on_reject
+        self.report = ImportReport()
+
+    def reject(self, line_number, reason):
+        self.report.rejected += 1
+        if len(self.report.rejects) < MAX_REPORTED_REJECTS:
+            self.report.rejects.append((line_number, reason))
+        if self.on_reject is not None:
+            self.on_reject(line_number, reason)
+
+    def run(self, records):
+        """(行番号, 辞書) の列を取り込み、結果を返す"""
+        started = time.perf_counter()
+        chunk = []
+        for line_number, record in records:
+            self.report.rows += 1
+            try:
+                chunk.append((line_number, validate(record)))
+            except ValueError as e:
+                self.reject(line_number, str(e))
+            if len(chunk) >= self.chunk_size:
+                self._upsert_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._upsert_chunk(chunk)
+        self.report.seconds = time.perf_counter() - started
+        return self.report
+
+    def _resolve(self, chunk):
+        """ユーザー名をIDにし、存在しないユーザー・メニューの行を除く"""
+        user_ids = {row['user_id'] for _, row in chunk if 'user_id' in row}
+        usernames = {row['username'] for _, row in chunk if 'username' in row}
+        users = db.session.execute(
+            select(User.id, User.username).where(or_(User.id.in_(user_ids), User.username.in_(usernames)))
+        ).all()
+        known_ids = {user_id for user_id, _ in users}
+        ids_by_name = {username: user_id for user_id, username in users}
+        menu_ids = set(db.session.execute(
+            select(Menu.id).where(Menu.id.in_({row['menu_id'] for _, row in chunk}))
+        ).scalars())
+
+        resolved = []
+        for line_number, row in chunk:
+            if 'username' in row:
+                username = row.pop('username')
+                user_id = ids_by_name.get(username)
+                if user_id is None:
+                    self.reject(line_number, f'ユーザー {username} が見つかりません')
+                    continue
+                row['user_id'] = user_id
+            elif row['user_id'] not in known_ids:
+                self.reject(line_number, f"user_id {row['user_id']} のユーザーが見つかりません")
+                continue
+            if row['menu_id'] not in menu_ids:
+                self.reject(line_number, f"menu_id {row['menu_id']} のメニューが見つかりません")
+                continue
+            resolved.append(row)
+        return resolved
+
+    def _upsert_chunk(self, chunk):
+        rows = self._resolve(chunk)
+        if not rows:
+            return
+
+        # 集計の差分を求めるため、同じ (ユーザー, メニュー) の既存レビューの評価を読んでおく
+        # （VALUESのCTEと結合して一意インデックスを1組ずつ引く。組の数だけ式を作らないようSQLは文字列で組み立てる）
+        pairs = list({(row['user_id'], row['menu_id']) for row in rows})
+        result = db.session.connection().exec_driver_sql(
+            'WITH wanted(user_id, menu_id) AS (VALUES ' + ', '.join(['(?, ?)'] * len(pairs)) + ') '
+            'SELECT reviews.user_id, reviews.menu_id, reviews.rating, reviews.taste_rating, '
+            'reviews.volume_rating, reviews.price_rating, reviews.created_at '
+            'FROM wanted JOIN reviews ON reviews.user_id = wanted.user_id AND reviews.menu_id = wanted.menu_id',
+            tuple(value for pair in pairs for value in pair)
+        )
+        existing = {}
+        for user_id, menu_id, rating, taste_rating, volume_rating, price_rating, created_at in result:
+            existing[(user_id, menu_id)] = {
+                'rating': rating,
+                'taste_rating': taste_rating,
+                'volume_rating': volume_rating,
+                'price_rating': price_rating,
+                # 生のSQLでは文字列のまま返るため、保存形式（'YYYY-MM-DD HH:MM:SS.ffffff'）から戻す（NULLはそのまま）
+                'created_at': datetime.fromisoformat(created_at) if created_at is not None else None,
+            }
+
+        now = datetime.utcnow()
+        deltas = {}
+        day_deltas = {}
+        code_deltas = {}
+        # 同じチャンク内で同じ (ユーザー, メニュー) が複数回あれば後の行で上書きする
+        latest = {}
+        for row in rows:
+            key = (row['user_id'], row['menu_id'])
+            old = latest.get(key) or existing.get(key)
+            if old is None:
+                self.report.inserted += 1
+                created_at = row['created_at'] or now
+            else:
+                self.report.updated += 1
+                # 更新では投稿日時を変えない（日別集計も元の投稿日のまま）
+                created_at = old['created_at']
+            new = {**row, 'created_at': created_at, 'updated_at': now}
+            latest[key] = new
+            old_values, new_values = _stat_values(old), _stat_values(new)
+            _add_delta(deltas.setdefault(row['menu_id'], dict.fromkeys(STAT_COLUMNS, 0)),
+                       review_delta(old_values, new_values))
+            for day_key, delta in daily_deltas(row['menu_id'], old_values, new_values).items():
+                _add_delta(day_deltas.setdefault(day_key, dict.fromkeys(STAT_COLUMNS, 0)), delta)
+            for code, count in combination_deltas(old_values, new_values).items():
+                code_deltas[code] = code_deltas.get(code, 0) + count
+
+        stmt = sqlite_insert(Review.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'menu_id'],
+            set_={
+                column: stmt.excluded[column]
+                for column in ('rating', 'comment', 'taste_rating', 'volume_rating', 'price_rating', 'updated_at')
+            }
+        )
+        db.session.execute(stmt, list(latest.values()))
+        apply_deltas(deltas, day_deltas, code_deltas)
+        bump_version(MENU_LIST)
+        db.session.commit()
+
+
+def import_reviews(stream, format='csv', chunk_size=1000, on_reject=None):
+    """CSV / JSONL のテキストストリームからレビューを取り込む"""
+    return ReviewImporter(chunk_size, on_reject).run(iter_records(stream, format))
@@ -0,0 +1,181 @@
+"""
+レビューのコメントとメニュー名・説明の全文検索
+SQLiteのFTS5（trigramトークナイザ）の索引 reviews_fts / menus_fts を使う（作成は services/migrations.py）
+trigramは3文字単位の索引のため、2文字以下の語は索引を使えずFTSテーブルのLIKEで探す
+レビューは件数が多く全件のLIKEになるため、3文字以上の語を1つ以上含む検索だけを受け付け、
+短い語は3文字以上の語で絞り込んだ行の中でLIKEで探す（メニューは件数が少ないため短い語だけでも探す）
+レビューの関連度（bm25）は一致した中の新しい RANKED_CANDIDATES 件だけで求め、よくある語でも採点する件数を一定にする
+"""
+import re
+from contextlib import contextmanager
+from markupsafe import Markup, escape
+from sqlalchemy import DateTime, bindparam, text
+from models import db
+
+# trigramで索引を引ける最短の語の長さ
+MIN_TERM_LENGTH = 3
+
+# レビューを関連度順に並べる件数（一致した中の新しいものから。それより古い一致は関連度順の後に新しい順で続ける）
+RANKED_CANDIDATES = 1000
+
+# 全文検索の索引 → 索引を更新するトリガー
+FTS_TRIGGERS = {
+    table: (f'{table}_insert', f'{table}_delete', f'{table}_update') for table in ('reviews_fts', 'menus_fts')
+}
+
+
+class QueryTooShort(Exception):
+    """索引を引ける長さの語が無い"""
+
+    def __init__(self):
+        super().__init__(f'レビューの検索には{MIN_TERM_LENGTH}文字以上の語を1つ以上含めてください')
+
+
+def split_terms(query):
+    """検索文字列を空白で区切った語のリスト（重複は除く）"""
+    terms = []
+    for term in query.replace('　', ' ').split():
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _match_condition(table, columns, terms, params):
+    """語をすべて含む行の条件と関連度の式（3文字以上はMATCH、それ未満は各列のLIKE）"""
+    conditions = []
+    long_terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    if long_terms:
+        # 各語をFTS5の文字列として引用し、演算子として解釈されないようにする
+        params['match'] = ' '.join('"' + term.replace('"', '""') + '"' for term in long_terms)
+        conditions.append(f'{table} MATCH :match')
+    for i, term in enumerate(term for term in terms if len(term) < MIN_TERM_LENGTH):
+        params[f'like_{i}'] = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append('(' + ' OR '.join(f"{table}.{column} LIKE :like_{i} ESCAPE '\\'" for column in columns) + ')')
+    # bm25() はMATCHがあるときだけ使える（小さいほど関連度が高い）
+    score = f'bm25({table})' if long_terms else 'NULL'
+    return ' AND '.join(conditions), score
+
+
+def highlight(value, terms):
+    """値をエスケープし、語に一致する部分を<mark>で囲んだHTMLにする（trigramと同じく大文字小文字は区別しない）"""
+    if not value:
+        return Markup('')
+    pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    parts = []
+    position = 0
+    for match in pattern.finditer(value):
+        parts.append(escape(value[position:match.start()]))
+        parts.append(Markup('<mark>{}</mark>').format(match.group()))
+        position = match.end()
+    parts.append(escape(value[position:]))
+    return Markup('').join(parts)
+
+
+def _review_page_ids(condition, score, params, offset, limit):
+    """1ページ分のレビューID（新しい RANKED_CANDIDATES 件は関連度順、それより後ろは新しい順）
+
+    FTS5はrowid順なら一致を順に読んで LIMIT で止められるため、採点は新しい一致の RANKED_CANDIDATES 件だけで済む
+    """
+    ids = []
+    if offset < RANKED_CANDIDATES:
+        ids += db.session.execute(text(f"""
+            SELECT review_id
+            FROM (
+                SELECT rowid AS review_id, {score} AS score
+                FROM reviews_fts
+                WHERE {condition}
+                ORDER BY rowid DESC
+                LIMIT :candidates
+            )
+            ORDER BY score, review_id DESC
+            LIMIT :limit OFFSET :offset
+        """), {**params, 'candidates': RANKED_CANDIDATES, 'limit': min(limit, RANKED_CANDIDATES - offset),
+               'offset': offset}).scalars().all()
+    start = max(offset, RANKED_CANDIDATES)
+    if offset + limit > start:
+        ids += db.session.execute(text(f"""
+            SELECT rowid
+            FROM reviews_fts
+            WHERE {condition}
+            ORDER BY rowid DESC
+            LIMIT :limit OFFSET :offset
+        """), {**params, 'limit': offset + limit - start, 'offset': start}).scalars().all()
+    return ids
+
+
+def search_reviews(query, page=1, per_page=20):
+    """コメントに全ての語を含むレビューを関連度順に返す（結果のリスト, 次ページがあるか）
+
+    一致した全件をページに分ける（3文字以上の語が無ければ QueryTooShort）
+    """
+    terms = split_terms(query)
+    if not terms:
+        return [], False
+    if all(len(term) < MIN_TERM_LENGTH for term in terms):
+        raise QueryTooShort()
+    params = {}
+    condition, score = _match_condition('reviews_fts', ['comment'], terms, params)
+    # 採点と並べ替えは索引の中だけで行い、表示する1ページ分だけをreviewsと結合する
+    ids = _review_page_ids(condition, score, params, (page - 1) * per_page, per_page + 1)
+    if not ids:
+        return [], False
+    rows = db.session.execute(text("""
+        SELECT reviews.id, reviews.menu_id, menus.name AS menu_name, users.username, reviews.rating,
+               reviews.comment, reviews.created_at
+        FROM reviews
+        JOIN menus ON menus.id = reviews.menu_id
+        JOIN users ON users.id = reviews.user_id
+        WHERE reviews.id IN :ids
+    """).bindparams(bindparam('ids', expanding=True)).columns(created_at=DateTime), {'ids': ids}).mappings().all()
+    by_id = {row['id']: row for row in rows}
+    rows = [by_id[review_id] for review_id in ids if review_id in by_id]
+
+    results = [{**row, 'comment_html': highlight(row['comment'], terms)} for row in rows[:per_page]]
+    return results, len(ids) > per_page
+
+
+def search_menus(query, limit=10):
+    """名前・説明に全ての語を含むメニューを関連度順に返す"""
+    terms = split_terms(query)
+    if not terms:
+        return []
+    params = {'limit': limit}
+    condition, score = _match_condition('menus_fts', ['name', 'description'], terms, params)
+    rows = db.session.execute(text(f"""
+        SELECT menus.id, menus.name, menus.description, menus.price, menus.is_available
+        FROM menus_fts
+        JOIN menus ON menus.id = menus_fts.rowid
+        WHERE {condition}
+        ORDER BY {score}, menus.id
+        LIMIT :limit
+    """), params).mappings().all()
+    return [
+        {**row, 'name_html': highlight(row['name'], terms), 'description_html': highlight(row['description'], terms)}
+        for row in rows
+    ]
+
+
+@contextmanager
+def search_index_suspended():
+    """大量投入の間は索引を更新するトリガーを外し、終わったら索引をまとめて作り直す
+
+    1行ずつ索引を更新するより、投入後に 'rebuild' する方が数倍速い
+    """
+    names = [name for triggers in FTS_TRIGGERS.values() for name in triggers]
+    placeholders = ', '.join('?' * len(names))
+    with db.engine.begin() as connection:
+        saved = connection.exec_driver_sql(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})", tuple(names)
+        ).all()
+        for name, _ in saved:
+            connection.exec_driver_sql(f'DROP TRIGGER {name}')
+    try:
+        yield
+    finally:
+        with db.engine.begin() as connection:
+            for _, sql in saved:
+                connection.exec_driver_sql(sql)
+            restored = {name for name, _ in saved}
+            for table, triggers in FTS_TRIGGERS.items():
+                if restored.intersection(triggers):
+                    connection.exec_driver_sql(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
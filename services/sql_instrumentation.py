@@ -0,0 +1,149 @@
+"""
+リクエストごとのSQL計測
+models.db と読み込み用エンジンのイベントで発行SQLの数と時間を数え、閾値を超えた遅いクエリはパラメータ付きでログに出す
+1リクエスト内で同じ形のSQLが何度も発行された場合はN+1の疑いとして記録し、エンドポイントごとに集計する
+"""
+import re
+import threading
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# ログや画面に出すSQL・パラメータの最大文字数
+MAX_STATEMENT_LENGTH = 300
+
+# エンドポイントごとに保持するN+1の疑いのあるSQLの数
+MAX_SUSPECTS = 5
+
+
+def statement_shape(statement):
+    """空白の違いを無視したSQLの形（パラメータはプレースホルダのまま）"""
+    return re.sub(r'\s+', ' ', statement).strip()
+
+
+def _truncate(value):
+    text = str(value)
+    return text if len(text) <= MAX_STATEMENT_LENGTH else text[:MAX_STATEMENT_LENGTH] + '…'
+
+
+class EndpointStats:
+    """1エンドポイントの累計"""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.sql_seconds = 0.0
+        self.request_seconds = 0.0
+        self.slow_queries = 0
+        self.n_plus_one_requests = 0
+        self.suspects = Counter()
+
+    def to_dict(self, endpoint):
+        requests = self.requests or 1
+        return {
+            'endpoint': endpoint,
+            'requests': self.requests,
+            'avg_queries': round(self.queries / requests, 1),
+            'max_queries': self.max_queries,
+            'avg_sql_ms': round(self.sql_seconds * 1000 / requests, 2),
+            'avg_request_ms': round(self.request_seconds * 1000 / requests, 2),
+            'slow_queries': self.slow_queries,
+            'n_plus_one_requests': self.n_plus_one_requests,
+            'suspects': [
+                {'statement': shape, 'max_repeats': repeats}
+                for shape, repeats in self.suspects.most_common(MAX_SUSPECTS)
+            ],
+        }
+
+
+class SqlInstrumentation:
+    """エンジンとFlaskアプリにフックを登録し、エンドポイントごとの統計を保持する"""
+
+    def __init__(self, slow_query_ms=100, n_plus_one_threshold=5):
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, *engines):
+        """engines: 計測するエンジン（書き込み用と読み込み用など複数を渡せる）"""
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+
+    # --- リクエスト単位の記録 ---
+
+    def _start_request(self):
+        g.sql_trace = {
+            'start': time.perf_counter(),
+            'queries': 0,
+            'seconds': 0.0,
+            'slow': 0,
+            'shapes': Counter(),
+        }
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'sql_trace' in g:
+            conn.info.setdefault('sql_trace_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not (has_request_context() and 'sql_trace' in g):
+            return
+        starts = conn.info.get('sql_trace_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+
+        trace = g.sql_trace
+        trace['queries'] += 1
+        trace['seconds'] += elapsed
+        trace['shapes'][statement_shape(statement)] += 1
+        if elapsed * 1000 >= self.slow_query_ms:
+            trace['slow'] += 1
+            current_app.logger.warning(
+                '遅いクエリ %.1fms [%s] %s params=%s',
+                elapsed * 1000, request.endpoint, _truncate(statement_shape(statement)), _truncate(parameters)
+            )
+
+    def _finish_request(self, exc=None):
+        trace = g.pop('sql_trace', None)
+        if trace is None or request.endpoint is None or request.endpoint == 'static':
+            return
+
+        suspects = {
+            shape: count for shape, count in trace['shapes'].items()
+            if count >= self.n_plus_one_threshold
+        }
+        for shape, count in suspects.items():
+            current_app.logger.warning(
+                'N+1の疑い [%s] 同じSQLが%d回: %s', request.endpoint, count, _truncate(shape)
+            )
+
+        with self._lock:
+            stats = self._stats.setdefault(request.endpoint, EndpointStats())
+            stats.requests += 1
+            stats.queries += trace['queries']
+            stats.max_queries = max(stats.max_queries, trace['queries'])
+            stats.sql_seconds += trace['seconds']
+            stats.request_seconds += time.perf_counter() - trace['start']
+            stats.slow_queries += trace['slow']
+            if suspects:
+                stats.n_plus_one_requests += 1
+                for shape, count in suspects.items():
+                    stats.suspects[shape] = max(stats.suspects[shape], count)
+
+    # --- 集計結果 ---
+
+    def snapshot(self):
+        """エンドポイントごとの統計（SQL時間の合計が大きい順）"""
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1].sql_seconds, reverse=True)
+            return [stats.to_dict(endpoint) for endpoint, stats in items]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
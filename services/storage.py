@@ -0,0 +1,79 @@
+"""
+SQLiteの接続設定と読み込み用エンジン
+config.apply_storage_profile() で組み立てたPRAGMAを、新しい接続ごとに実行する
+"""
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql.sqltypes import TupleType
+from models import db
+
+
+def _set_pragmas(pragmas, query_only=False):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        if query_only:
+            # 読み込み用の接続で誤って書き込まないようにする
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+    return on_connect
+
+
+def init_storage(app):
+    """書き込み用エンジンにPRAGMAを登録し、読み込み用エンジンを作る（db.init_app() の後に呼ぶ）"""
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if pragmas is None:
+        return
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'connect', _set_pragmas(pragmas))
+
+    read_options = app.config.get('SQLITE_READ_ENGINE_OPTIONS')
+    if read_options is not None:
+        # instanceフォルダに解決済みのURLを使い、プールだけを分ける
+        reader = create_engine(engine.url, **read_options)
+        event.listen(reader, 'connect', _set_pragmas(pragmas, query_only=True))
+        app.extensions['read_engine'] = reader
+
+
+def read_engine():
+    """集計・分析など読み込み専用の処理に使うエンジン（無ければ通常のエンジン）"""
+    return current_app.extensions.get('read_engine') or db.engine
+
+
+def _bind_type(compiled, name):
+    """位置パラメータの型（IN (...) を展開したパラメータ「ids_1_2」は展開前の「ids_1」の型）"""
+    bind = compiled.binds.get(name)
+    if bind is not None:
+        return bind.type
+    bind = compiled.binds.get(name.rsplit('_', 1)[0])
+    if bind is None or not bind.expanding or isinstance(bind.type, TupleType):
+        # タプルの IN ((a, b), ...) は要素ごとの型を求められないため扱わない
+        raise ValueError(f'raw_cursor では使えないパラメータです: {name}')
+    return bind.type
+
+
+@contextmanager
+def raw_cursor(stmt):
+    """SELECTをDBAPIのカーソルで直接実行する（大量行でのRowオブジェクト生成を省く）
+
+    書き込み中のトランザクションを妨げないよう、読み込み用エンジンの接続を使う
+    SQL計測のエンジンイベントが発火するよう、実行は exec_driver_sql で行い結果のカーソルだけを使う
+    IN (...) のパラメータはコンパイル時に値の数だけ展開する（タプルの IN は ValueError）
+    """
+    engine = read_engine()
+    dialect = engine.dialect
+    compiled = stmt.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    values = compiled.construct_params()
+    params = []
+    for name in compiled.positiontup:
+        processor = _bind_type(compiled, name).bind_processor(dialect)
+        params.append(processor(values[name]) if processor else values[name])
+    with engine.connect() as connection:
+        result = connection.exec_driver_sql(compiled.string, tuple(params))
+        try:
+            yield result.cursor
+        finally:
+            result.close()
@@ -0,0 +1,83 @@
+"""
+日別集計（menu_daily_stats）を使った期間別の傾向
+読み込むのは 日数×メニュー数 の集計行だけで、レビューの総数には依存しない
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, select
+from models import db, Menu, MenuDailyStat
+
+# ダッシュボードに表示する期間（日数）
+TREND_WINDOWS = (7, 30, 90)
+
+
+def load_daily_trend(days, today=None):
+    """直近days日の日別レビュー数と平均評価（全メニュー合計）"""
+    # pandasは起動を遅くするため、グラフのデータを読み込むときにimportする
+    import pandas as pd
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    rows = db.session.execute(
+        select(
+            MenuDailyStat.day,
+            func.sum(MenuDailyStat.review_count),
+            func.sum(MenuDailyStat.rating_sum),
+        )
+        .where(MenuDailyStat.day >= start, MenuDailyStat.day <= today)
+        .group_by(MenuDailyStat.day)
+    ).all()
+
+    # レビューが無い日も0件として並べる
+    df = pd.DataFrame(rows, columns=['day', 'review_count', 'rating_sum'])
+    df['day'] = pd.to_datetime(df['day'])
+    df = df.set_index('day').reindex(pd.date_range(start, today), fill_value=0)
+    df['avg_rating'] = (df['rating_sum'] / df['review_count'].where(df['review_count'] > 0)).round(2)
+    return df[['review_count', 'avg_rating']]
+
+
+def week_over_week(today=None, limit=20):
+    """メニューごとの直近7日と前の7日の比較（レビュー数の多い順）"""
+    today = today or datetime.utcnow().date()
+    this_week_start = today - timedelta(days=6)
+    last_week_start = today - timedelta(days=13)
+    in_this_week = MenuDailyStat.day >= this_week_start
+
+    def this_week(column):
+        return func.sum(case((in_this_week, column), else_=0))
+
+    def last_week(column):
+        return func.sum(case((in_this_week, 0), else_=column))
+
+    rows = db.session.execute(
+        select(
+            Menu.id,
+            Menu.name,
+            this_week(MenuDailyStat.review_count).label('this_count'),
+            this_week(MenuDailyStat.rating_sum).label('this_sum'),
+            last_week(MenuDailyStat.review_count).label('last_count'),
+            last_week(MenuDailyStat.rating_sum).label('last_sum'),
+        )
+        .join(Menu, Menu.id == MenuDailyStat.menu_id)
+        .where(MenuDailyStat.day >= last_week_start, MenuDailyStat.day <= today)
+        .group_by(Menu.id, Menu.name)
+        .order_by(this_week(MenuDailyStat.review_count).desc(), Menu.id)
+        .limit(limit)
+    ).all()
+
+    def average(total, count):
+        return round(total / count, 2) if count else None
+
+    result = []
+    for row in rows:
+        this_avg = average(row.this_sum, row.this_count)
+        last_avg = average(row.last_sum, row.last_count)
+        result.append({
+            'menu_id': row.id,
+            'menu_name': row.name,
+            'this_count': row.this_count,
+            'last_count': row.last_count,
+            'count_delta': row.this_count - row.last_count,
+            'this_avg': this_avg,
+            'last_avg': last_avg,
+            'avg_delta': round(this_avg - last_avg, 2) if this_avg is not None and last_avg is not None else None,
+        })
+    return result
@@ -0,0 +1,299 @@
+// 集計済みのJSON（/api/v1/dashboard）を1回だけ取得し、分析ダッシュボードのグラフをSVGで描く
+// 文字はブラウザのフォントで描くため、サーバーに日本語フォントが無くても表示できる
+(function () {
+    var SVG_NS = 'http://www.w3.org/2000/svg';
+    var WIDTH = 480;
+    var HEIGHT = 260;
+    var MARGIN = {top: 16, right: 16, bottom: 36, left: 48};
+    var BAR_COLOR = 'steelblue';
+
+    function element(name, attrs, text) {
+        var node = document.createElementNS(SVG_NS, name);
+        Object.keys(attrs || {}).forEach(function (key) { node.setAttribute(key, attrs[key]); });
+        if (text !== undefined) {
+            node.textContent = text;
+        }
+        return node;
+    }
+
+    function canvas(container, height) {
+        var svg = element('svg', {
+            viewBox: '0 0 ' + WIDTH + ' ' + (height || HEIGHT), width: '100%', role: 'img',
+            'font-size': 11, 'font-family': 'sans-serif'
+        });
+        container.appendChild(svg);
+        return svg;
+    }
+
+    function title(node, text) {
+        // マウスを重ねたときに値を表示する
+        node.appendChild(element('title', {}, text));
+        return node;
+    }
+
+    function format(value) {
+        return value === null ? '-' : String(value);
+    }
+
+    // 縦棒グラフ（labels と values は同じ長さ）
+    function columnChart(container, labels, values, options) {
+        options = options || {};
+        var svg = canvas(container);
+        var width = WIDTH - MARGIN.left - MARGIN.right;
+        var height = HEIGHT - MARGIN.top - MARGIN.bottom;
+        var max = options.max || Math.max.apply(null, values.map(function (v) { return v || 0; }).concat([1]));
+        var step = width / labels.length;
+        svg.appendChild(element('line', {
+            x1: MARGIN.left, y1: MARGIN.top + height, x2: MARGIN.left + width, y2: MARGIN.top + height, stroke: '#333'
+        }));
+        svg.appendChild(element('text', {x: MARGIN.left - 6, y: MARGIN.top + 4, 'text-anchor': 'end'}, format(max)));
+        labels.forEach(function (label, i) {
+            var value = values[i] || 0;
+            var barHeight = height * value / max;
+            var x = MARGIN.left + step * i + step * 0.15;
+            svg.appendChild(title(element('rect', {
+                x: x, y: MARGIN.top + height - barHeight, width: step * 0.7, height: barHeight,
+                fill: options.color || BAR_COLOR
+            }), label + ': ' + format(values[i])));
+            svg.appendChild(element('text', {
+                x: x + step * 0.35, y: MARGIN.top + height - barHeight - 4, 'text-anchor': 'middle'
+            }, format(values[i])));
+            svg.appendChild(element('text', {
+                x: x + step * 0.35, y: HEIGHT - MARGIN.bottom + 16, 'text-anchor': 'middle'
+            }, label));
+        });
+    }
+
+    // 横棒グラフ（カテゴリ名が長くても読めるよう横向き）
+    function barChart(container, labels, values, options) {
+        options = options || {};
+        var rowHeight = 22;
+        var left = 120;
+        var height = MARGIN.top + rowHeight * labels.length + 8;
+        var svg = canvas(container, height);
+        var width = WIDTH - left - MARGIN.right - 40;
+        labels.forEach(function (label, i) {
+            var value = values[i] || 0;
+            var y = MARGIN.top + rowHeight * i;
+            svg.appendChild(element('text', {x: left - 6, y: y + rowHeight * 0.65, 'text-anchor': 'end'}, label));
+            svg.appendChild(title(element('rect', {
+                x: left, y: y + 3, width: width * value / options.max, height: rowHeight - 6,
+                fill: options.color || BAR_COLOR
+            }), label + ': ' + format(values[i]) + (options.note ? '（' + options.note(i) + '）' : '')));
+            svg.appendChild(element('text', {
+                x: left + width * value / options.max + 4, y: y + rowHeight * 0.65
+            }, format(values[i])));
+        });
+    }
+
+    // 散布図（点の大きさはレビュー数）
+    function scatterChart(container, menus) {
+        var svg = canvas(container);
+        var width = WIDTH - MARGIN.left - MARGIN.right;
+        var height = HEIGHT - MARGIN.top - MARGIN.bottom;
+        var minPrice = Math.min.apply(null, menus.price);
+        var maxPrice = Math.max.apply(null, menus.price);
+        var priceRange = Math.max(maxPrice - minPrice, 1);
+        var maxCount = Math.max.apply(null, menus.review_count);
+        function x(price) { return MARGIN.left + width * (price - minPrice) / priceRange; }
+        function y(rating) { return MARGIN.top + height * (5 - rating) / 4; }
+
+        svg.appendChild(element('line', {
+            x1: MARGIN.left, y1: MARGIN.top + height, x2: MARGIN.left + width, y2: MARGIN.top + height, stroke: '#333'
+        }));
+        svg.appendChild(element('line', {
+            x1: MARGIN.left, y1: MARGIN.top, x2: MARGIN.left, y2: MARGIN.top + height, stroke: '#333'
+        }));
+        [1, 2, 3, 4, 5].forEach(function (rating) {
+            svg.appendChild(element('text', {x: MARGIN.left - 6, y: y(rating) + 4, 'text-anchor': 'end'}, rating));
+        });
+        svg.appendChild(element('text', {x: MARGIN.left, y: HEIGHT - 8}, minPrice + '円'));
+        svg.appendChild(element('text', {x: MARGIN.left + width, y: HEIGHT - 8, 'text-anchor': 'end'}, maxPrice + '円'));
+        svg.appendChild(element('text', {x: MARGIN.left + width / 2, y: HEIGHT - 8, 'text-anchor': 'middle'}, '価格'));
+
+        menus.price.forEach(function (price, i) {
+            var radius = 2 + 6 * Math.sqrt(menus.review_count[i] / maxCount);
+            var link = element('a', {href: '/menus/' + menus.ids[i]});
+            link.appendChild(title(element('circle', {
+                cx: x(price), cy: y(menus.rating[i]), r: radius, fill: BAR_COLOR, 'fill-opacity': 0.5
+            }), menus.names[i] + ': ' + price + '円 / 平均' + menus.rating[i] + '（' + menus.review_count[i] + '件）'));
+            svg.appendChild(link);
+        });
+    }
+
+    // 相関行列のヒートマップ（正は青、負は赤）
+    function heatmap(container, correlation) {
+        var names = correlation.names;
+        var cell = 56;
+        var left = 72;
+        var top = 24;
+        var svg = canvas(container, top + cell * names.length + 8);
+        names.forEach(function (name, i) {
+            svg.appendChild(element('text', {x: left + cell * i + cell / 2, y: top - 8, 'text-anchor': 'middle'}, name));
+            svg.appendChild(element('text', {x: left - 6, y: top + cell * i + cell / 2 + 4, 'text-anchor': 'end'}, name));
+            correlation.matrix[i].forEach(function (value, j) {
+                var strength = value === null ? 0 : Math.abs(value);
+                var color = value === null ? '#eee' : (value >= 0 ? '70,130,180' : '205,92,92');
+                svg.appendChild(title(element('rect', {
+                    x: left + cell * j, y: top + cell * i, width: cell - 2, height: cell - 2,
+                    fill: value === null ? color : 'rgba(' + color + ',' + (0.1 + 0.9 * strength) + ')'
+                }), name + ' × ' + names[j] + ': ' + format(value)));
+                svg.appendChild(element('text', {
+                    x: left + cell * j + cell / 2 - 1, y: top + cell * i + cell / 2 + 4, 'text-anchor': 'middle',
+                    fill: strength > 0.6 ? 'white' : '#333'
+                }, value === null ? '-' : value.toFixed(2)));
+            });
+        });
+    }
+
+    // 期間別の推移（日ごとのレビュー数は棒、平均評価は右の軸の折れ線）
+    function trendChart(container, trend) {
+        var svg = canvas(container);
+        var width = WIDTH - MARGIN.left - MARGIN.right;
+        var height = HEIGHT - MARGIN.top - MARGIN.bottom;
+        var max = Math.max.apply(null, trend.review_count.concat([1]));
+        var step = width / trend.dates.length;
+        // 日数が多いときは日付の目盛りを間引く
+        var every = Math.max(1, Math.floor(trend.dates.length / 10));
+        function y(rating) { return MARGIN.top + height * (5.5 - rating) / 5.5; }
+
+        svg.appendChild(element('line', {
+            x1: MARGIN.left, y1: MARGIN.top + height, x2: MARGIN.left + width, y2: MARGIN.top + height, stroke: '#333'
+        }));
+        svg.appendChild(element('text', {x: MARGIN.left - 6, y: MARGIN.top + 4, 'text-anchor': 'end'}, max + '件'));
+        svg.appendChild(element('text', {x: MARGIN.left + width + 4, y: y(5) + 4}, '5'));
+        svg.appendChild(element('text', {x: MARGIN.left + width + 4, y: y(1) + 4}, '1'));
+        var points = [];
+        trend.dates.forEach(function (date, i) {
+            var barHeight = height * trend.review_count[i] / max;
+            var x = MARGIN.left + step * i;
+            svg.appendChild(title(element('rect', {
+                x: x + step * 0.1, y: MARGIN.top + height - barHeight, width: step * 0.8, height: barHeight,
+                fill: 'lightskyblue'
+            }), date + ': ' + trend.review_count[i] + '件 / 平均' + format(trend.avg_rating[i])));
+            if (i % every === 0) {
+                svg.appendChild(element('text', {
+                    x: x + step / 2, y: HEIGHT - MARGIN.bottom + 16, 'text-anchor': 'middle'
+                }, date));
+            }
+            if (trend.avg_rating[i] !== null) {
+                points.push((x + step / 2) + ',' + y(trend.avg_rating[i]));
+            }
+        });
+        svg.appendChild(element('polyline', {
+            points: points.join(' '), fill: 'none', stroke: 'darkorange', 'stroke-width': 2
+        }));
+    }
+
+    var RATING_LABELS = ['★1', '★2', '★3', '★4', '★5'];
+
+    var CHARTS = {
+        popular_menus: function (container, stats) {
+            var popular = stats.popular_menus;
+            barChart(container, popular.names, popular.review_count, {
+                max: Math.max.apply(null, popular.review_count.concat([1]))
+            });
+        },
+        trend: function (container, stats) {
+            var days = Number(container.dataset.days);
+            trendChart(container, stats.trends.filter(function (trend) { return trend.days === days; })[0]);
+        },
+        rating_histogram: function (container, stats) {
+            columnChart(container, RATING_LABELS, stats.rating_histogram);
+        },
+        sub_ratings: function (container, stats) {
+            // 3つの詳細評価の分布を同じ縦軸で並べる
+            var max = Math.max.apply(null, stats.sub_ratings.map(function (sub) {
+                return Math.max.apply(null, sub.histogram);
+            }).concat([1]));
+            stats.sub_ratings.forEach(function (sub) {
+                var box = document.createElement('div');
+                box.className = 'sub-rating-chart';
+                var heading = document.createElement('h4');
+                heading.textContent = sub.name + '（平均 ' + format(sub.mean) + ' / 未入力 ' + sub.missing + '件）';
+                box.appendChild(heading);
+                container.appendChild(box);
+                columnChart(box, RATING_LABELS, sub.histogram, {max: max});
+            });
+        },
+        categories: function (container, stats) {
+            var categories = stats.categories;
+            barChart(container, categories.names, categories.rating, {
+                max: 5,
+                note: function (i) { return categories.review_count[i] + '件'; }
+            });
+        },
+        price_rating: function (container, stats) {
+            scatterChart(container, stats.menus);
+        },
+        correlation: function (container, stats) {
+            heatmap(container, stats.correlation);
+        }
+    };
+
+    // 画像の保存: 描画が終わるまで（202の間）Retry-Afterの秒数ごとに確認し、できたらダウンロードする
+    function downloadChart(link) {
+        var label = link.dataset.label || link.textContent;
+        link.dataset.label = label;
+        fetch(link.href, {credentials: 'same-origin'})
+            .then(function (response) {
+                if (response.status === 202) {
+                    link.textContent = label + '（作成中…）';
+                    var seconds = Number(response.headers.get('Retry-After')) || 1;
+                    setTimeout(function () { downloadChart(link); }, seconds * 1000);
+                    return null;
+                }
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.blob();
+            })
+            .then(function (blob) {
+                if (!blob) {
+                    return;
+                }
+                link.textContent = label;
+                var url = URL.createObjectURL(blob);
+                var anchor = document.createElement('a');
+                anchor.href = url;
+                anchor.download = link.dataset.filename;
+                document.body.appendChild(anchor);
+                anchor.click();
+                anchor.remove();
+                URL.revokeObjectURL(url);
+            })
+            .catch(function () {
+                link.textContent = label + '（作成できませんでした）';
+            });
+    }
+
+    document.querySelectorAll('.chart-downloads a').forEach(function (link) {
+        link.addEventListener('click', function (event) {
+            event.preventDefault();
+            downloadChart(link);
+        });
+    });
+
+    var section = document.getElementById('dashboard-stats');
+    if (!section) {
+        return;
+    }
+    fetch(section.dataset.url, {credentials: 'same-origin'})
+        .then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.json();
+        })
+        .then(function (stats) {
+            section.querySelectorAll('[data-chart]').forEach(function (container) {
+                container.querySelector('.chart-message').hidden = true;
+                CHARTS[container.dataset.chart](container, stats);
+            });
+        })
+        .catch(function () {
+            section.querySelectorAll('.chart-message').forEach(function (message) {
+                message.textContent = 'グラフのデータを取得できませんでした';
+            });
+        });
+})();
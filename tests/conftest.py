@@ -0,0 +1,78 @@
+"""
+テスト共通のフィクスチャ
+アプリは一時ディレクトリのDB・モデルファイルで作り、instance/ のDBには触れない
+"""
+import contextlib
+import io
+import os
+import tempfile
+
+import pytest
+
+# main をimportするとモジュールの app が作られるため、その前に既定のDBを一時ファイルに向ける
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='menu-app-test-'), 'import.db')
+
+from main import create_app, init_database  # noqa: E402
+from models import db, MenuDailyStat, MenuStat, RatingCombinationStat  # noqa: E402
+from insert_dummy_data import generate_data  # noqa: E402
+from services.menu_stats import STAT_COLUMNS, rebuild_daily_stats, rebuild_menu_stats  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'RATING_MODEL_PATH': str(tmp_path / 'rating_model.joblib'),
+        'RECOMMENDER_PATH': str(tmp_path / 'recommendations.joblib'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+        'CHART_POOL_SIZE': 0,
+        'PASSWORD_HASH_WORKERS': 0,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    })
+    init_database(app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def seeded(app):
+    """ユーザー30人・メニュー8品目・レビュー120件のダミーデータ"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_data(30, 8, 120, seed=1, days=30)
+    return app
+
+
+@pytest.fixture
+def client(seeded):
+    """ユーザーID 1（管理者）でログインしたテストクライアント"""
+    client = seeded.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+
+def _stat_rows(model, key_columns):
+    """集計テーブルの内容（全項目が0の行は除く）"""
+    rows = {}
+    for row in model.query.all():
+        values = tuple(getattr(row, column) for column in STAT_COLUMNS)
+        if any(values):
+            rows[tuple(getattr(row, column) for column in key_columns)] = values
+    return rows
+
+
+@pytest.fixture
+def stats_snapshot():
+    """メニュー集計・日別集計・評価の組み合わせごとの件数を返す関数（rebuild=True ならreviewsから作り直した後の内容）"""
+    def snapshot(rebuild=False):
+        if rebuild:
+            rebuild_menu_stats()
+            rebuild_daily_stats()
+            db.session.expire_all()
+        combinations = {
+            stat.code: stat.review_count for stat in RatingCombinationStat.query.all() if stat.review_count
+        }
+        return _stat_rows(MenuStat, ['menu_id']), _stat_rows(MenuDailyStat, ['menu_id', 'day']), combinations
+    return snapshot
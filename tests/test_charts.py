@@ -0,0 +1,81 @@
+"""分析グラフの描画ジョブと画像のURL"""
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from sqlalchemy import func
+from models import db, Menu, Review
+from services.charts import CHARTS, data_version, load_popular_menus
+from services.render_pool import RenderPool
+
+
+def test_popular_menus_from_menu_stats(seeded):
+    expected = dict(
+        db.session.query(Menu.name, func.count(Review.id)).join(Review, Review.menu_id == Menu.id)
+        .group_by(Menu.id).all()
+    )
+    counts = load_popular_menus()
+    assert counts.to_dict() == {name: expected[name] for name in counts.index}
+    assert list(counts) == sorted(expected.values(), reverse=True)[:len(counts)]
+
+
+def test_analysis_page_does_not_render_charts(client):
+    # 画面のグラフはブラウザでJSONから描くため、ページの表示では描画ジョブを登録しない
+    app = client.application
+    response = client.get('/analysis')
+    assert response.status_code == 200
+    assert b'data-chart="popular_menus"' in response.data
+    assert b'data-chart="trend"' in response.data
+    assert app.extensions['chart_pool']._jobs == {}
+    _, version = data_version()
+    assert all(app.extensions['chart_cache'].get(name, version) is None for name in CHARTS)
+
+
+def test_chart_png_renders_on_cache_miss(client):
+    response = client.get('/analysis/charts/trend_7.png')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+
+
+def test_chart_png_placeholder_when_busy(client):
+    app = client.application
+    app.extensions['chart_pool'] = RenderPool(app.extensions['chart_cache'], max_workers=0, queue_limit=0)
+    response = client.get('/analysis/charts/popular_menus.png')
+    assert response.status_code == 202
+    assert response.mimetype == 'image/svg+xml'
+    assert response.headers['X-Chart-Status'] == 'busy'
+    assert response.headers['Retry-After']
+    assert 'no-store' in response.headers['Cache-Control']
+
+
+class BrokenExecutor:
+    """描画プロセスが落ちたプールの代わり（submit で落ちるか、落ちたFutureを返す）"""
+
+    def __init__(self, fail_on_submit):
+        self.fail_on_submit = fail_on_submit
+        self.shut_down = False
+
+    def submit(self, *args):
+        if self.fail_on_submit:
+            raise BrokenProcessPool('render process died')
+        future = Future()
+        future.set_exception(BrokenProcessPool('render process died'))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.mark.parametrize('fail_on_submit', [True, False])
+def test_broken_pool_is_recreated_and_failed_job_dropped(seeded, fail_on_submit):
+    pool = RenderPool(seeded.extensions['chart_cache'], max_workers=1)
+    executor = BrokenExecutor(fail_on_submit)
+    pool._executor = executor
+    _, version = data_version()
+
+    assert pool.submit('popular_menus', version, lambda: load_popular_menus()) == 'error'
+    # 壊れたプールは捨てられ、次の描画で作り直される。失敗は一度報告したら残さない
+    assert executor.shut_down
+    assert pool._executor is None
+    assert pool._jobs == {}
+    assert pool.status('popular_menus', version) == 'missing'
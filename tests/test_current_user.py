@@ -0,0 +1,37 @@
+"""ユーザーキャッシュが古くても、管理者の画面と書き込みはDBの最新の状態で判定すること"""
+from models import db, Review, User
+
+# 一括のUPDATE・DELETEはマッパーのイベントが発火しないため、他のワーカー・CLIでの変更と同じく
+# このプロセスのキャッシュは破棄されない
+
+
+def test_revoked_admin_is_rejected_while_cached(client):
+    assert client.get('/admin/metrics').status_code == 200
+    assert client.get('/admin/metrics.json').status_code == 200
+    db.session.execute(db.update(User).where(User.id == 1).values(is_admin=False))
+    db.session.commit()
+    assert client.get('/admin/metrics').status_code == 403
+    assert client.get('/admin/metrics.json').status_code == 403
+
+
+def test_deleted_user_cannot_post_while_cached(client):
+    assert client.get('/menus/1').status_code == 200
+    db.session.execute(db.delete(Review).where(Review.user_id == 1))
+    db.session.execute(db.delete(User).where(User.id == 1))
+    db.session.commit()
+    response = client.post('/menus/1/review', data={'rating': '5'})
+    assert response.status_code == 302
+    assert '/login' in response.headers['Location']
+    assert Review.query.filter_by(user_id=1).count() == 0
+
+
+def test_json_endpoints_answer_401_without_login(seeded):
+    client = seeded.test_client()
+    for url in ('/analysis/predictions', '/admin/metrics.json', '/api/v1/menus'):
+        response = client.get(url)
+        assert response.status_code == 401, url
+        assert response.get_json()['error'] == 'login required'
+    # 画像は画面と同じくログイン画面へ移動する
+    response = client.get('/analysis/charts/popular_menus.png')
+    assert response.status_code == 302
+    assert '/login' in response.headers['Location']
@@ -0,0 +1,40 @@
+"""分析ダッシュボードのJSON: 集計テーブルから求めた分布・話題メニュー・期間別の推移"""
+from collections import Counter
+from models import db, Review
+
+
+def test_dashboard_json_matches_reviews(client):
+    client.post('/menus/1/review', data={'rating': '5', 'taste_rating': '4', 'volume_rating': '', 'price_rating': '2'})
+    data = client.get('/api/v1/dashboard').get_json()
+
+    reviews = Review.query.all()
+    assert data['review_count'] == len(reviews)
+    ratings = Counter(review.rating for review in reviews)
+    assert data['rating_histogram'] == [ratings[value] for value in range(1, 6)]
+    taste = next(sub for sub in data['sub_ratings'] if sub['name'] == '味')
+    assert taste['missing'] == sum(1 for review in reviews if review.taste_rating is None)
+
+    counts = Counter(review.menu_id for review in reviews)
+    popular = data['popular_menus']
+    assert popular['review_count'] == sorted(counts.values(), reverse=True)[:len(popular['ids'])]
+    assert [counts[menu_id] for menu_id in popular['ids']] == popular['review_count']
+
+    assert [trend['days'] for trend in data['trends']] == [7, 30, 90]
+    for trend in data['trends']:
+        assert len(trend['dates']) == len(trend['review_count']) == len(trend['avg_rating']) == trend['days']
+    # 今日の投稿が直近7日の最終日に入る
+    assert data['trends'][0]['review_count'][-1] >= 1
+
+
+def test_dashboard_stats_reflect_new_review(client):
+    before = client.get('/api/v1/dashboard').get_json()
+    review = Review.query.filter(Review.user_id != 1).order_by(Review.id).first()
+    with client.session_transaction() as session:
+        session['user_id'] = review.user_id
+    client.post(f'/menus/{review.menu_id}/review', data={'rating': str(review.rating % 5 + 1)})
+    db.session.expire_all()
+
+    after = client.get('/api/v1/dashboard').get_json()
+    ratings = Counter(r.rating for r in Review.query.all())
+    assert after['rating_histogram'] == [ratings[value] for value in range(1, 6)]
+    assert after['rating_histogram'] != before['rating_histogram']
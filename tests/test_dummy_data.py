@@ -0,0 +1,9 @@
+"""大量データ生成: 投入に使った接続の設定をプールに残さないこと"""
+from models import db
+
+
+def test_generate_data_restores_synchronous(seeded):
+    # 投入中だけ OFF(0) にした接続はプールに戻る前に元の設定に戻される
+    for _ in range(3):
+        with db.engine.connect() as connection:
+            assert connection.exec_driver_sql('PRAGMA synchronous').scalar() != 0
@@ -0,0 +1,46 @@
+"""ETagと304（データのバージョンとプロセス内のランキング）"""
+
+
+def test_rankings_etag_follows_in_process_leaderboard(client):
+    first = client.get('/api/v1/rankings')
+    etag = first.headers['ETag']
+    assert client.get('/api/v1/rankings', headers={'If-None-Match': etag}).status_code == 304
+
+    # DBのバージョンは同じでも、ワーカーのランキングが変われば（他のワーカーの投稿を読み直したときなど）304にしない
+    leaderboard = client.application.extensions['leaderboard']
+    menu_id = first.get_json()['rankings'][-1]['menu_id']
+    leaderboard.apply({menu_id: {'review_count': 20, 'rating_sum': 100}})
+    second = client.get('/api/v1/rankings', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+    assert second.get_json()['rankings'][0]['menu_id'] == menu_id
+
+
+def assert_revalidates(client, url):
+    """304を返し、ETagを返す"""
+    etag = client.get(url).headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    return etag
+
+
+def test_review_post_invalidates_versioned_etags(client):
+    urls = ('/', '/api/v1/menus', '/api/v1/menus/1', '/api/v1/categories')
+    etags = {url: assert_revalidates(client, url) for url in urls}
+
+    assert client.post('/menus/1/review', data={'rating': '3'}).status_code == 302
+    client.get('/')  # 投稿後のフラッシュメッセージを消費する
+
+    for url in urls:
+        response = client.get(url, headers={'If-None-Match': etags[url]})
+        assert response.status_code == 200, url
+        assert response.headers['ETag'] != etags[url]
+
+
+def test_etag_differs_by_encoding(client):
+    plain = client.get('/api/v1/menus', headers={'Accept-Encoding': 'identity'})
+    gzipped = client.get('/api/v1/menus', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert plain.headers['ETag'] != gzipped.headers['ETag']
+    assert client.get('/api/v1/menus', headers={
+        'Accept-Encoding': 'identity', 'If-None-Match': gzipped.headers['ETag'],
+    }).status_code == 200
@@ -0,0 +1,49 @@
+"""評価ランキング: ワーカーの起動時の読み込みと、同時に古くなったときの読み込みの回数"""
+import threading
+import time
+from sqlalchemy import event
+from main import init_database
+from models import db
+
+
+def test_loaded_at_startup(seeded):
+    init_database(seeded)
+    leaderboard = seeded.extensions['leaderboard']
+    queries = []
+
+    def listener(connection, cursor, statement, *args):
+        queries.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        top = leaderboard.top(3)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(top) == 3
+    assert queries == []
+
+
+def test_concurrent_reload_after_invalidate_loads_once(seeded, monkeypatch):
+    leaderboard = seeded.extensions['leaderboard']
+    leaderboard.load()
+    leaderboard.invalidate()
+    loads = []
+    original = leaderboard.load
+
+    def slow_load():
+        loads.append(1)
+        time.sleep(0.05)
+        original()
+
+    monkeypatch.setattr(leaderboard, 'load', slow_load)
+
+    def read():
+        with seeded.app_context():
+            leaderboard.top(3)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [1]
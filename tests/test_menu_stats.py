@@ -0,0 +1,37 @@
+"""メニュー集計・日別集計の差分更新が、reviewsからの作り直しと一致すること"""
+from models import db, MenuDailyStat, Review
+
+
+def test_review_posts_and_edits_match_rebuild(client, stats_snapshot):
+    # 新規投稿（詳細評価あり・なし）
+    for menu_id in (1, 2, 3):
+        response = client.post(f'/menus/{menu_id}/review', data={
+            'rating': '5', 'taste_rating': '4', 'volume_rating': '', 'price_rating': '2', 'comment': '新規',
+        })
+        assert response.status_code == 302
+    # 既存レビューの編集（評価の変更・詳細評価の削除と追加）
+    existing = Review.query.filter(Review.user_id != 1).order_by(Review.id).limit(3).all()
+    for review in existing:
+        with client.session_transaction() as session:
+            session['user_id'] = review.user_id
+        response = client.post(f'/menus/{review.menu_id}/review', data={
+            'rating': '1', 'taste_rating': '', 'volume_rating': '5', 'price_rating': '',
+        })
+        assert response.status_code == 302
+
+    incremental = stats_snapshot()
+    assert incremental == stats_snapshot(rebuild=True)
+
+
+def test_edit_keeps_original_day(client):
+    review = Review.query.filter(Review.user_id != 1).order_by(Review.created_at).first()
+    day = review.created_at.date()
+    with client.session_transaction() as session:
+        session['user_id'] = review.user_id
+    client.post(f'/menus/{review.menu_id}/review', data={'rating': str(review.rating % 5 + 1)})
+
+    # 編集は元の投稿日の行だけを変え、今日の行を作らない
+    db.session.expire_all()
+    days = {stat.day for stat in MenuDailyStat.query.filter_by(menu_id=review.menu_id) if stat.review_count}
+    assert day in days
+    assert db.session.get(Review, review.id).created_at.date() == day
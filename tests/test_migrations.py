@@ -0,0 +1,56 @@
+"""user_version 0 の既存DBが最新のスキーマまで移行されること"""
+from main import init_database
+from models import db, MenuStat, RatingCombinationStat
+from services.migrations import LATEST_VERSION, migrate, schema_version
+from services.search import FTS_TRIGGERS, search_reviews
+
+MIGRATED_INDEXES = (
+    'ix_reviews_menu_id_created_at', 'ix_reviews_updated_at',
+    'ix_menus_is_available_category_id', 'ix_menu_daily_stats_day',
+)
+
+
+def schema_objects(connection, kind):
+    return {
+        name for (name,) in connection.exec_driver_sql(f"SELECT name FROM sqlite_master WHERE type = '{kind}'")
+    }
+
+
+def combination_counts():
+    return dict(db.session.query(RatingCombinationStat.code, RatingCombinationStat.review_count))
+
+
+def downgrade_to_version_0():
+    """インデックス・全文検索・集計が無かった頃のDBにする（レビューなどの行は残す）"""
+    with db.engine.begin() as connection:
+        for triggers in FTS_TRIGGERS.values():
+            for name in triggers:
+                connection.exec_driver_sql(f'DROP TRIGGER {name}')
+        for table in FTS_TRIGGERS:
+            connection.exec_driver_sql(f'DROP TABLE {table}')
+        for name in MIGRATED_INDEXES:
+            connection.exec_driver_sql(f'DROP INDEX {name}')
+        connection.exec_driver_sql('DELETE FROM menu_stats')
+        connection.exec_driver_sql('DROP TABLE rating_combination_stats')
+        connection.exec_driver_sql('PRAGMA user_version = 0')
+
+
+def test_version_0_database_migrates_to_latest(seeded):
+    expected_hits = {row['id'] for row in search_reviews('美味しい', per_page=1000)[0]}
+    expected_combinations = combination_counts()
+    downgrade_to_version_0()
+    db.session.remove()
+
+    init_database(seeded)
+
+    with db.engine.connect() as connection:
+        assert schema_version(connection) == LATEST_VERSION
+        assert schema_objects(connection, 'index') >= set(MIGRATED_INDEXES)
+        assert schema_objects(connection, 'trigger') >= {name for names in FTS_TRIGGERS.values() for name in names}
+        assert schema_objects(connection, 'table') >= set(FTS_TRIGGERS)
+    # 既存のレビューから索引・集計が作られる
+    assert {row['id'] for row in search_reviews('美味しい', per_page=1000)[0]} == expected_hits
+    assert MenuStat.query.count() > 0
+    assert combination_counts() == expected_combinations
+    # 適用済みなら何もしない
+    assert migrate() == []
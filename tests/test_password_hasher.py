@@ -0,0 +1,21 @@
+"""ハッシュ計算のプールの既定値と、待ちきれなかった場合の503"""
+from main import create_app
+from services.password_hasher import PasswordHasher
+
+
+def test_pool_is_used_only_with_threaded_profile(tmp_path):
+    uri = f'sqlite:///{tmp_path / "profile.db"}'
+    sync = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'SERVER_PROFILE': 'sync'})
+    threaded = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'SERVER_PROFILE': 'threaded'})
+    assert sync.extensions['password_hasher'].max_workers == 0
+    assert threaded.extensions['password_hasher'].max_workers == 2
+
+
+def test_hashing_timeout_returns_busy(app):
+    # 計算が終わるのを待たずにタイムアウトさせる
+    app.extensions['password_hasher'] = PasswordHasher(
+        method='pbkdf2:sha256:2000000', max_workers=1, queue_limit=0, timeout=0
+    )
+    response = app.test_client().post('/register', data={'username': 'slow', 'password': 'password123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
@@ -0,0 +1,62 @@
+"""サンプリングプロファイラ: 採取するリクエストの選び方・リセット・スタックの上限・追記ファイルの上限"""
+import os
+from flask import Flask, g
+from services.profiler import OTHER_STACK, SamplingProfiler
+
+
+def profiled_app(**kwargs):
+    # 採取スレッドがテスト中にスタックを足さないよう、採取の間隔は長くしておく
+    profiler = SamplingProfiler(interval_ms=60000, **kwargs)
+    app = Flask(__name__)
+    app.add_url_rule('/a', 'a', lambda: 'a')
+    profiler.init_app(app)
+    return app, profiler
+
+
+def profiled_request(app, profiler, stacks):
+    """/a のリクエストを1回分、指定のスタックを採取したことにして終える"""
+    with app.test_request_context('/a'):
+        profiler._start_request()
+        g.profile['stacks'].update(stacks)
+        profiler._finish_request()
+
+
+def test_sample_every_selects_first_of_each_block(tmp_path):
+    app, profiler = profiled_app(sample_every=3)
+    client = app.test_client()
+    for _ in range(7):
+        client.get('/a')
+    # 1回目・4回目・7回目だけを採取する
+    (profile,) = profiler.snapshot()
+    assert (profile['endpoint'], profile['requests'], profile['profiled_requests']) == ('a', 7, 3)
+
+
+def test_reset_drops_requests_started_before_it():
+    app, profiler = profiled_app(sample_every=1)
+    with app.test_request_context('/a'):
+        profiler._start_request()
+        g.profile['stacks']['app.py:view'] += 1
+        profiler.reset()
+        profiler._finish_request()
+    assert profiler.snapshot() == []
+
+    profiled_request(app, profiler, {'app.py:view': 1})
+    assert profiler.snapshot()[0]['profiled_requests'] == 1
+
+
+def test_stacks_over_max_stacks_go_to_other():
+    app, profiler = profiled_app(sample_every=1, max_stacks=2)
+    profiled_request(app, profiler, {'x;a': 1, 'x;b': 2})
+    profiled_request(app, profiler, {'x;a': 1, 'x;c': 4, 'x;d': 8})
+    assert profiler.collapsed('a') == f'{OTHER_STACK} 12\nx;a 2\nx;b 2\n'
+
+
+def test_folded_file_rotates_at_max_file_bytes(tmp_path):
+    app, profiler = profiled_app(sample_every=1, output_dir=str(tmp_path), max_file_bytes=30)
+    for _ in range(3):
+        profiled_request(app, profiler, {'x;' + 'f' * 10: 1})
+    path = tmp_path / 'a.folded'
+    # 1行15バイト: 2行で上限に達し、3行目の前に1世代前へ移す
+    assert path.read_text() == 'x;ffffffffff 1\n'
+    assert (tmp_path / 'a.folded.1').read_text() == 'x;ffffffffff 1\n' * 2
+    assert sorted(os.listdir(tmp_path)) == ['a.folded', 'a.folded.1']
@@ -0,0 +1,69 @@
+"""回帰モデルの追加学習の続き位置（後からコミットされたレビューも含む）と学習件数、リクエストで学習しないこと"""
+import os
+from datetime import timedelta
+from models import db, Review, User
+
+
+def unreviewed_pair():
+    """まだレビューの無い (ユーザーID, メニューID)"""
+    reviewed = set(db.session.query(Review.user_id, Review.menu_id))
+    user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+    return next((u, m) for u in user_ids for m in range(1, 9) if (u, m) not in reviewed)
+
+
+def test_predictions_request_does_not_train(client):
+    model = client.application.extensions['rating_model']
+    data = client.get('/analysis/predictions').get_json()
+    assert data['predictions'] == []
+    assert data['trained_rows'] == 0
+    assert not os.path.exists(model.path)
+    assert client.get('/analysis').status_code == 200
+    assert not os.path.exists(model.path)
+
+
+def test_incremental_update_takes_ties_and_counts_only_new_reviews(seeded):
+    model = seeded.extensions['rating_model']
+    state = model.fit()
+    trained = state['trained_rows']
+    watermark = state['watermark'].to_pydatetime()
+
+    # 最後に学習したレビューと同じ更新日時の新しいレビューも取り込む
+    user_id, menu_id = unreviewed_pair()
+    db.session.add(Review(user_id=user_id, menu_id=menu_id, rating=4, created_at=watermark, updated_at=watermark))
+    db.session.commit()
+    state, added = model.update()
+    assert added == 1
+    assert state['trained_rows'] == trained + 1
+
+    # 続けて実行しても同じレビューを学習し直さない
+    state, added = model.update()
+    assert added == 0
+
+    # 編集されたレビューは学習するが件数には数えない
+    review = Review.query.order_by(Review.id).first()
+    review.rating = review.rating % 5 + 1
+    review.updated_at = watermark + timedelta(seconds=1)
+    db.session.commit()
+    state, added = model.update()
+    assert added == 1
+    assert state['trained_rows'] == trained + 1
+
+    predictions, _ = model.predict_menus()
+    assert predictions
+
+
+def test_incremental_update_takes_reviews_committed_late(seeded):
+    model = seeded.extensions['rating_model']
+    state = model.fit()
+    watermark = state['watermark'].to_pydatetime()
+
+    # 続きの位置より前の updated_at で後からコミットされたレビュー（長いトランザクションなど）も取り込む
+    user_id, menu_id = unreviewed_pair()
+    late = watermark - timedelta(seconds=10)
+    db.session.add(Review(user_id=user_id, menu_id=menu_id, rating=2, created_at=late, updated_at=late))
+    db.session.commit()
+    state, added = model.update()
+    assert added == 1
+    # 続きの位置は戻らず、読み直す幅の中の学習済みのレビューは学習し直さない
+    assert state['watermark'].to_pydatetime() == watermark
+    assert model.update()[1] == 0
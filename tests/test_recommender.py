@@ -0,0 +1,42 @@
+"""おすすめの作成はリクエストでは行わず、作成中の印は自分のものだけを消す"""
+import os
+import services.recommender as recommender_module
+from services.recommender import Recommender
+
+
+def test_lookup_does_not_build(client):
+    recommender = client.application.extensions['recommender']
+    client.get('/')
+    client.get('/menus/1')
+    assert recommender.state is None
+    assert not os.path.exists(recommender.path)
+
+
+def test_build_if_outdated_and_reload_in_other_worker(seeded):
+    recommender = seeded.extensions['recommender']
+    assert recommender.is_outdated()
+    assert recommender.refresh() is not None
+    assert not recommender.is_outdated()
+    assert not os.path.exists(f'{recommender.path}.lock')
+
+    # 他のワーカーは保存されたファイルを読み直す
+    other = Recommender(recommender.path)
+    assert other.similar_menus(1) == recommender.similar_menus(1)
+
+
+def test_refresh_keeps_lock_of_other_process(seeded, monkeypatch):
+    recommender = seeded.extensions['recommender']
+    lock_path = f'{recommender.path}.lock'
+
+    # 作成中に時間切れとみなされ、他のプロセスが新しい印を作った場合
+    def build_while_other_takes_over(*args):
+        os.remove(lock_path)
+        with open(lock_path, 'w') as lock_file:
+            lock_file.write('other')
+        return build_recommendations(*args)
+    build_recommendations = recommender_module.build_recommendations
+    monkeypatch.setattr(recommender_module, 'build_recommendations', build_while_other_takes_over)
+
+    assert recommender.refresh() is not None
+    with open(lock_path) as lock_file:
+        assert lock_file.read() == 'other'
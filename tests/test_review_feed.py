@@ -0,0 +1,49 @@
+"""レビュー一覧のキーセット方式のページ分割"""
+from datetime import datetime
+from models import db, Review
+from services.review_feed import decode_cursor, encode_cursor, fetch_review_page
+
+
+def collect_pages(menu_id, limit):
+    """カーソルをたどって全ページのレビューIDを集める"""
+    ids, cursor = [], None
+    while True:
+        page, cursor = fetch_review_page(menu_id, cursor, limit)
+        ids.extend(review.id for review in page)
+        if cursor is None:
+            return ids
+
+
+def test_pages_cover_every_review_once_in_order(seeded):
+    menu_id = 1
+    # 投稿日時が同じレビュー（idで順序が決まる）もページの境目をまたいで並ぶようにする
+    same_time = datetime(2024, 1, 1, 12, 0, 0)
+    user_ids = {review.user_id for review in Review.query.filter_by(menu_id=menu_id)}
+    for user_id in [i for i in range(1, 31) if i not in user_ids][:5]:
+        db.session.add(Review(user_id=user_id, menu_id=menu_id, rating=3, created_at=same_time, updated_at=same_time))
+    db.session.commit()
+
+    expected = [
+        review.id for review in
+        Review.query.filter_by(menu_id=menu_id).order_by(Review.created_at.desc(), Review.id.desc())
+    ]
+    for limit in (1, 2, 3, len(expected), len(expected) + 1):
+        assert collect_pages(menu_id, limit) == expected
+
+
+def test_cursor_round_trip_and_invalid_cursor(seeded):
+    review = Review.query.first()
+    assert decode_cursor(encode_cursor(review)) == (review.created_at, review.id)
+    assert decode_cursor('not-a-cursor') is None
+    # 不正なカーソルは1ページ目として扱う
+    first_page, _ = fetch_review_page(review.menu_id, None, 5)
+    assert fetch_review_page(review.menu_id, '!!!', 5)[0] == first_page
+
+
+def test_menu_detail_next_link(client):
+    review = Review.query.filter_by(menu_id=1).order_by(Review.created_at.desc(), Review.id.desc()).first()
+    client.application.config['REVIEWS_PER_PAGE'] = 1
+    page = client.get('/menus/1').get_data(as_text=True)
+    _, next_cursor = fetch_review_page(1, None, 1)
+    assert next_cursor in page
+    assert encode_cursor(review) == next_cursor
@@ -0,0 +1,52 @@
+"""一括取り込み: 同じチャンク内で同じ (ユーザー, メニュー) が重なる場合の上書きと集計"""
+import io
+from models import db, Review, User
+from services.review_import import import_reviews
+
+
+def test_duplicate_pairs_in_one_chunk(seeded, stats_snapshot):
+    existing = Review.query.order_by(Review.id).first()
+    reviewed = set(db.session.query(Review.user_id, Review.menu_id))
+    user_id, menu_id = next(
+        (u, m) for (u,) in db.session.query(User.id) for m in range(1, 9) if (u, m) not in reviewed
+    )
+    username = db.session.get(User, user_id).username
+    csv_text = (
+        'user_id,username,menu_id,rating,comment,taste_rating,volume_rating,price_rating,created_at\n'
+        # 新しい組を2回（2回目は更新として数え、投稿日時は1回目のまま）
+        f'{user_id},,{menu_id},2,最初,1,,,2024-01-02T12:00:00\n'
+        f',{username},{menu_id},5,二回目,,4,,2024-03-04T12:00:00\n'
+        # 既存の組を2回
+        f'{existing.user_id},,{existing.menu_id},1,上書き1,,,,\n'
+        f'{existing.user_id},,{existing.menu_id},4,上書き2,3,3,3,\n'
+        # 不正な行
+        f'{user_id},,{menu_id},9,,,,,\n'
+    )
+    report = import_reviews(io.StringIO(csv_text), 'csv', chunk_size=100)
+
+    assert (report.rows, report.inserted, report.updated, report.rejected) == (5, 1, 3, 1)
+    db.session.expire_all()
+    new = Review.query.filter_by(user_id=user_id, menu_id=menu_id).one()
+    assert (new.rating, new.comment, new.taste_rating, new.volume_rating) == (5, '二回目', None, 4)
+    assert new.created_at.date().isoformat() == '2024-01-02'
+    updated = db.session.get(Review, existing.id)
+    assert (updated.rating, updated.comment, updated.price_rating) == (4, '上書き2', 3)
+
+    assert stats_snapshot() == stats_snapshot(rebuild=True)
+
+
+def test_update_of_review_with_null_created_at(seeded):
+    # created_at はNULLを許すため、投稿日時の無い既存レビューの上書きでも取り込みを止めない
+    existing = Review.query.order_by(Review.id).first()
+    db.session.execute(db.update(Review).where(Review.id == existing.id).values(created_at=None))
+    db.session.commit()
+    csv_text = (
+        'user_id,username,menu_id,rating,comment,taste_rating,volume_rating,price_rating,created_at\n'
+        f'{existing.user_id},,{existing.menu_id},3,NULLの上書き,,,,\n'
+    )
+    report = import_reviews(io.StringIO(csv_text), 'csv', chunk_size=100)
+
+    assert (report.rows, report.inserted, report.updated, report.rejected) == (1, 0, 1, 0)
+    db.session.expire_all()
+    updated = db.session.get(Review, existing.id)
+    assert (updated.rating, updated.comment) == (3, 'NULLの上書き')
@@ -0,0 +1,93 @@
+"""全文検索: 索引のトリガー・関連度順のページ分け・短い語の扱い"""
+import pytest
+from models import db, Menu, Review
+from services import search
+from services.search import QueryTooShort, search_menus, search_reviews
+
+
+def review_ids(query):
+    return {row['id'] for row in search_reviews(query, per_page=1000)[0]}
+
+
+def test_review_triggers_keep_index_current(seeded):
+    review = Review.query.order_by(Review.id).first()
+    review.comment = 'ふわとろオムライス最高'
+    db.session.commit()
+    assert review_ids('ふわとろ') == {review.id}
+
+    # コメントを変えれば古い語では見つからない
+    review.comment = 'カリカリの唐揚げ'
+    db.session.commit()
+    assert review_ids('ふわとろ') == set()
+    assert review_ids('カリカリ') == {review.id}
+
+    new_review = Review(user_id=review.user_id, menu_id=review.menu_id % 8 + 1, rating=3, comment='カリカリ衣')
+    db.session.add(new_review)
+    db.session.commit()
+    assert review_ids('カリカリ') == {review.id, new_review.id}
+
+    db.session.delete(review)
+    db.session.commit()
+    assert review_ids('カリカリ') == {new_review.id}
+
+
+def test_menu_triggers_keep_index_current(seeded):
+    menu = db.session.get(Menu, 1)
+    menu.description = 'ぷるぷる特製ソース'
+    db.session.commit()
+    assert [row['id'] for row in search_menus('ぷるぷる')] == [1]
+
+    menu.name = '新メニュー'
+    menu.description = None
+    db.session.commit()
+    assert search_menus('ぷるぷる') == []
+    assert [row['id'] for row in search_menus('新メニュー')] == [1]
+
+
+def test_pages_cover_every_match_in_rank_order(seeded):
+    expected = Review.query.filter(Review.comment.contains('美味しい')).count()
+    assert expected > 3
+    seen = []
+    page = 1
+    while True:
+        results, has_next = search_reviews('美味しい', page, per_page=3)
+        seen.extend(row['id'] for row in results)
+        if not has_next:
+            break
+        page += 1
+    assert len(seen) == len(set(seen)) == expected
+
+
+def test_only_newest_candidates_are_ranked(seeded, monkeypatch):
+    # 関連度順に並べるのは新しい一致の4件まで。それより古い一致は新しい順で続き、ページの境目でも漏れない
+    monkeypatch.setattr(search, 'RANKED_CANDIDATES', 4)
+    matches = [
+        review.id for review in Review.query.filter(Review.comment.contains('美味しい')).order_by(Review.id.desc())
+    ]
+    assert len(matches) > 4
+    seen = []
+    for page in range(1, len(matches) // 3 + 2):
+        results, _ = search_reviews('美味しい', page, per_page=3)
+        seen.extend(row['id'] for row in results)
+    assert sorted(seen[:4], reverse=True) == matches[:4]
+    assert seen[4:] == matches[4:]
+
+
+def test_short_terms_need_a_long_term(seeded):
+    with pytest.raises(QueryTooShort):
+        search_reviews('量 味')
+    # 3文字以上の語で絞り込んだ中から短い語を探す
+    both = review_ids('美味しい 値段')
+    assert both == {
+        review.id for review in Review.query.filter(Review.comment.contains('美味しい'), Review.comment.contains('値段'))
+    }
+    # メニューは短い語だけでも探す
+    assert {row['id'] for row in search_menus('カレ', limit=100)} == {
+        menu.id for menu in Menu.query.filter(Menu.name.contains('カレ') | Menu.description.contains('カレ'))
+    }
+
+
+def test_short_query_shows_message(client):
+    response = client.get('/search', query_string={'q': '量'})
+    assert response.status_code == 200
+    assert '3文字以上の語を1つ以上' in response.get_data(as_text=True)
@@ -0,0 +1,15 @@
+"""読み込み用エンジンで発行したSQLもリクエストごとの計測に数えること"""
+from flask import g
+from sqlalchemy import select
+from models import Review
+from services.storage import raw_cursor
+
+
+def test_read_engine_queries_are_counted(seeded):
+    assert 'read_engine' in seeded.extensions
+    with seeded.test_request_context('/analysis'):
+        seeded.preprocess_request()
+        with raw_cursor(select(Review.id)) as cursor:
+            rows = cursor.fetchall()
+        assert rows
+        assert g.sql_trace['queries'] == 1
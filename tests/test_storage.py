@@ -0,0 +1,26 @@
+"""raw_cursor: IN (...) のパラメータの展開と、型の変換"""
+import pytest
+from sqlalchemy import select, tuple_
+from models import Review
+from services.storage import raw_cursor
+
+
+def fetch_ids(stmt):
+    with raw_cursor(stmt) as cursor:
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def test_expanding_in_parameters(seeded):
+    reviews = Review.query.order_by(Review.id).limit(5).all()
+    ids = [review.id for review in reviews]
+    assert fetch_ids(select(Review.id).where(Review.id.in_(ids[:3]), Review.rating >= 1)) == ids[:3]
+    # 日時の IN も展開したパラメータごとに保存形式へ変換する
+    dates = [review.created_at for review in reviews[3:]]
+    assert fetch_ids(select(Review.id).where(Review.created_at.in_(dates))) == ids[3:]
+    assert fetch_ids(select(Review.id).where(Review.id.in_([]))) == []
+
+
+def test_tuple_in_is_rejected(seeded):
+    stmt = select(Review.id).where(tuple_(Review.user_id, Review.menu_id).in_([(1, 1), (2, 2)]))
+    with pytest.raises(ValueError):
+        fetch_ids(stmt)